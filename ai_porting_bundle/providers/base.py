@@ -1,5 +1,13 @@
+import base64
+from email.utils import parsedate_to_datetime
 import os
+import random
+import time
+import uuid
+
 import requests
+from urllib3.exceptions import NewConnectionError
+
 try:
     # Optional external logger used in original project
     from classes.logger import log  # type: ignore
@@ -23,34 +31,211 @@ class AIProviderError(Exception):
     pass
 
 
+class MultipartFile:
+    """
+    A multipart/form-data body with one file part, read from disk while it is
+    sent (pass it as `data=` with headers {"Content-Type": body.content_type}),
+    so large inputs are never held in memory or base64-encoded. Retries
+    rewind it with seek(0).
+    """
+
+    def __init__(self, path, field="file", mime="application/octet-stream", fields=None):
+        self.path = path
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = "".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in (fields or {}).items()
+        )
+        head += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+            f'filename="{os.path.basename(path)}"\r\nContent-Type: {mime}\r\n\r\n'
+        )
+        self._head = head.encode()
+        self._tail = f"\r\n--{boundary}--\r\n".encode()
+        self._size = os.path.getsize(path)
+        self._file = None
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._head) + self._size + len(self._tail)
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=0):
+        base = {0: 0, 1: self._pos, 2: len(self)}[whence]
+        self._pos = max(0, min(len(self), base + offset))
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self) - self._pos
+        out = bytearray()
+        file_end = len(self._head) + self._size
+        while size > 0 and self._pos < len(self):
+            if self._pos < len(self._head):
+                piece = self._head[self._pos:self._pos + size]
+            elif self._pos < file_end:
+                if self._file is None:
+                    self._file = open(self.path, "rb")
+                self._file.seek(self._pos - len(self._head))
+                piece = self._file.read(min(size, file_end - self._pos))
+                if not piece:
+                    raise AIProviderError(f"File shrank while uploading: {self.path}")
+            else:
+                start = self._pos - file_end
+                piece = self._tail[start:start + size]
+            out += piece
+            self._pos += len(piece)
+            size -= len(piece)
+        return bytes(out)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
 class AIProvider:
+    # Key of this provider's API rate limit
+    provider_name = None
+    # Optional shared limiter: any object whose slot(provider_name) is a context
+    # manager held for the duration of each API request. Unset, requests go
+    # straight out; the host application installs one to share limits.
+    request_limiter = None
+    # Retries with exponential backoff and jitter (Retry-After is honoured).
+    # Idempotent requests (GET/HEAD by default) are retried on connection
+    # errors, timeouts, 429 and 5xx; others only when the provider cannot have
+    # accepted them (no connection was made, or it answered 429/503/529).
+    max_retries = 4
+    retry_base_delay = 1.0
+    retry_max_delay = 30.0
+    # Optional callable(event dict) told about every retry (install as a staticmethod)
+    on_retry = None
+    # Optional callable(provider_name) returning a shared keep-alive Session, so
+    # instances reuse pooled connections (install as a staticmethod)
+    session_source = None
+    # Optional adaptive polling: an object with delay(key, attempt, elapsed)
+    # returning the seconds before the next status check, and record(key,
+    # seconds) told how long each completed job took. Keys are
+    # "<provider_name>:<model>". Unset, polls back off from 1 s to 30 s.
+    poll_strategy = None
+    # Optional upload manager for local input files: an object with
+    # reference(provider_name, path, mime, upload) returning what to send for
+    # the file, a data URL for small files or else the URL returned by
+    # upload(path, mime) (which it may reuse while the file is unchanged).
+    # Unset, files up to inline_max_bytes are inlined and larger ones uploaded.
+    file_uploads = None
+    inline_max_bytes = 256 * 1024
+
     def __init__(self, api_key=None):
         self.api_key = api_key or ""
-        self.session = requests.Session()
+        self.session = self.session_source(self.provider_name or "default") if self.session_source else requests.Session()
         self.session.headers.update({"User-Agent": "OpenShot-AI"})
 
-    def _make_request(self, method, url, **kwargs):
-        try:
-            resp = self.session.request(method, url, timeout=kwargs.pop("timeout", 60), **kwargs)
-            resp.raise_for_status()
-            return resp
-        except requests.exceptions.HTTPError as e:
-            body = ""
+    def _make_request(self, method, url, rate_limited=True, idempotent=None, cancel_event=None, **kwargs):
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD")
+        retry_statuses = (429, 500, 502, 503, 504) if idempotent else (429, 503, 529)
+        timeout = kwargs.pop("timeout", 60)
+        limiter = self.request_limiter if rate_limited and self.provider_name else None
+        attempt = 0
+        while True:
             try:
-                body = e.response.text if e.response is not None else ""
-            except Exception:
-                pass
-            log.error(f"HTTP error from {url}: {e}")
-            if body:
-                log.error(f"Response body: {body}")
-            code = e.response.status_code if e.response is not None else "error"
-            raise AIProviderError(f"HTTP error: {code} {body or str(e)}")
-        except requests.exceptions.RequestException as e:
-            log.error(f"Request error to {url}: {e}")
-            raise AIProviderError(f"Request failed: {e}")
+                if limiter is not None:
+                    with limiter.slot(self.provider_name):
+                        resp = self.session.request(method, url, timeout=timeout, **kwargs)
+                else:
+                    resp = self.session.request(method, url, timeout=timeout, **kwargs)
+                if resp.status_code not in retry_statuses or attempt >= self.max_retries:
+                    resp.raise_for_status()
+                    return resp
+                reason, delay = f"HTTP {resp.status_code}", self._retry_delay(attempt, resp)
+                resp.close()
+            except requests.exceptions.HTTPError as e:
+                body = ""
+                try:
+                    body = e.response.text if e.response is not None else ""
+                except Exception:
+                    pass
+                log.error(f"HTTP error from {url}: {e}")
+                if body:
+                    log.error(f"Response body: {body}")
+                code = e.response.status_code if e.response is not None else "error"
+                raise AIProviderError(f"HTTP error: {code} {body or str(e)}")
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.max_retries or not self._retryable_error(e, idempotent):
+                    log.error(f"Request error to {url}: {e}")
+                    raise AIProviderError(f"Request failed: {e}")
+                reason, delay = type(e).__name__, self._retry_delay(attempt)
+            attempt += 1
+            log.warning(f"{reason} from {url}; retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            if self.on_retry:
+                try:
+                    self.on_retry({"provider": self.provider_name, "method": method, "url": url,
+                                   "reason": reason, "attempt": attempt, "delay": round(delay, 2)})
+                except Exception:
+                    pass
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise AIProviderError(f"Request cancelled while retrying ({reason})")
+            if hasattr(kwargs.get("data"), "seek"):
+                # Streamed bodies (MultipartFile) are sent again from the start
+                kwargs["data"].seek(0)
+
+    @staticmethod
+    def _retryable_error(exc, idempotent):
+        if idempotent:
+            return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        # Only if the request never reached the provider: resubmitting could start paid work twice
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+            return isinstance(getattr(exc.args[0], "reason", None), NewConnectionError)
+        return False
+
+    def _retry_delay(self, attempt, resp=None):
+        value = resp.headers.get("Retry-After") if resp is not None else None
+        if value:
+            try:
+                return min(120.0, max(0.0, float(value)))
+            except ValueError:
+                try:
+                    return min(120.0, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    def _poll_key(self, model):
+        return f"{self.provider_name}:{model or 'default'}"
+
+    def _poll_delay(self, model, attempt, elapsed):
+        if self.poll_strategy is not None:
+            return self.poll_strategy.delay(self._poll_key(model), attempt, elapsed)
+        return min(30.0, 1.5 ** attempt)
+
+    def _poll_done(self, model, elapsed):
+        if self.poll_strategy is not None:
+            self.poll_strategy.record(self._poll_key(model), elapsed)
+
+    @staticmethod
+    def _data_url(path, mime):
+        with open(path, "rb") as f:
+            return f"data:{mime};base64,{base64.b64encode(f.read()).decode()}"
+
+    def _file_reference(self, path, mime, upload):
+        """What to send for a local input file: a data URL if it is small, else upload(path, mime)."""
+        if self.file_uploads is not None:
+            return self.file_uploads.reference(self.provider_name, path, mime, upload)
+        if os.path.getsize(path) <= self.inline_max_bytes:
+            return self._data_url(path, mime)
+        return upload(path, mime)
 
     def download_file(self, url, output_path, headers=None):
-        kwargs = {"stream": True}
+        # File downloads (provider CDNs) don't count against the API rate limit
+        kwargs = {"stream": True, "rate_limited": False}
         if headers:
             kwargs["headers"] = headers
         r = self._make_request("GET", url, **kwargs)
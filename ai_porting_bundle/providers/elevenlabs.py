@@ -14,11 +14,19 @@ class ElevenLabsProvider(AIProvider):
     Defaults to the stock 'Rachel' voice if no voice_id is provided.
     """
 
+    provider_name = "elevenlabs"
+
     BASE_URL = "https://api.elevenlabs.io/v1/text-to-speech"
     SPEECH_TO_SPEECH_URL = "https://api.elevenlabs.io/v1/speech-to-speech"
     DEFAULT_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # Rachel
 
     def generate(self, text: str, voice_id: str = None, output_format: str = "mp3", model_id: str = None, voice_settings: dict = None, **kwargs) -> str:
+        url, headers, body = self._tts_request(text, voice_id, output_format, model_id, voice_settings)
+        resp = self._make_request("POST", url, headers=headers, json=body, timeout=120)
+        return self._save_audio(resp.content, resp.headers.get("Content-Type"), output_format, "elevenlabs_tts")
+
+    def _tts_request(self, text, voice_id, output_format, model_id, voice_settings):
+        """URL, headers and JSON body of a text-to-speech request."""
         if not self.api_key:
             raise AIProviderError("ElevenLabs API key not set")
         if not text or not text.strip():
@@ -39,16 +47,28 @@ class ElevenLabsProvider(AIProvider):
             body["model_id"] = model_id
         if voice_settings:
             body["voice_settings"] = voice_settings
+        return url, headers, body
 
-        resp = self._make_request("POST", url, headers=headers, json=body, timeout=120)
-        ctype = (resp.headers.get("Content-Type") or "").lower()
+    @staticmethod
+    def _save_audio(content, content_type, output_format, stem) -> str:
+        ctype = (content_type or "").lower()
         ext = ".mp3" if "mpeg" in ctype or output_format == "mp3" else ".wav"
-        out_path = os.path.join("/tmp", f"elevenlabs_tts{ext}")
+        out_path = os.path.join("/tmp", f"{stem}{ext}")
         with open(out_path, "wb") as f:
-            f.write(resp.content)
+            f.write(content)
         return out_path
 
     def speech_to_speech(self, audio_path: str, voice_id: str = None, model_id: str = "eleven_multilingual_sts_v2", output_format: str = "mp3", voice_settings: dict = None, remove_background_noise: bool = False) -> str:
+        url, headers, data, mime = self._sts_request(audio_path, voice_id, model_id, output_format, voice_settings, remove_background_noise)
+        with open(audio_path, "rb") as fh:
+            files = {
+                "audio": (os.path.basename(audio_path), fh, mime),
+            }
+            resp = self._make_request("POST", url, headers=headers, data=data, files=files, timeout=300)
+        return self._save_audio(resp.content, resp.headers.get("Content-Type"), output_format, "elevenlabs_voice_convert")
+
+    def _sts_request(self, audio_path, voice_id, model_id, output_format, voice_settings, remove_background_noise):
+        """URL, headers, form fields and audio mime type of a voice conversion request."""
         if not self.api_key:
             raise AIProviderError("ElevenLabs API key not set")
         if not audio_path or not os.path.exists(audio_path):
@@ -70,18 +90,6 @@ class ElevenLabsProvider(AIProvider):
         if voice_settings:
             import json
             data["voice_settings"] = json.dumps(voice_settings)
-
-        with open(audio_path, "rb") as fh:
-            files = {
-                "audio": (os.path.basename(audio_path), fh, mime),
-            }
-            resp = self._make_request("POST", url, headers=headers, data=data, files=files, timeout=300)
-
-        ctype = (resp.headers.get("Content-Type") or "").lower()
-        ext = ".mp3" if "mpeg" in ctype or output_format == "mp3" else ".wav"
-        out_path = os.path.join("/tmp", f"elevenlabs_voice_convert{ext}")
-        with open(out_path, "wb") as f:
-            f.write(resp.content)
-        return out_path
+        return url, headers, data, mime
 
 
@@ -26,6 +26,8 @@ except Exception:
 class ReplicateProvider(AIProvider):
     """Replicate Predictions API"""
 
+    provider_name = "replicate"
+
     BASE_URL = "https://api.replicate.com/v1/predictions"
 
     def generate(
@@ -76,20 +78,25 @@ class ReplicateProvider(AIProvider):
             model_url = self.BASE_URL
         body = {"input": inputs}
         try:
+            submitted_at = time.time()
             resp = self._make_request("POST", model_url, headers=headers, json=body, timeout=60)
             data = resp.json()
             pred_id = data.get("id")
             if not pred_id:
                 raise AIProviderError(f"No prediction id: {data}")
-            return self._poll_and_download(pred_id, headers, output_path)
+            return self._poll_and_download(pred_id, headers, output_path, model=model, submitted_at=submitted_at)
         except AIProviderError:
             raise
 
-    def _poll_and_download(self, pred_id, headers, output_path, max_wait=900, poll_interval=5):
+    def _poll_and_download(self, pred_id, headers, output_path, max_wait=900, model=None, submitted_at=None):
         url = f"{self.BASE_URL}/{pred_id}"
         start = time.time()
+        submitted_at = submitted_at or start
         last_status = None
+        attempt = 0
         while time.time() - start < max_wait:
+            time.sleep(self._poll_delay(model, attempt, time.time() - submitted_at))
+            attempt += 1
             r = self._make_request("GET", url, headers=headers)
             pj = r.json()
             status = pj.get("status")
@@ -97,6 +104,7 @@ class ReplicateProvider(AIProvider):
                 log.info(f"Replicate prediction {pred_id} status: {status}")
                 last_status = status
             if status == "succeeded":
+                self._poll_done(model, time.time() - submitted_at)
                 outputs = pj.get("output")
                 if isinstance(outputs, list) and outputs:
                     file_url = outputs[-1]
@@ -107,7 +115,7 @@ class ReplicateProvider(AIProvider):
                 if not output_path:
                     ext = None
                     try:
-                        head = self._make_request("HEAD", file_url, headers=headers)
+                        head = self._make_request("HEAD", file_url, headers=headers, rate_limited=False)
                         ctype = (head.headers.get("Content-Type") or "").lower()
                         if "video" in ctype:
                             ext = ".mp4"
@@ -126,7 +134,6 @@ class ReplicateProvider(AIProvider):
             if status in ("failed", "canceled"):
                 err = pj.get("error") or pj
                 raise AIProviderError(f"Prediction {pred_id} {status}: {err}")
-            time.sleep(poll_interval)
         raise AIProviderError("Prediction timed out")
 
     @staticmethod
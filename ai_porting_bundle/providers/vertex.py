@@ -13,6 +13,8 @@ from classes.logger import log
 
 
 class VertexVeoProvider(AIProvider):
+    provider_name = "vertex"
+
     DEFAULT_MODEL = "veo-3.1-generate-preview"
     BASE_URL = "https://us-central1-aiplatform.googleapis.com/v1"
 
@@ -135,6 +137,7 @@ class VertexVeoProvider(AIProvider):
 
         try:
             # Start the long-running operation
+            submitted_at = time.time()
             resp = self._make_request("POST", url, headers=headers, json=body, timeout=30)
             data = resp.json()
             
@@ -145,7 +148,7 @@ class VertexVeoProvider(AIProvider):
             log.info(f"Vertex AI operation started: {operation_name}")
             
             # Poll for completion
-            return self._poll_operation(operation_name, access_token, output_path)
+            return self._poll_operation(operation_name, access_token, output_path, submitted_at)
 
         except AIProviderError:
             raise
@@ -197,7 +200,7 @@ class VertexVeoProvider(AIProvider):
         except Exception as e:
             raise AIProviderError(f"Failed to upload image to GCS: {e}")
 
-    def _poll_operation(self, operation_name, access_token, output_path):
+    def _poll_operation(self, operation_name, access_token, output_path, submitted_at=None):
         """Poll the long-running operation until complete"""
         headers = {
             "Authorization": f"Bearer {access_token}",
@@ -219,17 +222,21 @@ class VertexVeoProvider(AIProvider):
             "operationName": operation_name
         }
 
-        max_polls = 120  # 10 minutes max (5 second intervals)
-        for i in range(max_polls):
-            time.sleep(5)
-            log.info(f"Polling Vertex AI operation ({i+1}/{max_polls})...")
+        start = time.time()
+        submitted_at = submitted_at or start
+        i = 0
+        while time.time() - start < 600:  # 10 minutes max
+            time.sleep(self._poll_delay(self.model, i, time.time() - submitted_at))
+            i += 1
+            log.info(f"Polling Vertex AI operation ({i})...")
             
             try:
-                resp = self._make_request("POST", fetch_url, headers=headers, json=body, timeout=30)
+                resp = self._make_request("POST", fetch_url, headers=headers, json=body, timeout=30, idempotent=True)
                 data = resp.json()
                 
                 if data.get("done"):
                     log.info("Vertex AI operation complete")
+                    self._poll_done(self.model, time.time() - submitted_at)
                     
                     # Check for errors
                     if "error" in data:
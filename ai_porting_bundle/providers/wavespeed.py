@@ -2,9 +2,9 @@
 WaveSpeed InfiniteTalk provider
 """
 
-import base64
 import mimetypes
 import os
+import tempfile
 import time
 
 try:
@@ -22,80 +22,130 @@ except Exception:
         def warning(self, *args, **kwargs): _logger.warning(*args, **kwargs)
         def error(self, *args, **kwargs): _logger.error(*args, **kwargs)
     log = _Log()
-from .base import AIProvider, AIProviderError
+from .base import AIProvider, AIProviderError, MultipartFile
 
 
 class WaveSpeedProvider(AIProvider):
     """Client for WaveSpeed InfiniteTalk REST API"""
 
+    provider_name = "wavespeed"
+
     SUBMIT_URL_IMAGE = "https://api.wavespeed.ai/api/v3/wavespeed-ai/infinitetalk"
     SUBMIT_URL_VIDEO = "https://api.wavespeed.ai/api/v3/wavespeed-ai/infinitetalk/video-to-video"
     RESULT_URL = "https://api.wavespeed.ai/api/v3/predictions/{request_id}/result"
+    UPLOAD_URL = "https://api.wavespeed.ai/api/v3/media/upload/binary"
 
     def __init__(self, api_key: str):
         super().__init__(api_key=api_key)
         if not self.api_key:
             raise AIProviderError("WaveSpeed API key not set")
 
-    def _file_to_data_url(self, path, fallback_mime):
+    def _file_url(self, path, fallback_mime):
+        """An input file as a data URL if it is small, else uploaded to WaveSpeed and passed by URL."""
         if not path or not os.path.exists(path):
             raise AIProviderError(f"File not found: {path}")
         mime = mimetypes.guess_type(path)[0] or fallback_mime
-        with open(path, "rb") as f:
-            data = base64.b64encode(f.read()).decode("utf-8")
-        return f"data:{mime};base64,{data}"
+        return self._file_reference(path, mime, self._upload_file)
+
+    def _upload_file(self, path, mime):
+        """Stream a file to WaveSpeed's media upload; returns its download URL."""
+        body = MultipartFile(path, "file", mime)
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": body.content_type}
+        try:
+            # A repeated upload at worst leaves an unused copy, so retry it like a read
+            resp = self._make_request("POST", self.UPLOAD_URL, idempotent=True, headers=headers, data=body, timeout=600)
+        finally:
+            body.close()
+        data = resp.json()
+        url = (data.get("data") or {}).get("download_url")
+        if not url:
+            raise AIProviderError(f"WaveSpeed upload returned no URL: {data}")
+        log.info(f"WaveSpeed uploaded {os.path.basename(path)} ({len(body) // 1024} KB)")
+        return url
 
-    def _poll_result(self, request_id, headers, timeout=600, direct_url=None):
+    def _poll_result(self, request_id, headers, timeout=600, direct_url=None, cancel_event=None, model=None, submitted_at=None):
         start = time.time()
+        submitted_at = submitted_at or start
+        attempt = 0
         while time.time() - start < timeout:
-            time.sleep(5)
+            delay = self._poll_delay(model, attempt, time.time() - submitted_at)
+            attempt += 1
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                # WaveSpeed has no cancel endpoint; stop polling and drop the result
+                raise AIProviderError(f"WaveSpeed request {request_id} cancelled")
             url = direct_url or self.RESULT_URL.format(request_id=request_id)
-            resp = self._make_request("GET", url, headers=headers, timeout=60)
-            data = resp.json()
+            resp = self._make_request("GET", url, headers=headers, timeout=60, cancel_event=cancel_event)
+            video_url = self._parse_result(request_id, resp.json())
+            if video_url:
+                self._poll_done(model, time.time() - submitted_at)
+                return video_url
+
+        raise AIProviderError("WaveSpeed request timed out")
+
+    @staticmethod
+    def _parse_result(request_id, data):
+        """The video URL of a finished request, None while it is still running; raises if it failed."""
+        # WaveSpeed returns nested structure: {"data": {"status": "...", "outputs": [...]}}
+        data_block = data.get("data") or data
+        status = (data_block.get("status") or data_block.get("state") or data.get("status") or "").lower()
+        log.info(f"WaveSpeed status {status} for request {request_id}")
+        
+        if status in {"completed", "success", "succeeded", "finished"}:
+            # Try multiple paths to find video URL
+            result = data_block.get("result") or data_block
+            outputs = data_block.get("outputs") or []
             
-            # WaveSpeed returns nested structure: {"data": {"status": "...", "outputs": [...]}}
-            data_block = data.get("data") or data
-            status = (data_block.get("status") or data_block.get("state") or data.get("status") or "").lower()
-            log.info(f"WaveSpeed status {status} for request {request_id}")
+            # Check outputs array first
+            if outputs and len(outputs) > 0:
+                video_url = outputs[0] if isinstance(outputs[0], str) else None
+            else:
+                # Fallback to various possible keys
+                video_url = (
+                    result.get("videoUrl") or 
+                    result.get("video_url") or 
+                    result.get("video") or 
+                    result.get("url") or
+                    data.get("videoUrl") or
+                    data.get("video_url")
+                )
             
-            if status in {"completed", "success", "succeeded", "finished"}:
-                # Try multiple paths to find video URL
-                result = data_block.get("result") or data_block
-                outputs = data_block.get("outputs") or []
-                
-                # Check outputs array first
-                if outputs and len(outputs) > 0:
-                    video_url = outputs[0] if isinstance(outputs[0], str) else None
-                else:
-                    # Fallback to various possible keys
-                    video_url = (
-                        result.get("videoUrl") or 
-                        result.get("video_url") or 
-                        result.get("video") or 
-                        result.get("url") or
-                        data.get("videoUrl") or
-                        data.get("video_url")
-                    )
-                
-                if not video_url:
-                    log.error(f"WaveSpeed: completed but no video url. Full response: {data}")
-                    raise AIProviderError(f"WaveSpeed: completed but no video url in response")
-                
-                log.info(f"WaveSpeed video URL found: {video_url}")
-                return video_url
+            if not video_url:
+                log.error(f"WaveSpeed: completed but no video url. Full response: {data}")
+                raise AIProviderError(f"WaveSpeed: completed but no video url in response")
             
-            if status in {"failed", "error"}:
-                error_msg = data_block.get("error") or data.get("error") or "Unknown error"
-                raise AIProviderError(f"WaveSpeed request failed: {error_msg}")
+            log.info(f"WaveSpeed video URL found: {video_url}")
+            return video_url
         
-        raise AIProviderError("WaveSpeed request timed out")
+        if status in {"failed", "error"}:
+            error_msg = data_block.get("error") or data.get("error") or "Unknown error"
+            raise AIProviderError(f"WaveSpeed request failed: {error_msg}")
+        return None
 
-    def generate(self, prompt, image_path=None, audio_path=None, video_path=None, resolution="720p", seed=-1, output_path=None, **kwargs) -> str:
-        headers = {
+    def _headers(self):
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
-        
+
+    def generate(self, prompt, image_path=None, audio_path=None, video_path=None, resolution="720p", seed=-1, output_path=None, on_submitted=None, cancel_event=None, **kwargs) -> str:
+        """
+        Submit, poll and download. `on_submitted(handle)` is called as soon as
+        WaveSpeed accepts the request so callers can persist the handle and
+        finish the job later with resume(). Setting `cancel_event` (a
+        threading.Event) stops polling.
+        """
+        submit_url, payload = self._submit_request(prompt, image_path, audio_path, video_path, resolution, seed)
+        submitted_at = time.time()
+        submit_resp = self._make_request("POST", submit_url, headers=self._headers(), json=payload, timeout=120)
+        handle = self._submit_handle(submit_resp.json(), self._model(submit_url), submitted_at)
+        if on_submitted:
+            on_submitted(handle)
+        return self.resume(handle, output_path=output_path, cancel_event=cancel_event)
+
+    def _submit_request(self, prompt, image_path, audio_path, video_path, resolution, seed):
+        """Endpoint and payload for a submission (image + audio, or video + audio)."""
         # WaveSpeed has TWO different endpoints:
         # 1. /infinitetalk - for image + audio (requires "image" field)
         # 2. /infinitetalk/video-to-video - for video + audio (requires "video" field)
@@ -104,8 +154,8 @@ class WaveSpeedProvider(AIProvider):
             # Use video-to-video endpoint
             submit_url = self.SUBMIT_URL_VIDEO
             payload = {
-                "audio": self._file_to_data_url(audio_path, "audio/mpeg"),
-                "video": self._file_to_data_url(video_path, "video/mp4"),
+                "audio": self._file_url(audio_path, "audio/mpeg"),
+                "video": self._file_url(video_path, "video/mp4"),
                 "prompt": prompt or "",
                 "resolution": resolution or "480p",
                 "seed": seed if seed is not None else -1,
@@ -115,8 +165,8 @@ class WaveSpeedProvider(AIProvider):
             # Use image-to-video endpoint
             submit_url = self.SUBMIT_URL_IMAGE
             payload = {
-                "audio": self._file_to_data_url(audio_path, "audio/mpeg"),
-                "image": self._file_to_data_url(image_path, "image/jpeg"),
+                "audio": self._file_url(audio_path, "audio/mpeg"),
+                "image": self._file_url(image_path, "image/jpeg"),
                 "prompt": prompt or "",
                 "resolution": resolution or "480p",
                 "seed": seed if seed is not None else -1,
@@ -125,8 +175,15 @@ class WaveSpeedProvider(AIProvider):
         
         # Remove None keys
         payload = {k: v for k, v in payload.items() if v is not None}
-        submit_resp = self._make_request("POST", submit_url, headers=headers, json=payload, timeout=120)
-        submit_data = submit_resp.json()
+        return submit_url, payload
+
+    @staticmethod
+    def _model(submit_url):
+        """Model path of a submit URL, e.g. "wavespeed-ai/infinitetalk/video-to-video"."""
+        return submit_url.split("/api/v3/", 1)[-1]
+
+    @staticmethod
+    def _submit_handle(submit_data, model=None, submitted_at=None):
         data_block = submit_data.get("data") or {}
         request_id = submit_data.get("requestId") or submit_data.get("id") or data_block.get("id")
         result_url = (
@@ -137,10 +194,19 @@ class WaveSpeedProvider(AIProvider):
         if not request_id:
             raise AIProviderError(f"WaveSpeed response missing request id: {submit_data}")
         log.info(f"WaveSpeed request id: {request_id}")
-        video_url = self._poll_result(request_id, headers, direct_url=result_url)
+        return {"provider": "wavespeed", "request_id": request_id, "result_url": result_url,
+                "model": model, "submitted_at": submitted_at}
+
+    def resume(self, handle, output_path=None, cancel_event=None) -> str:
+        """Poll a previously submitted request (see generate) and download the result."""
+        headers = self._headers()
+        request_id = handle["request_id"]
+        video_url = self._poll_result(request_id, headers, direct_url=handle.get("result_url"), cancel_event=cancel_event,
+                                      model=handle.get("model"), submitted_at=handle.get("submitted_at"))
         log.info(f"WaveSpeed video url: {video_url}")
         if not output_path:
-            output_path = os.path.join("/tmp", f"wavespeed_{int(time.time())}.mp4")
+            fd, output_path = tempfile.mkstemp(prefix="wavespeed_", suffix=".mp4")
+            os.close(fd)
         self.download_file(video_url, output_path, headers=headers)
         return output_path
 
@@ -0,0 +1,352 @@
+"""
+Async variants of the provider clients, run on the shared poller loop
+(backend.ai.poller).
+
+Each mirrors its sync client's generate/resume API as coroutines and reuses
+that client's request builders and response parsers, so payloads and result
+handling are identical; only the I/O differs. Blocking preparation (reading
+and encoding input files, GCS uploads, OAuth token refresh) and the
+`on_submitted(handle)` callback run in a worker thread via asyncio.to_thread,
+keeping the loop free for polling. Handles are the same as the sync
+clients', so a render submitted by one can be resumed by the other.
+
+Cancelling the task while it polls cancels the prediction remotely where the
+provider supports it. With webhooks on (backend.ai.webhooks), Replicate and
+WaveSpeed predictions are submitted with a callback URL and their pollers
+wake as soon as the completion is delivered, polling only as a slow fallback.
+"""
+
+import asyncio
+import base64
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from ai_porting_bundle.providers.base import AIProviderError
+from ai_porting_bundle.providers.elevenlabs import ElevenLabsProvider
+from ai_porting_bundle.providers.wavespeed import WaveSpeedProvider
+from backend.ai.poller import poller
+from backend.ai.polling import MAX_PREFER_WAIT, adaptive_polling, poll_key
+from backend.ai.replicate_client import ReplicateClient
+from backend.ai.retry import POLL
+from backend.ai.vertex_client import VertexClient
+from backend.ai.webhooks import webhooks
+
+
+async def _notify_submitted(on_submitted: Optional[Callable[[Dict[str, Any]], None]], handle: Dict[str, Any]) -> None:
+    if on_submitted:
+        await asyncio.to_thread(on_submitted, handle)
+
+
+def _temp_path(prefix: str, suffix: str = ".mp4") -> str:
+    """A fresh file in the temp dir: many renders finish in the same second."""
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def _write_base64(path: str, data: str) -> None:
+    with open(path, "wb") as f:
+        f.write(base64.b64decode(data))
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _raise_provider_error(response: httpx.Response) -> None:
+    """The bundle providers' HTTP error, for the WaveSpeed / ElevenLabs variants."""
+    if response.is_error:
+        raise AIProviderError(f"HTTP error: {response.status_code} {response.text}")
+
+
+class AsyncReplicateClient:
+    """ReplicateClient on the poller loop."""
+
+    def __init__(self, api_token: Optional[str] = None, timeout: int = 60):
+        self.sync = ReplicateClient(api_token=api_token, timeout=timeout)
+        self.timeout = timeout
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await poller.request("replicate", method, url, headers=self.sync._headers(), timeout=self.timeout, **kwargs)
+
+    async def _submit(self, url: str, payload: Dict[str, Any], model: str, output: str,
+                      on_submitted: Optional[Callable[[Dict[str, Any]], None]]):
+        """Create a prediction and wait for its output (`Prefer: wait` as in ReplicateClient._submit)."""
+        key = poll_key("replicate", model)
+        wait = adaptive_polling.prefer_wait(key, unknown=MAX_PREFER_WAIT if output == "images" else 0)
+        headers = self.sync._headers()
+        if wait:
+            headers["Prefer"] = f"wait={wait}"
+        callback = await asyncio.to_thread(webhooks.callback_url, "replicate")
+        if callback:
+            payload = {**payload, "webhook": callback, "webhook_events_filter": ["completed"]}
+        submitted_at = time.time()
+        r = await poller.request("replicate", "POST", url, headers=headers, json=payload, timeout=self.timeout + wait)
+        if r.is_error:
+            print(f"[REPLICATE] HTTP Error {r.status_code}: {r.text}")
+            try:
+                detail = r.json().get("detail")
+            except ValueError:
+                detail = None
+            if detail:
+                raise RuntimeError(f"Replicate API Error: {detail}")
+            raise RuntimeError(f"Replicate API HTTP {r.status_code}: {r.text}")
+        data = r.json()
+        pred_id = data.get("id")
+        if not pred_id:
+            raise RuntimeError(f"Replicate did not return a prediction id: {data}")
+        handle = {"provider": "replicate", "prediction_id": pred_id, "output": output, "model": model,
+                  "submitted_at": submitted_at, "webhook": bool(callback)}
+        await _notify_submitted(on_submitted, handle)
+        result = self.sync._prediction_output(pred_id, data, output == "images")
+        if result is not None:
+            await asyncio.to_thread(adaptive_polling.record, key, time.time() - submitted_at)
+            return result
+        return await self.resume(handle)
+
+    async def generate_video(
+        self,
+        model: str,
+        prompt: str,
+        first_frame_image: Optional[str] = None,
+        last_frame_image: Optional[str] = None,
+        reference_images: Optional[list] = None,
+        duration: int = 8,
+        resolution: str = "1080p",
+        aspect_ratio: str = "16:9",
+        generate_audio: bool = True,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> str:
+        """ReplicateClient.generate_video; returns the output URL."""
+        url, payload = await asyncio.to_thread(
+            self.sync._video_request, model, prompt, first_frame_image, last_frame_image,
+            duration, resolution, aspect_ratio, generate_audio,
+        )
+        return await self._submit(url, payload, model, "video", on_submitted)
+
+    async def generate_image(
+        self,
+        model: str,
+        prompt: str,
+        reference_images: Optional[list] = None,
+        aspect_ratio: Optional[str] = None,
+        num_outputs: Optional[int] = None,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **kwargs,
+    ) -> list:
+        """ReplicateClient.generate_image; returns the image URLs."""
+        url, payload = await asyncio.to_thread(
+            self.sync._image_request, model, prompt, reference_images, aspect_ratio, num_outputs, **kwargs,
+        )
+        return await self._submit(url, payload, model, "images", on_submitted)
+
+    async def resume(self, handle: Dict[str, Any], max_wait: float = 900):
+        """Poll a prediction to completion; cancelling the task cancels the prediction."""
+        prediction_id = handle["prediction_id"]
+        images = handle.get("output") == "images"
+        key = poll_key("replicate", handle.get("model"))
+        submitted_at = handle.get("submitted_at") or time.time()
+        status_url = f"{self.sync.base_predictions}/{prediction_id}"
+        deadline = time.time() + max_wait
+        attempt = 0
+        try:
+            while time.time() < deadline:
+                delay = webhooks.poll_delay(adaptive_polling.delay(key, attempt, time.time() - submitted_at), handle)
+                # The webhook payload is the prediction itself
+                pj = await webhooks.wait("replicate", prediction_id, min(delay, max(0.0, deadline - time.time())))
+                if pj is None:
+                    attempt += 1
+                    rr = await self._request("GET", status_url)
+                    rr.raise_for_status()
+                    pj = rr.json()
+                output = self.sync._prediction_output(prediction_id, pj, images)
+                if output is not None:
+                    await asyncio.to_thread(adaptive_polling.record, key, time.time() - submitted_at)
+                    return output
+        except asyncio.CancelledError:
+            await self.cancel_prediction(prediction_id)
+            raise
+        raise RuntimeError("Replicate prediction timed out")
+
+    async def cancel_prediction(self, prediction_id: str) -> None:
+        """Ask Replicate to stop a prediction (best-effort)."""
+        try:
+            r = await self._request("POST", f"{self.sync.base_predictions}/{prediction_id}/cancel")
+            print(f"[REPLICATE] Cancel prediction {prediction_id}: HTTP {r.status_code}")
+        except Exception as e:
+            print(f"[REPLICATE] Failed to cancel prediction {prediction_id}: {e}")
+
+
+class AsyncVertexClient:
+    """VertexClient (Veo) on the poller loop."""
+
+    def __init__(self, credentials_path: str, project_id: str, location: str = "us-central1",
+                 model: str = "veo-3.1-fast-generate-preview", temp_bucket: Optional[str] = None, timeout: int = 60):
+        self.sync = VertexClient(credentials_path=credentials_path, project_id=project_id, location=location,
+                                 model=model, temp_bucket=temp_bucket, timeout=timeout)
+        self.timeout = timeout
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        # The token refresh is a blocking call through google-auth
+        headers = await asyncio.to_thread(self.sync._headers)
+        return await poller.request("vertex", method, url, headers=headers, timeout=self.timeout, **kwargs)
+
+    async def generate_video(
+        self,
+        prompt: str,
+        first_frame_image: Optional[str] = None,
+        last_frame_image: Optional[str] = None,
+        reference_images: Optional[List[str]] = None,
+        duration: int = 8,
+        resolution: str = "1080p",
+        aspect_ratio: str = "16:9",
+        generate_audio: bool = False,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> str:
+        """VertexClient.generate_video; returns the local path of the downloaded video."""
+        url, body = await asyncio.to_thread(
+            self.sync._video_request, prompt, first_frame_image, last_frame_image, reference_images,
+            aspect_ratio, generate_audio,
+        )
+        submitted_at = time.time()
+        r = await self._request("POST", url, json=body)
+        if r.is_error:
+            print(f"[VERTEX] HTTP Error: {r.status_code}")
+            print(f"[VERTEX] Response: {r.text}")
+            r.raise_for_status()
+        op_name = r.json().get("name")
+        if not op_name:
+            raise RuntimeError(f"Vertex: no operation name: {r.text}")
+        handle = self.sync._handle(op_name, submitted_at)
+        await _notify_submitted(on_submitted, handle)
+        return await self.resume(handle)
+
+    async def resume(self, handle: Dict[str, Any], max_wait: float = 600) -> str:
+        """Poll an operation and download its video; cancelling the task cancels the operation."""
+        operation_name = handle["operation_name"]
+        key = poll_key("vertex", handle.get("model") or self.sync.model)
+        submitted_at = handle.get("submitted_at") or time.time()
+        fetch_url = self.sync._fetch_url()
+        deadline = time.time() + max_wait
+        attempt = 0
+        try:
+            while True:
+                if time.time() >= deadline:
+                    raise RuntimeError("Vertex: operation timed out")
+                await asyncio.sleep(adaptive_polling.delay(key, attempt, time.time() - submitted_at))
+                attempt += 1
+                rr = await self._request("POST", fetch_url, json={"operationName": operation_name}, policy=POLL)
+                rr.raise_for_status()
+                v = self.sync._operation_video(rr.json())
+                if v is not None:
+                    await asyncio.to_thread(adaptive_polling.record, key, time.time() - submitted_at)
+                    break
+        except asyncio.CancelledError:
+            await self.cancel_operation(operation_name)
+            raise
+        out = _temp_path("vertex_")
+        if "gcsUri" in v:
+            http_url = v["gcsUri"].replace("gs://", "https://storage.googleapis.com/")
+            headers = await asyncio.to_thread(self.sync._headers)
+            return await poller.download("vertex", http_url, out, headers=headers)
+        await asyncio.to_thread(_write_base64, out, v["bytesBase64Encoded"])
+        return out
+
+    async def cancel_operation(self, operation_name: str) -> None:
+        """Ask Vertex to stop a long-running operation (best-effort)."""
+        try:
+            url = f"https://{self.sync.location}-aiplatform.googleapis.com/v1/{operation_name}:cancel"
+            r = await self._request("POST", url, json={})
+            print(f"[VERTEX] Cancel operation {operation_name}: HTTP {r.status_code}")
+        except Exception as e:
+            print(f"[VERTEX] Failed to cancel operation {operation_name}: {e}")
+
+
+class AsyncWaveSpeedProvider:
+    """WaveSpeedProvider (InfiniteTalk lip-sync) on the poller loop."""
+
+    def __init__(self, api_key: str):
+        self.sync = WaveSpeedProvider(api_key=api_key)
+
+    async def generate(self, prompt: str, image_path: Optional[str] = None, audio_path: Optional[str] = None,
+                       video_path: Optional[str] = None, resolution: str = "720p", seed: int = -1,
+                       output_path: Optional[str] = None,
+                       on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """WaveSpeedProvider.generate: submit, poll and download; returns the local video path."""
+        submit_url, payload = await asyncio.to_thread(
+            self.sync._submit_request, prompt, image_path, audio_path, video_path, resolution, seed,
+        )
+        model = self.sync._model(submit_url)
+        callback = await asyncio.to_thread(webhooks.callback_url, "wavespeed")
+        params = {"webhook": callback} if callback else None
+        submitted_at = time.time()
+        resp = await poller.request("wavespeed", "POST", submit_url, headers=self.sync._headers(), json=payload,
+                                    params=params, timeout=120)
+        _raise_provider_error(resp)
+        handle = self.sync._submit_handle(resp.json(), model, submitted_at)
+        handle["webhook"] = bool(callback)
+        await _notify_submitted(on_submitted, handle)
+        return await self.resume(handle, output_path=output_path)
+
+    async def resume(self, handle: Dict[str, Any], output_path: Optional[str] = None, timeout: float = 600) -> str:
+        """Poll a submitted request and download the result (WaveSpeed has no cancel endpoint)."""
+        request_id = handle["request_id"]
+        url = handle.get("result_url") or self.sync.RESULT_URL.format(request_id=request_id)
+        key = poll_key("wavespeed", handle.get("model"))
+        submitted_at = handle.get("submitted_at") or time.time()
+        deadline = time.time() + timeout
+        attempt = 0
+        while True:
+            if time.time() >= deadline:
+                raise AIProviderError("WaveSpeed request timed out")
+            delay = webhooks.poll_delay(adaptive_polling.delay(key, attempt, time.time() - submitted_at), handle)
+            data = await webhooks.wait("wavespeed", request_id, min(delay, max(0.0, deadline - time.time())))
+            if data is None:
+                attempt += 1
+                resp = await poller.request("wavespeed", "GET", url, headers=self.sync._headers(), timeout=60)
+                _raise_provider_error(resp)
+                data = resp.json()
+            video_url = self.sync._parse_result(request_id, data)
+            if video_url:
+                await asyncio.to_thread(adaptive_polling.record, key, time.time() - submitted_at)
+                break
+        if not output_path:
+            output_path = _temp_path("wavespeed_")
+        return await poller.download("wavespeed", video_url, output_path, headers=self.sync._headers())
+
+
+class AsyncElevenLabsProvider:
+    """ElevenLabsProvider (TTS / voice conversion) on the poller loop."""
+
+    def __init__(self, api_key: str):
+        self.sync = ElevenLabsProvider(api_key=api_key)
+
+    async def generate(self, text: str, voice_id: Optional[str] = None, output_format: str = "mp3",
+                       model_id: Optional[str] = None, voice_settings: Optional[dict] = None) -> str:
+        url, headers, body = self.sync._tts_request(text, voice_id, output_format, model_id, voice_settings)
+        resp = await poller.request("elevenlabs", "POST", url, headers=headers, json=body, timeout=120)
+        _raise_provider_error(resp)
+        return await asyncio.to_thread(
+            self.sync._save_audio, resp.content, resp.headers.get("Content-Type"), output_format, "elevenlabs_tts",
+        )
+
+    async def speech_to_speech(self, audio_path: str, voice_id: Optional[str] = None,
+                               model_id: str = "eleven_multilingual_sts_v2", output_format: str = "mp3",
+                               voice_settings: Optional[dict] = None, remove_background_noise: bool = False) -> str:
+        url, headers, data, mime = self.sync._sts_request(
+            audio_path, voice_id, model_id, output_format, voice_settings, remove_background_noise,
+        )
+        # In memory, so a retried request can send the file again
+        audio = await asyncio.to_thread(_read_bytes, audio_path)
+        files = {"audio": (os.path.basename(audio_path), audio, mime)}
+        resp = await poller.request("elevenlabs", "POST", url, headers=headers, data=data, files=files, timeout=300)
+        _raise_provider_error(resp)
+        return await asyncio.to_thread(
+            self.sync._save_audio, resp.content, resp.headers.get("Content-Type"), output_format,
+            "elevenlabs_voice_convert",
+        )
@@ -6,7 +6,8 @@ with camera angles, subjects, actions, and prompt suggestions.
 import json
 import logging
 from typing import Optional, List, Dict, Any
-import requests
+
+from backend.ai.ratelimit import limited_request
 
 logger = logging.getLogger(__name__)
 
@@ -208,8 +209,8 @@ def _call_anthropic(user_message: str, api_key: str) -> List[Dict[str, Any]]:
     """Call Claude API for shot planning."""
     logger.info("Calling Anthropic API (claude-sonnet-4-20250514)...")
 
-    response = requests.post(
-        "https://api.anthropic.com/v1/messages",
+    response = limited_request(
+        "anthropic", "POST", "https://api.anthropic.com/v1/messages",
         headers={
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01",
@@ -240,8 +241,8 @@ def _call_openai(user_message: str, api_key: str) -> List[Dict[str, Any]]:
     """Call OpenAI API for shot planning."""
     logger.info("Calling OpenAI API (gpt-4.1-2025-04-14)...")
 
-    response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
+    response = limited_request(
+        "openai", "POST", "https://api.openai.com/v1/chat/completions",
         headers={
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -368,8 +369,8 @@ Scene Context: {scene_context}
 
     try:
         if provider == "anthropic":
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
+            response = limited_request(
+                "anthropic", "POST", "https://api.anthropic.com/v1/messages",
                 headers={
                     "x-api-key": api_key,
                     "anthropic-version": "2023-06-01",
@@ -386,8 +387,8 @@ Scene Context: {scene_context}
             if response.status_code == 200:
                 return response.json().get("content", [{}])[0].get("text", "").strip()
         else:
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
+            response = limited_request(
+                "openai", "POST", "https://api.openai.com/v1/chat/completions",
                 headers={
                     "Authorization": f"Bearer {api_key}",
                     "Content-Type": "application/json"
@@ -0,0 +1,194 @@
+"""
+One event loop for every outstanding provider prediction.
+
+The sync clients poll from a job thread that sleeps between status checks, so
+each render in flight holds a thread for its whole duration. The async
+clients (backend.ai.async_clients) run instead as coroutines on the poller's
+event loop, which lives on a single background thread started on first use:
+hundreds of predictions waiting on providers cost one thread and a pool of
+keep-alive sockets.
+
+Threads hand a coroutine to poller.submit() and get a concurrent Future back
+(the job scheduler waits on it without holding a worker slot, see
+JobScheduler.wait). Cancelling the CancelToken passed along cancels the task;
+the clients then cancel the prediction remotely.
+
+Requests from the loop share the provider rate limits and retry policies with
+the sync clients (backend.ai.ratelimit, backend.ai.retry) and go out on one
+httpx.AsyncClient per provider, sized from the http_* settings.
+"""
+
+import asyncio
+from concurrent.futures import Future
+import contextlib
+import contextvars
+import os
+import threading
+from typing import Any, AsyncIterator, Coroutine, Dict, Optional
+
+import httpx
+
+from backend.ai.ratelimit import rate_limits
+from backend.ai.retry import POLL, SUBMIT, RetryPolicy, notify_retry
+from backend.ai.sessions import http_sessions
+
+# Bytes per disk write while downloading results
+DOWNLOAD_CHUNK = 1 << 20
+
+# Cancel token of the job the current poller task works for (tags retry events)
+current_cancel_event: contextvars.ContextVar = contextvars.ContextVar("current_cancel_event", default=None)
+
+
+def should_retry_error(policy: RetryPolicy, exc: Exception) -> bool:
+    """RetryPolicy.should_retry_error for httpx errors."""
+    if policy.idempotent:
+        return isinstance(exc, httpx.TransportError)
+    # ConnectError / ConnectTimeout: no connection, so the request never reached the provider
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+class Poller:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Only touched from the loop thread: the current client per provider, and
+        # how many requests each client (current or replaced) has in flight
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._in_use: Dict[httpx.AsyncClient, int] = {}
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="provider-poller", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro: Coroutine, cancel_event: Optional[Any] = None) -> Future:
+        """
+        Run `coro` on the poller loop; returns a Future for its result.
+        Cancelling `cancel_event` (a CancelToken) cancels the task.
+        """
+        async def run():
+            current_cancel_event.set(cancel_event)
+            return await coro
+
+        with self._lock:
+            self.active += 1
+            self.submitted += 1
+        future = asyncio.run_coroutine_threadsafe(run(), self.loop())
+        on_cancel = getattr(cancel_event, "on_cancel", None)
+        unregister = on_cancel(future.cancel) if on_cancel else None
+
+        def done(_):
+            if unregister is not None:
+                unregister()
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+        future.add_done_callback(done)
+        return future
+
+    def configure(self, settings: Dict[str, Any]) -> None:
+        """Rebuild the HTTP clients after the http_* settings changed (call after http_sessions.configure)."""
+        with self._lock:
+            loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._reset_clients)
+
+    def _reset_clients(self) -> None:
+        # Replaced clients are closed once their in-flight requests finish (see _use)
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            if not self._in_use.get(client):
+                self._in_use.pop(client, None)
+                asyncio.ensure_future(client.aclose())
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        """The keep-alive client for `provider` (call from the loop)."""
+        client = self._clients.get(provider)
+        if client is None:
+            size = max([http_sessions.pool_size, *http_sessions.host_pool_sizes.values()])
+            client = self._clients[provider] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=size),
+                timeout=httpx.Timeout(http_sessions.read_timeout, connect=http_sessions.connect_timeout),
+                follow_redirects=True,
+            )
+        return client
+
+    @contextlib.asynccontextmanager
+    async def _use(self, provider: str) -> AsyncIterator[httpx.AsyncClient]:
+        """The current client for `provider`, kept open until the caller is done with it."""
+        client = self.client(provider)
+        self._in_use[client] = self._in_use.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            self._in_use[client] -= 1
+            if not self._in_use[client] and client not in self._clients.values():
+                del self._in_use[client]
+                await client.aclose()
+
+    async def request(self, provider: str, method: str, url: str, policy: Optional[RetryPolicy] = None,
+                      **kwargs) -> httpx.Response:
+        """
+        request_with_retry for coroutines: a request under `provider`'s rate
+        limit, retried per `policy` (POLL for GET/HEAD, SUBMIT otherwise).
+        Returns the last response once retries are used up.
+        """
+        if policy is None:
+            policy = POLL if method in ("GET", "HEAD") else SUBMIT
+        connect, read = http_sessions.timeout(kwargs.pop("timeout", None))
+        kwargs["timeout"] = httpx.Timeout(read, connect=connect)
+        attempt = 0
+        while True:
+            try:
+                async with rate_limits.async_slot(provider), self._use(provider) as client:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt + 1 >= policy.attempts or not should_retry_error(policy, e):
+                    raise
+                reason, delay = type(e).__name__, policy.delay(attempt)
+            else:
+                if response.status_code not in policy.statuses or attempt + 1 >= policy.attempts:
+                    return response
+                reason, delay = f"HTTP {response.status_code}", policy.delay(attempt, response)
+            attempt += 1
+            print(f"[RETRY] {provider} {method} {url}: {reason}; retry {attempt}/{policy.attempts - 1} in {delay:.1f}s")
+            notify_retry({"provider": provider, "method": method, "url": url, "reason": reason,
+                          "attempt": attempt, "delay": round(delay, 2),
+                          "job_id": getattr(current_cancel_event.get(), "job_id", None)})
+            await asyncio.sleep(delay)
+
+    async def download(self, provider: str, url: str, path: str, headers: Optional[Dict[str, str]] = None) -> str:
+        """
+        Stream `url` to `path` on `provider`'s client (result downloads skip the
+        API rate limit). Disk writes run in a worker thread so a large file
+        does not stall the loop.
+        """
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path) or "/tmp", exist_ok=True)
+        async with self._use(provider) as client, client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            f = await asyncio.to_thread(open, path, "wb")
+            try:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK):
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._loop is not None,
+                "active": self.active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+            }
+
+
+poller = Poller()
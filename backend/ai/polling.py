@@ -0,0 +1,147 @@
+"""
+Adaptive polling for provider predictions.
+
+Status checks no longer run on a fixed 5 s interval. The first check comes
+after `poll_initial_interval` (default 1 s) and the interval then grows by
+half each time up to `poll_max_interval` (default 30 s), so fast image
+generations are picked up within a second or two while a 10-minute render
+costs a few dozen requests instead of 120.
+
+Once a model's typical render time is known, the schedule follows it: polls
+are sparse until shortly before the render is expected to finish and dense
+around that point. Typical times are learned per provider and model from
+completed predictions (an exponentially weighted average) and kept in
+~/.openfilmai/poll_priors.json, so they survive restarts.
+"""
+
+import json
+from pathlib import Path
+import threading
+from typing import Any, Dict, Optional
+
+from backend.storage.codec import JsonCodec
+from backend.storage.settings import GLOBAL_DIR
+
+DEFAULT_INITIAL_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 30.0
+GROWTH = 1.5
+# Weight of the newest sample in a model's expected duration
+SAMPLE_WEIGHT = 0.3
+# Start polling densely at this fraction of the expected duration
+EXPECTED_LEAD = 0.8
+# Replicate holds a `Prefer: wait` request open for at most 60 s
+MAX_PREFER_WAIT = 60
+# The priors file stays readable (indent=2)
+_PRIORS_CODEC = JsonCodec(pretty=True)
+
+
+def poll_key(provider: str, model: Optional[str]) -> str:
+    return f"{provider}:{model or 'default'}"
+
+
+class AdaptivePolling:
+    def __init__(self, path: Optional[Path] = None):
+        self._lock = threading.Lock()
+        self.path = path
+        self.initial_interval = DEFAULT_INITIAL_INTERVAL
+        self.max_interval = DEFAULT_MAX_INTERVAL
+        self._priors: Optional[Dict[str, Dict[str, float]]] = None
+        # Serializes writes of the priors file; `_version` counts changes, `_saved` the last one on disk
+        self._io_lock = threading.Lock()
+        self._version = 0
+        self._saved = 0
+        self.polls = 0
+
+    def configure(self, settings: Dict[str, Any]) -> None:
+        """Apply the `poll_initial_interval` / `poll_max_interval` settings (seconds)."""
+        self.initial_interval = float(settings.get("poll_initial_interval") or DEFAULT_INITIAL_INTERVAL)
+        self.max_interval = max(self.initial_interval, float(settings.get("poll_max_interval") or DEFAULT_MAX_INTERVAL))
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        # Called with self._lock held
+        if self._priors is None:
+            self._priors = {}
+            if self.path is not None and self.path.exists():
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._priors = {k: v for k, v in json.load(f).items() if isinstance(v, dict)}
+                except Exception as e:
+                    print(f"[POLL] Could not read {self.path}: {e}")
+        return self._priors
+
+    def _save(self, version: int, priors: Dict[str, Dict[str, float]]) -> None:
+        # Called without self._lock, with a snapshot taken under it
+        if self.path is None:
+            return
+        with self._io_lock:
+            if version <= self._saved:
+                # A newer snapshot is already on disk
+                return
+            try:
+                _PRIORS_CODEC.write_file(self.path, priors)
+                self._saved = version
+            except Exception as e:
+                print(f"[POLL] Could not write {self.path}: {e}")
+
+    def expected(self, key: str) -> Optional[float]:
+        """Typical seconds from submission to completion for `key`, None until one has completed."""
+        with self._lock:
+            prior = self._load().get(key)
+        return prior.get("expected") if prior else None
+
+    def delay(self, key: str, attempt: int, elapsed: float) -> float:
+        """Seconds to wait before status check number `attempt` (0-based), `elapsed` seconds after submission."""
+        with self._lock:
+            self.polls += 1
+        backoff = min(self.max_interval, self.initial_interval * GROWTH ** attempt)
+        expected = self.expected(key)
+        if not expected:
+            return backoff
+        target = expected * EXPECTED_LEAD
+        if elapsed < target:
+            # Cover half the distance to the expected finish per poll
+            return min(self.max_interval, max(self.initial_interval, (target - elapsed) / 2))
+        # Due: poll quickly, backing off the further the render overruns
+        return min(self.max_interval, max(self.initial_interval, (elapsed - target) / 4))
+
+    def record(self, key: str, seconds: float) -> None:
+        """Learn from a completed prediction that took `seconds` from submission."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            priors = self._load()
+            prior = priors.get(key)
+            if prior:
+                expected = prior["expected"] + SAMPLE_WEIGHT * (seconds - prior["expected"])
+                priors[key] = {"expected": round(expected, 2), "samples": prior.get("samples", 0) + 1}
+            else:
+                priors[key] = {"expected": round(seconds, 2), "samples": 1}
+            self._version += 1
+            version = self._version
+            snapshot = {k: dict(v) for k, v in priors.items()}
+        self._save(version, snapshot)
+
+    def prefer_wait(self, key: str, unknown: int = 0) -> int:
+        """
+        Seconds to ask Replicate to hold the submission open (`Prefer: wait`):
+        enough to cover the expected duration of a fast model, else 0. Models
+        without a prior get `unknown`.
+        """
+        expected = self.expected(key)
+        if expected is None:
+            return unknown
+        if expected > MAX_PREFER_WAIT * 0.75:
+            return 0
+        return int(min(MAX_PREFER_WAIT, max(5, expected * 1.5)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "initial_interval": self.initial_interval,
+                "max_interval": self.max_interval,
+                "polls": self.polls,
+                "models": {key: dict(prior) for key, prior in self._load().items()},
+            }
+
+
+adaptive_polling = AdaptivePolling(GLOBAL_DIR / "poll_priors.json")
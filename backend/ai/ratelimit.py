@@ -0,0 +1,211 @@
+"""
+Client-side rate limits for provider APIs.
+
+Every call to a provider API takes a slot from that provider's limiter: a
+token bucket caps the request rate (bursting up to the bucket size) and a
+counter caps the requests in flight at once. Callers over the limit queue up
+in arrival order and wait instead of failing, so a large batch of shots
+drains at the rate the provider accepts rather than collecting 429s.
+
+Limits per provider come from the `provider_rate_limits` setting, e.g.
+{"replicate": {"requests_per_second": 10, "burst": 20, "max_in_flight": 16}};
+unset values fall back to DEFAULT_LIMITS.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import requests
+
+from backend.ai.sessions import http_sessions
+
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    "replicate": {"requests_per_second": 10, "burst": 20, "max_in_flight": 16},
+    "vertex": {"requests_per_second": 5, "burst": 10, "max_in_flight": 8},
+    "wavespeed": {"requests_per_second": 5, "burst": 10, "max_in_flight": 8},
+    "elevenlabs": {"requests_per_second": 2, "burst": 4, "max_in_flight": 4},
+    "anthropic": {"requests_per_second": 1, "burst": 5, "max_in_flight": 4},
+    "openai": {"requests_per_second": 2, "burst": 5, "max_in_flight": 4},
+}
+FALLBACK_LIMITS: Dict[str, float] = {"requests_per_second": 5, "burst": 10, "max_in_flight": 8}
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, requests_per_second: float, burst: float, max_in_flight: int):
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self.requests_per_second = float(requests_per_second)
+        self.burst = max(1.0, float(burst))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.in_flight = 0
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+
+    def configure(self, requests_per_second: Optional[float] = None, burst: Optional[float] = None,
+                  max_in_flight: Optional[int] = None) -> None:
+        with self._cond:
+            self._refill(time.monotonic())
+            if requests_per_second is not None:
+                self.requests_per_second = float(requests_per_second)
+            if burst is not None:
+                self.burst = max(1.0, float(burst))
+                self._tokens = min(self._tokens, self.burst)
+            if max_in_flight is not None:
+                self.max_in_flight = max(1, int(max_in_flight))
+            self._cond.notify_all()
+
+    def _refill(self, now: float) -> None:
+        if self.requests_per_second > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.requests_per_second)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until this caller is first in line, a token is available and a slot is free."""
+        ticket = object()
+        start = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._queue[0] is ticket and self.in_flight < self.max_in_flight:
+                        if self.requests_per_second <= 0 or self._tokens >= 1:
+                            break
+                        # Sleep until the next token; a resize or release wakes us earlier
+                        self._cond.wait((1 - self._tokens) / self.requests_per_second)
+                    else:
+                        self._cond.wait()
+                if self.requests_per_second > 0:
+                    self._tokens -= 1
+                self.in_flight += 1
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            waited = time.monotonic() - start
+            self.requests += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.wait_seconds += waited
+
+    def try_acquire(self, waited: float = 0.0) -> float:
+        """
+        Non-blocking acquire for event-loop callers: 0 once a slot is taken,
+        otherwise the seconds to sleep before trying again. Threads already
+        queued in acquire() go first.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._queue or self.in_flight >= self.max_in_flight:
+                return 0.05
+            if self.requests_per_second > 0:
+                if self._tokens < 1:
+                    return max(0.01, (1 - self._tokens) / self.requests_per_second)
+                self._tokens -= 1
+            self.in_flight += 1
+            self.requests += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.wait_seconds += waited
+            return 0.0
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "requests_per_second": self.requests_per_second,
+                "burst": self.burst,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "waiting": len(self._queue),
+                "tokens": round(self._tokens, 2),
+                "requests": self.requests,
+                "delayed": self.delayed,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+
+class RateLimits:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._settings: Dict[str, Dict[str, float]] = {}
+
+    def _limits_for(self, provider: str) -> Dict[str, float]:
+        limits = dict(DEFAULT_LIMITS.get(provider, FALLBACK_LIMITS))
+        limits.update({k: v for k, v in (self._settings.get(provider) or {}).items() if v is not None})
+        return limits
+
+    def configure(self, settings: Optional[Dict[str, Dict[str, float]]]) -> None:
+        """Apply the `provider_rate_limits` setting (live; queued callers pick up the new limits)."""
+        with self._lock:
+            self._settings = {name: dict(limits or {}) for name, limits in (settings or {}).items()}
+            limiters = list(self._limiters.items())
+        for name, limiter in limiters:
+            limits = self._limits_for(name)
+            limiter.configure(limits.get("requests_per_second"), limits.get("burst"), limits.get("max_in_flight"))
+
+    def limiter(self, provider: str) -> ProviderLimiter:
+        with self._lock:
+            limiter = self._limiters.get(provider)
+            if limiter is None:
+                limits = self._limits_for(provider)
+                limiter = self._limiters[provider] = ProviderLimiter(
+                    provider, limits["requests_per_second"], limits["burst"], limits["max_in_flight"],
+                )
+            return limiter
+
+    def slot(self, provider: str):
+        """Context manager holding one request slot of `provider`."""
+        return self.limiter(provider).slot()
+
+    @asynccontextmanager
+    async def async_slot(self, provider: str) -> AsyncIterator[None]:
+        """slot() for coroutines: waits with asyncio.sleep instead of blocking the loop."""
+        limiter = self.limiter(provider)
+        start = time.monotonic()
+        while True:
+            delay = limiter.try_acquire(time.monotonic() - start)
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = list(self._limiters.items())
+        return {name: limiter.stats() for name, limiter in limiters}
+
+
+rate_limits = RateLimits()
+
+
+def limited_request(provider: str, method: str, url: str, **kwargs) -> requests.Response:
+    """A request on `provider`'s pooled session, under its rate limit."""
+    with rate_limits.slot(provider):
+        return http_sessions.request(provider, method, url, **kwargs)
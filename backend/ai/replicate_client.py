@@ -1,8 +1,12 @@
 import os
 import time
-import base64
 import requests
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ai_porting_bundle.providers.base import MultipartFile
+from backend.ai.polling import MAX_PREFER_WAIT, adaptive_polling, poll_key
+from backend.ai.retry import POLL, SUBMIT, UPLOAD, RetryPolicy, request_with_retry
+from backend.ai.uploads import uploads
 
 
 class ReplicateClient:
@@ -12,6 +16,7 @@ class ReplicateClient:
         self.api_token = api_token or os.environ.get("REPLICATE_API_TOKEN") or os.environ.get("REPLICATE_API_KEY")
         self.timeout = timeout
         self.base_predictions = "https://api.replicate.com/v1/predictions"
+        self.base_files = "https://api.replicate.com/v1/files"
 
     def _headers(self) -> Dict[str, str]:
         if not self.api_token:
@@ -21,17 +26,39 @@ class ReplicateClient:
             "Content-Type": "application/json",
         }
 
-    @staticmethod
-    def _to_data_url(path: str) -> str:
+    def _request(self, method: str, url: str, policy: Optional[RetryPolicy] = None,
+                 cancel_event: Optional[Any] = None, **kwargs) -> requests.Response:
+        """
+        Every Replicate API call goes through the shared "replicate" rate limit and
+        is retried with backoff: reads always, other calls only if the request
+        cannot have been accepted (see backend.ai.retry).
+        """
+        if policy is None:
+            policy = POLL if method in ("GET", "HEAD") else SUBMIT
+        return request_with_retry("replicate", method, url, policy, cancel_event=cancel_event, **kwargs)
+
+    def _input_url(self, path: str) -> str:
+        """An input image as a data URL if it is small, else uploaded to Replicate (see backend.ai.uploads)."""
         mime = "image/png"
         low = path.lower()
         if low.endswith((".jpg", ".jpeg")):
             mime = "image/jpeg"
         elif low.endswith(".webp"):
             mime = "image/webp"
-        with open(path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode()
-        return f"data:{mime};base64,{b64}"
+        return uploads.reference("replicate", path, mime, self._upload_file)
+
+    def _upload_file(self, path: str, mime: str) -> str:
+        """Stream a file to Replicate's files API; returns the URL predictions accept as input."""
+        body = MultipartFile(path, "content", mime)
+        headers = {"Authorization": self._headers()["Authorization"], "Content-Type": body.content_type}
+        try:
+            r = self._request("POST", self.base_files, policy=UPLOAD, headers=headers, data=body,
+                              timeout=max(self.timeout, 600))
+        finally:
+            body.close()
+        if not r.ok:
+            raise RuntimeError(f"Replicate file upload failed: HTTP {r.status_code}: {r.text}")
+        return r.json()["urls"]["get"]
 
     def generate_video(
         self,
@@ -44,14 +71,79 @@ class ReplicateClient:
         resolution: str = "1080p",
         aspect_ratio: str = "16:9",
         generate_audio: bool = True,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel_event: Optional[Any] = None,
     ) -> str:
         """
         Generate video using Replicate. Supports various video models.
+        `on_submitted(handle)` receives the prediction handle once it is created
+        (persist it to finish the prediction later with resume()). Setting
+        `cancel_event` (a threading.Event) stops polling and cancels the prediction.
         
         Supported models:
         - google/veo-3.1: Start/end frames, no reference images
         - kwaivgi/kling-v2.5-turbo-pro: Start/end frames, no reference images
         """
+        url, request_payload = self._video_request(
+            model, prompt, first_frame_image, last_frame_image, duration, resolution, aspect_ratio, generate_audio,
+        )
+        return self._submit(url, request_payload, model, "video", on_submitted, cancel_event)
+
+    def _submit(self, url: str, request_payload: Dict[str, Any], model: str, output: str,
+                on_submitted: Optional[Callable[[Dict[str, Any]], None]], cancel_event: Optional[Any]):
+        """
+        Create a prediction and wait for its output. Models expected to finish
+        within a minute are submitted with `Prefer: wait`, so Replicate answers
+        once the prediction is done and no polling is needed.
+        """
+        key = poll_key("replicate", model)
+        wait = adaptive_polling.prefer_wait(key, unknown=MAX_PREFER_WAIT if output == "images" else 0)
+        headers = self._headers()
+        if wait:
+            headers["Prefer"] = f"wait={wait}"
+        submitted_at = time.time()
+        try:
+            r = self._request("POST", url, headers=headers, json=request_payload, timeout=self.timeout + wait)
+            r.raise_for_status()
+        except requests.exceptions.HTTPError as http_err:
+            # Capture and log the full error response from Replicate
+            error_body = r.text if hasattr(r, 'text') else str(http_err)
+            print(f"[REPLICATE] HTTP Error {r.status_code}: {error_body}")
+            try:
+                error_json = r.json()
+                print(f"[REPLICATE] Error JSON: {error_json}")
+                if 'detail' in error_json:
+                    raise RuntimeError(f"Replicate API Error: {error_json['detail']}")
+            except:
+                pass
+            raise RuntimeError(f"Replicate API HTTP {r.status_code}: {error_body}")
+        
+        data = r.json()
+        pred_id = data.get("id")
+        if not pred_id:
+            raise RuntimeError(f"Replicate did not return a prediction id: {data}")
+        handle = {"provider": "replicate", "prediction_id": pred_id, "output": output, "model": model,
+                  "submitted_at": submitted_at}
+        if on_submitted:
+            on_submitted(handle)
+        result = self._prediction_output(pred_id, data, output == "images")
+        if result is not None:
+            adaptive_polling.record(key, time.time() - submitted_at)
+            return result
+        return self.resume(handle, cancel_event=cancel_event)
+
+    def _video_request(
+        self,
+        model: str,
+        prompt: str,
+        first_frame_image: Optional[str],
+        last_frame_image: Optional[str],
+        duration: int,
+        resolution: str,
+        aspect_ratio: str,
+        generate_audio: bool,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Predictions URL and payload for a video model (shared with the async client)."""
         owner, name = model.split("/", 1) if "/" in model else ("google", "veo-3.1")
         url = f"https://api.replicate.com/v1/models/{owner}/{name}/predictions"
 
@@ -62,10 +154,10 @@ class ReplicateClient:
             # Kling models (v1.6, v2.1, v2.5) use specific parameter names
             # Based on API docs: https://replicate.com/kwaivgi/kling-v1.6-pro/api/schema
             if first_frame_image:
-                inputs["image"] = self._to_data_url(first_frame_image)
+                inputs["image"] = self._input_url(first_frame_image)
                 print(f"[REPLICATE] Kling: Added image (start frame)")
             if last_frame_image:
-                inputs["last_frame"] = self._to_data_url(last_frame_image)
+                inputs["last_frame"] = self._input_url(last_frame_image)
                 print(f"[REPLICATE] Kling: Added last_frame")
             # Kling v1.6 params - being conservative with what we send
             # Only duration is confirmed to work across Kling models
@@ -78,10 +170,10 @@ class ReplicateClient:
             # ByteDance Seedance-1-Pro
             # API: https://replicate.com/bytedance/seedance-1-pro/api/schema
             if first_frame_image:
-                inputs["image"] = self._to_data_url(first_frame_image)
+                inputs["image"] = self._input_url(first_frame_image)
                 print(f"[REPLICATE] Seedance: Added image (start frame)")
             if last_frame_image:
-                inputs["last_frame_image"] = self._to_data_url(last_frame_image)
+                inputs["last_frame_image"] = self._input_url(last_frame_image)
                 print(f"[REPLICATE] Seedance: Added last_frame_image")
             # Seedance params
             inputs["duration"] = duration  # 2-12 seconds, default 5
@@ -92,9 +184,9 @@ class ReplicateClient:
         else:
             # Generic video model (Veo, etc)
             if first_frame_image:
-                inputs["image"] = self._to_data_url(first_frame_image)
+                inputs["image"] = self._input_url(first_frame_image)
             if last_frame_image:
-                inputs["last_frame"] = self._to_data_url(last_frame_image)
+                inputs["last_frame"] = self._input_url(last_frame_image)
             # Note: reference_images ignored for models that don't support them
             inputs["duration"] = duration
             inputs["resolution"] = resolution
@@ -105,28 +197,7 @@ class ReplicateClient:
         request_payload = {"input": inputs}
         print(f"[REPLICATE] Full video request payload: {request_payload}")
         print(f"[REPLICATE] URL: {url}")
-        
-        try:
-            r = requests.post(url, headers=self._headers(), json=request_payload, timeout=self.timeout)
-            r.raise_for_status()
-        except requests.exceptions.HTTPError as http_err:
-            # Capture and log the full error response from Replicate
-            error_body = r.text if hasattr(r, 'text') else str(http_err)
-            print(f"[REPLICATE] HTTP Error {r.status_code}: {error_body}")
-            try:
-                error_json = r.json()
-                print(f"[REPLICATE] Error JSON: {error_json}")
-                if 'detail' in error_json:
-                    raise RuntimeError(f"Replicate API Error: {error_json['detail']}")
-            except:
-                pass
-            raise RuntimeError(f"Replicate API HTTP {r.status_code}: {error_body}")
-        
-        data = r.json()
-        pred_id = data.get("id")
-        if not pred_id:
-            raise RuntimeError(f"Replicate did not return a prediction id: {data}")
-        return self._poll_for_output(pred_id)
+        return url, request_payload
 
     def generate_image(
         self,
@@ -135,6 +206,8 @@ class ReplicateClient:
         reference_images: Optional[list] = None,
         aspect_ratio: Optional[str] = None,
         num_outputs: Optional[int] = None,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel_event: Optional[Any] = None,
         **kwargs,
     ) -> list:
         """
@@ -145,6 +218,19 @@ class ReplicateClient:
         - aspect_ratio: "4:3", "16:9", "21:9", "1:1", "2:3", "3:2", "9:16", "9:21"
         - num_outputs: number of images to generate (default 1)
         """
+        url, request_payload = self._image_request(model, prompt, reference_images, aspect_ratio, num_outputs, **kwargs)
+        return self._submit(url, request_payload, model, "images", on_submitted, cancel_event)
+
+    def _image_request(
+        self,
+        model: str,
+        prompt: str,
+        reference_images: Optional[list],
+        aspect_ratio: Optional[str],
+        num_outputs: Optional[int],
+        **kwargs,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Predictions URL and payload for an image model (shared with the async client)."""
         owner, name = model.split("/", 1) if "/" in model else ("bytedance", "seedream-4")
         url = f"https://api.replicate.com/v1/models/{owner}/{name}/predictions"
 
@@ -159,7 +245,7 @@ class ReplicateClient:
             if num_outputs is not None:
                 inputs["max_images"] = num_outputs
             if reference_images and len(reference_images) > 0:
-                inputs["image_input"] = [self._to_data_url(p) for p in reference_images]
+                inputs["image_input"] = [self._input_url(p) for p in reference_images]
                 print(f"[REPLICATE] Seedream: Sending {len(reference_images)} reference image(s) via 'image_input'")
                 for i, ref in enumerate(reference_images):
                     print(f"  Image {i+1}: {ref[:80]}..." if len(ref) > 80 else f"  Image {i+1}: {ref}")
@@ -187,10 +273,13 @@ class ReplicateClient:
                     if os.path.exists(full_path):
                         print(f"  File size: {os.path.getsize(full_path)} bytes")
                     try:
-                        data_url = self._to_data_url(ref)
-                        # Log the size of the base64 data
-                        b64_size = len(data_url) - data_url.index(',') - 1 if ',' in data_url else len(data_url)
-                        print(f"  Base64 size: {b64_size} chars (~{b64_size * 3 // 4 // 1024} KB)")
+                        data_url = self._input_url(ref)
+                        if data_url.startswith("data:"):
+                            # Log the size of the base64 data
+                            b64_size = len(data_url) - data_url.index(',') - 1
+                            print(f"  Base64 size: {b64_size} chars (~{b64_size * 3 // 4 // 1024} KB)")
+                        else:
+                            print(f"  Uploaded: {data_url}")
                         print(f"  Status: ✓ SUCCESSFULLY ENCODED")
                         data_urls.append(data_url)
                     except Exception as e:
@@ -204,9 +293,9 @@ class ReplicateClient:
                 inputs["aspect_ratio"] = aspect_ratio
             if reference_images:
                 if len(reference_images) == 1:
-                    inputs["image"] = self._to_data_url(reference_images[0])
+                    inputs["image"] = self._input_url(reference_images[0])
                 else:
-                    inputs["reference_images"] = [self._to_data_url(p) for p in reference_images]
+                    inputs["reference_images"] = [self._input_url(p) for p in reference_images]
         
         # Add any additional kwargs
         inputs.update(kwargs)
@@ -219,71 +308,78 @@ class ReplicateClient:
         for k, v in inputs.items():
             if k in ("image_input", "reference_images", "image") and v:
                 if isinstance(v, list):
-                    request_summary["input"][k] = f"[{len(v)} data URLs]"
+                    request_summary["input"][k] = f"[{len(v)} image URLs]"
                 else:
-                    request_summary["input"][k] = "[1 data URL]"
+                    request_summary["input"][k] = "[1 image URL]"
             else:
                 request_summary["input"][k] = v
         print(f"[REPLICATE] Request structure: {request_summary}")
+        return url, request_payload
 
-        r = requests.post(url, headers=self._headers(), json=request_payload, timeout=self.timeout)
-        r.raise_for_status()
-        data = r.json()
-        pred_id = data.get("id")
-        if not pred_id:
-            raise RuntimeError(f"Replicate did not return a prediction id: {data}")
-        return self._poll_for_output_images(pred_id)
-
-    def _poll_for_output(self, prediction_id: str, max_wait: int = 900, poll_interval: int = 5) -> str:
-        """Poll for a single output (video or single image)."""
+    def resume(self, handle: Dict[str, Any], cancel_event: Optional[Any] = None, max_wait: float = 900):
+        """Keep polling a prediction submitted earlier (handle from on_submitted)."""
+        prediction_id = handle["prediction_id"]
+        images = handle.get("output") == "images"
+        key = poll_key("replicate", handle.get("model"))
+        submitted_at = handle.get("submitted_at") or time.time()
         status_url = f"{self.base_predictions}/{prediction_id}"
         start = time.time()
+        attempt = 0
         while time.time() - start < max_wait:
-            rr = requests.get(status_url, headers=self._headers(), timeout=self.timeout)
+            self._wait_or_cancel(prediction_id, adaptive_polling.delay(key, attempt, time.time() - submitted_at), cancel_event)
+            attempt += 1
+            rr = self._request("GET", status_url, headers=self._headers(), timeout=self.timeout, cancel_event=cancel_event)
             rr.raise_for_status()
-            pj = rr.json()
-            status = pj.get("status")
-            if status == "succeeded":
-                outputs = pj.get("output")
-                if isinstance(outputs, list) and outputs:
-                    return outputs[-1]
-                if isinstance(outputs, str):
-                    return outputs
-                raise RuntimeError(f"Replicate output missing: {pj}")
-            if status in ("failed", "canceled"):
-                raise RuntimeError(f"Replicate prediction {prediction_id} {status}: {pj.get('error') or pj}")
-            time.sleep(poll_interval)
+            output = self._prediction_output(prediction_id, rr.json(), images)
+            if output is not None:
+                adaptive_polling.record(key, time.time() - submitted_at)
+                return output
         raise RuntimeError("Replicate prediction timed out")
 
-    def _poll_for_output_images(self, prediction_id: str, max_wait: int = 900, poll_interval: int = 5) -> list:
-        """Poll for multiple image outputs (e.g., Seedream-4 can return multiple images)."""
-        status_url = f"{self.base_predictions}/{prediction_id}"
-        start = time.time()
-        while time.time() - start < max_wait:
-            rr = requests.get(status_url, headers=self._headers(), timeout=self.timeout)
-            rr.raise_for_status()
-            pj = rr.json()
-            status = pj.get("status")
-            if status == "succeeded":
-                outputs = pj.get("output")
-                if isinstance(outputs, list):
-                    # Handle list of outputs - could be URLs or file objects
-                    urls = []
-                    for item in outputs:
-                        if isinstance(item, str):
-                            urls.append(item)
-                        elif isinstance(item, dict):
-                            # If it's a dict, try to get URL
-                            urls.append(item.get("url", str(item)))
-                        else:
-                            urls.append(str(item))
-                    return urls
-                if isinstance(outputs, str):
-                    return [outputs]
-                raise RuntimeError(f"Replicate output missing: {pj}")
-            if status in ("failed", "canceled"):
-                raise RuntimeError(f"Replicate prediction {prediction_id} {status}: {pj.get('error') or pj}")
+    def cancel_prediction(self, prediction_id: str) -> None:
+        """Ask Replicate to stop a prediction (best-effort)."""
+        try:
+            r = self._request("POST", f"{self.base_predictions}/{prediction_id}/cancel", headers=self._headers(), timeout=self.timeout)
+            print(f"[REPLICATE] Cancel prediction {prediction_id}: HTTP {r.status_code}")
+        except Exception as e:
+            print(f"[REPLICATE] Failed to cancel prediction {prediction_id}: {e}")
+
+    def _wait_or_cancel(self, prediction_id: str, poll_interval: float, cancel_event: Optional[Any]) -> None:
+        """Sleep between polls; on cancel, cancel the prediction remotely and raise."""
+        if cancel_event is None:
             time.sleep(poll_interval)
-        raise RuntimeError("Replicate prediction timed out")
+            return
+        if cancel_event.is_set() or cancel_event.wait(poll_interval):
+            self.cancel_prediction(prediction_id)
+            raise RuntimeError(f"Replicate prediction {prediction_id} cancelled")
 
+    @staticmethod
+    def _prediction_output(prediction_id: str, pj: Dict[str, Any], images: bool = False):
+        """
+        The output of a finished prediction (a URL, or a list of URLs with
+        `images`), None while it is still running; raises if it failed.
+        """
+        status = pj.get("status")
+        if status == "succeeded":
+            outputs = pj.get("output")
+            if images and isinstance(outputs, list):
+                # Handle list of outputs - could be URLs or file objects
+                urls = []
+                for item in outputs:
+                    if isinstance(item, str):
+                        urls.append(item)
+                    elif isinstance(item, dict):
+                        # If it's a dict, try to get URL
+                        urls.append(item.get("url", str(item)))
+                    else:
+                        urls.append(str(item))
+                return urls
+            if isinstance(outputs, list) and outputs:
+                return outputs[-1]
+            if isinstance(outputs, str):
+                return [outputs] if images else outputs
+            raise RuntimeError(f"Replicate output missing: {pj}")
+        if status in ("failed", "canceled"):
+            raise RuntimeError(f"Replicate prediction {prediction_id} {status}: {pj.get('error') or pj}")
+        return None
 
@@ -0,0 +1,135 @@
+"""
+Retries with exponential backoff and jitter for provider API calls.
+
+Two policies:
+
+- POLL, for idempotent calls (status polls, fetching an operation): any
+  connection error, timeout, 429 or 5xx is retried.
+- SUBMIT, for calls that start paid work (creating a prediction): retried only
+  when the provider cannot have accepted the request - the connection was
+  never established, or it answered 429 / 503 / 529. A timeout or a dropped
+  connection after the request went out is not retried, since the prediction
+  may already exist.
+- UPLOAD, for input file uploads: retried like POLL, since sending a file
+  twice at worst leaves an unused copy with the provider.
+
+Delays grow exponentially with full jitter and honour Retry-After. Every
+retry is reported to the listeners registered with add_retry_listener (the
+backend counts them on the job the calling thread works for).
+"""
+
+from email.utils import parsedate_to_datetime
+import random
+import time
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from backend.ai.ratelimit import limited_request
+
+
+class RetryPolicy:
+    def __init__(self, attempts: int, base_delay: float, max_delay: float, statuses: FrozenSet[int],
+                 idempotent: bool, max_retry_after: float = 120.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = statuses
+        self.idempotent = idempotent
+        self.max_retry_after = max_retry_after
+
+    def should_retry_error(self, exc: Exception) -> bool:
+        if self.idempotent:
+            return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        return never_sent(exc)
+
+    def delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = parse_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+POLL = RetryPolicy(attempts=5, base_delay=1.0, max_delay=30.0,
+                   statuses=frozenset({429, 500, 502, 503, 504}), idempotent=True)
+SUBMIT = RetryPolicy(attempts=4, base_delay=2.0, max_delay=60.0,
+                     statuses=frozenset({429, 503, 529}), idempotent=False)
+UPLOAD = RetryPolicy(attempts=3, base_delay=2.0, max_delay=30.0,
+                     statuses=frozenset({429, 500, 502, 503, 504}), idempotent=True)
+
+
+def never_sent(exc: Exception) -> bool:
+    """True if the request failed before reaching the provider (safe to resubmit)."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+        return isinstance(getattr(exc.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_retry_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    _listeners.append(listener)
+
+
+def notify_retry(event: Dict[str, Any]) -> None:
+    for listener in list(_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"[RETRY] Retry listener failed: {e}")
+
+
+def request_with_retry(provider: str, method: str, url: str, policy: RetryPolicy,
+                       cancel_event: Optional[Any] = None, **kwargs) -> requests.Response:
+    """
+    A request on `provider`'s pooled session under its rate limit, retried per `policy`.
+    Returns the last response once retries are used up (callers still
+    raise_for_status); re-raises the last error if every attempt failed.
+    A set `cancel_event` ends the backoff early.
+    """
+    attempt = 0
+    while True:
+        try:
+            response = limited_request(provider, method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if attempt + 1 >= policy.attempts or not policy.should_retry_error(e):
+                raise
+            reason, delay, response = type(e).__name__, policy.delay(attempt), None
+        else:
+            if response.status_code not in policy.statuses or attempt + 1 >= policy.attempts:
+                return response
+            reason, delay = f"HTTP {response.status_code}", policy.delay(attempt, response)
+        attempt += 1
+        print(f"[RETRY] {provider} {method} {url}: {reason}; retry {attempt}/{policy.attempts - 1} in {delay:.1f}s")
+        notify_retry({"provider": provider, "method": method, "url": url, "reason": reason,
+                      "attempt": attempt, "delay": round(delay, 2)})
+        if cancel_event is not None:
+            if cancel_event.wait(delay):
+                if response is not None:
+                    return response
+                raise requests.exceptions.RetryError(f"Cancelled while retrying {method} {url} ({reason})")
+        else:
+            time.sleep(delay)
+        if response is not None:
+            response.close()
+        if hasattr(kwargs.get("data"), "seek"):
+            # Streamed bodies (MultipartFile) are sent again from the start
+            kwargs["data"].seek(0)
@@ -0,0 +1,141 @@
+"""
+Process-wide pooled HTTP sessions for provider APIs.
+
+Module-level requests.get/post open a new connection (and TLS handshake) for
+every call. Instead, every client takes a keep-alive Session from this
+registry, one per provider, so status polls and submissions reuse warm
+connections. Pool sizes are set per host; timeouts get a separate connect
+timeout, so an unreachable host fails fast while slow responses still get
+their full read timeout.
+
+Settings: `http_pool_size` (connections kept per host, default 10),
+`http_pool_sizes` ({"api.replicate.com": 32}), `http_connect_timeout`
+(seconds, default 10) and `http_read_timeout` (used when a caller passes no
+timeout, default 60).
+"""
+
+import threading
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+
+class PooledSession(requests.Session):
+    """A Session that applies the registry's timeouts and per-host pool sizes."""
+
+    def __init__(self, registry: "SessionRegistry", name: str):
+        super().__init__()
+        self.registry = registry
+        self.name = name
+        self._mount_lock = threading.Lock()
+        self.mount("https://", HTTPAdapter(pool_maxsize=registry.pool_size))
+        self.mount("http://", HTTPAdapter(pool_maxsize=registry.pool_size))
+
+    def request(self, method, url, **kwargs):
+        kwargs["timeout"] = self.registry.timeout(kwargs.get("timeout"))
+        return super().request(method, url, **kwargs)
+
+    def get_adapter(self, url):
+        parts = urlsplit(url)
+        size = self.registry.host_pool_sizes.get(parts.hostname or "")
+        with self._mount_lock:
+            if size:
+                prefix = f"{parts.scheme}://{parts.netloc}/".lower()
+                if prefix not in self.adapters:
+                    self.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size))
+            return super().get_adapter(url)
+
+    def remount(self) -> None:
+        """Rebuild adapters after a pool size change (idle connections are dropped)."""
+        with self._mount_lock:
+            old = list(self.adapters.values())
+            self.adapters.clear()
+            self.mount("https://", HTTPAdapter(pool_maxsize=self.registry.pool_size))
+            self.mount("http://", HTTPAdapter(pool_maxsize=self.registry.pool_size))
+        for adapter in old:
+            adapter.close()
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        hosts: Dict[str, Dict[str, int]] = {}
+        for adapter in list(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                entry = hosts.setdefault(pool.host, {"requests": 0, "connections": 0, "idle": 0})
+                entry["requests"] += pool.num_requests
+                entry["connections"] += pool.num_connections
+                # The pool queue is padded with None placeholders; count real idle connections
+                entry["idle"] += sum(1 for conn in list(pool.pool.queue) if conn) if pool.pool is not None else 0
+        return hosts
+
+
+class SessionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, PooledSession] = {}
+        self.pool_size = DEFAULT_POOL_SIZE
+        self.host_pool_sizes: Dict[str, int] = {}
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+        self.read_timeout = DEFAULT_READ_TIMEOUT
+
+    def configure(self, settings: Dict[str, Any]) -> None:
+        """Apply the http_* settings; existing sessions pick up new pool sizes."""
+        pool_size = int(settings.get("http_pool_size") or DEFAULT_POOL_SIZE)
+        host_pool_sizes = {host: int(size) for host, size in (settings.get("http_pool_sizes") or {}).items() if size}
+        self.connect_timeout = float(settings.get("http_connect_timeout") or DEFAULT_CONNECT_TIMEOUT)
+        self.read_timeout = float(settings.get("http_read_timeout") or DEFAULT_READ_TIMEOUT)
+        with self._lock:
+            changed = pool_size != self.pool_size or host_pool_sizes != self.host_pool_sizes
+            self.pool_size = pool_size
+            self.host_pool_sizes = host_pool_sizes
+            sessions = list(self._sessions.values())
+        if changed:
+            for session in sessions:
+                session.remount()
+
+    def timeout(self, timeout: Any) -> Any:
+        """A (connect, read) timeout for a caller's scalar/None timeout; tuples pass through."""
+        if isinstance(timeout, tuple):
+            return timeout
+        read = float(timeout) if timeout is not None else self.read_timeout
+        return (min(self.connect_timeout, read), read)
+
+    def session(self, name: str = "default") -> PooledSession:
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._sessions[name] = PooledSession(self, name)
+            return session
+
+    def request(self, name: str, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session(name).request(method, url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per session and host: requests sent, connections opened and how many requests reused one."""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        out: Dict[str, Any] = {}
+        for name, session in sessions:
+            hosts = session.pool_stats()
+            for entry in hosts.values():
+                entry["reused"] = max(0, entry["requests"] - entry["connections"])
+            out[name] = hosts
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+http_sessions = SessionRegistry()
+
@@ -0,0 +1,91 @@
+"""
+Input files by reference instead of base64 data URLs.
+
+Provider inputs (start frames, reference images, lip-sync audio and video,
+the shots Gemini watches) used to be base64-encoded whole into the JSON
+request: a 30 MB clip became a 40 MB string in memory, sent again on every
+retry. Files larger than `upload_inline_max_bytes` (default 256 KB) are now
+uploaded once through the provider's own file endpoint and passed by URL:
+Replicate's files API, WaveSpeed's media upload and, for Vertex / Gemini, the
+project's temp GCS bucket. The Replicate and WaveSpeed uploads stream from
+disk as multipart bodies (MultipartFile). Smaller files are still inlined as
+data URLs, which saves a round trip.
+
+An upload is reused for REUSE_TTL while the file is unchanged on disk, so a
+character reference shared by every shot in a scene is only uploaded once.
+Installed as AIProvider.file_uploads, so the porting-bundle providers use it
+too.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from ai_porting_bundle.providers.base import AIProvider
+
+DEFAULT_INLINE_MAX_BYTES = 256 * 1024
+# Provider file URLs expire (Replicate's after a day); re-upload well before that
+REUSE_TTL = 6 * 3600
+
+
+class FileUploads:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._uploaded: Dict[Tuple[str, str, int, int], Tuple[str, float]] = {}
+        self.inline_max_bytes = DEFAULT_INLINE_MAX_BYTES
+        self.inlined = 0
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.reused = 0
+
+    def configure(self, settings: Dict[str, Any]) -> None:
+        """Apply the `upload_inline_max_bytes` setting."""
+        value = settings.get("upload_inline_max_bytes")
+        self.inline_max_bytes = int(value) if value is not None else DEFAULT_INLINE_MAX_BYTES
+
+    def inline(self, path: str) -> bool:
+        """True if `path` is small enough to send inline."""
+        return os.path.getsize(path) <= self.inline_max_bytes
+
+    def reference(self, provider: str, path: str, mime: str, upload: Callable[[str, str], str]) -> str:
+        """A data URL for a small file, else the URL `upload(path, mime)` returned for it."""
+        if self.inline(path):
+            with self._lock:
+                self.inlined += 1
+            return AIProvider._data_url(path, mime)
+        return self.uploaded(provider, path, mime, upload)
+
+    def uploaded(self, provider: str, path: str, mime: str, upload: Callable[[str, str], str]) -> str:
+        """`upload(path, mime)`, reused for REUSE_TTL while the file is unchanged."""
+        st = os.stat(path)
+        key = (provider, os.path.realpath(path), st.st_size, st.st_mtime_ns)
+        now = time.time()
+        with self._lock:
+            hit = self._uploaded.get(key)
+            if hit and now - hit[1] < REUSE_TTL:
+                self.reused += 1
+                return hit[0]
+        started = time.time()
+        url = upload(path, mime)
+        print(f"[UPLOAD] {provider}: {path} ({st.st_size // 1024} KB) in {time.time() - started:.1f}s -> {url}")
+        with self._lock:
+            self._uploaded = {k: v for k, v in self._uploaded.items() if now - v[1] < REUSE_TTL}
+            self._uploaded[key] = (url, now)
+            self.uploads += 1
+            self.uploaded_bytes += st.st_size
+        return url
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "inline_max_bytes": self.inline_max_bytes,
+                "inlined": self.inlined,
+                "uploads": self.uploads,
+                "uploaded_bytes": self.uploaded_bytes,
+                "reused": self.reused,
+                "cached": len(self._uploaded),
+            }
+
+
+uploads = FileUploads()
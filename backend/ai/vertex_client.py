@@ -2,8 +2,14 @@ import os
 import time
 import base64
 import json
+import tempfile
 import requests
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+from backend.ai.polling import adaptive_polling, poll_key
+from backend.ai.retry import POLL, SUBMIT, RetryPolicy, request_with_retry
+from backend.ai.sessions import http_sessions
+from backend.ai.uploads import uploads
 
 
 class VertexClient:
@@ -24,19 +30,35 @@ class VertexClient:
         self.model = model
         self.temp_bucket = temp_bucket
         self.timeout = timeout
+        self._credentials = None
+        self._storage = None
 
     def _access_token(self) -> str:
         from google.oauth2 import service_account
         from google.auth.transport.requests import Request
-        creds = service_account.Credentials.from_service_account_file(
-            self.credentials_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        creds.refresh(Request())
-        return creds.token
+        # Load the service account once and refresh the token only when it expires
+        if self._credentials is None:
+            self._credentials = service_account.Credentials.from_service_account_file(
+                self.credentials_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+        if not self._credentials.valid:
+            self._credentials.refresh(Request(session=http_sessions.session("google-auth")))
+        return self._credentials.token
 
     def _headers(self) -> Dict[str, str]:
         return {"Authorization": f"Bearer {self._access_token()}", "Content-Type": "application/json"}
 
+    def _request(self, method: str, url: str, policy: Optional[RetryPolicy] = None,
+                 cancel_event: Optional[Any] = None, **kwargs) -> requests.Response:
+        """
+        Every Vertex / Gemini API call goes through the shared "vertex" rate limit and
+        is retried with backoff: reads always, other calls only if the request
+        cannot have been accepted (see backend.ai.retry).
+        """
+        if policy is None:
+            policy = POLL if method in ("GET", "HEAD") else SUBMIT
+        return request_with_retry("vertex", method, url, policy, cancel_event=cancel_event, **kwargs)
+
     def _model_path(self) -> str:
         if self.model.startswith("publishers/"):
             return self.model
@@ -53,13 +75,19 @@ class VertexClient:
         model_id = model_map.get(model_id, model_id)
         return f"publishers/google/models/{model_id}"
 
-    def _upload_image_to_gcs(self, image_path: str) -> str:
+    def _upload_to_gcs(self, path: str, prefix: str = "frames", mime: Optional[str] = None) -> str:
+        """
+        Upload a local file to the temp bucket; returns its gs:// URI. The
+        storage client streams large files from disk in resumable chunks.
+        """
         from google.cloud import storage
         from google.oauth2 import service_account
-        credentials = service_account.Credentials.from_service_account_file(
-            self.credentials_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        client = storage.Client(project=self.project_id, credentials=credentials)
+        if self._storage is None:
+            credentials = service_account.Credentials.from_service_account_file(
+                self.credentials_path, scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+            self._storage = storage.Client(project=self.project_id, credentials=credentials)
+        client = self._storage
         # Use provided bucket if set; otherwise auto-provision a temp bucket
         bucket_name = self.temp_bucket or f"{self.project_id}-openfilmai-temp"
         try:
@@ -69,11 +97,33 @@ class VertexClient:
             bucket = client.bucket(bucket_name)
             bucket.location = self.location
             bucket = client.create_bucket(bucket)
-        blob_name = f"frames/{int(time.time())}_{os.path.basename(image_path)}"
+        blob_name = f"{prefix}/{int(time.time())}_{os.path.basename(path)}"
         blob = bucket.blob(blob_name)
-        blob.upload_from_filename(image_path)
+        blob.upload_from_filename(path, content_type=mime)
         return f"gs://{bucket_name}/{blob_name}"
 
+    def _gemini_part(self, path: str, mime: str) -> Dict[str, Any]:
+        """
+        A Gemini content part for a local file: inline base64 if it is small,
+        else uploaded to the temp bucket and referenced by URI (inline again
+        if the upload fails).
+        """
+        if not uploads.inline(path):
+            try:
+                uri = uploads.uploaded("vertex", path, mime, lambda p, m: self._upload_to_gcs(p, "inputs", m))
+                return {"fileData": {"mimeType": mime, "fileUri": uri}}
+            except Exception as e:
+                print(f"[VERTEX] GCS upload of {path} failed, sending it inline: {e}")
+        with open(path, "rb") as f:
+            return {"inlineData": {"mimeType": mime, "data": base64.b64encode(f.read()).decode()}}
+
+    @staticmethod
+    def _describe_part(part: Dict[str, Any]) -> str:
+        if "fileData" in part:
+            return f"by reference ({part['fileData']['fileUri']})"
+        size = len(part["inlineData"]["data"])
+        return f"inline, {size} base64 chars (~{size * 3 // 4 // 1024} KB)"
+
     def generate_video(
         self,
         prompt: str,
@@ -84,7 +134,46 @@ class VertexClient:
         resolution: str = "1080p",
         aspect_ratio: str = "16:9",
         generate_audio: bool = False,
+        on_submitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel_event: Optional[Any] = None,
     ) -> str:
+        """
+        Start a predictLongRunning operation, poll it and download the video.
+        `on_submitted(handle)` receives the operation name once Vertex accepts
+        the request (persist it to finish later with resume()). Setting
+        `cancel_event` (a threading.Event) stops polling and cancels the operation.
+        """
+        url, body = self._video_request(prompt, first_frame_image, last_frame_image, reference_images, aspect_ratio, generate_audio)
+        submitted_at = time.time()
+        r = self._request("POST", url, headers=self._headers(), json=body, timeout=self.timeout)
+        try:
+            r.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            print(f"[VERTEX] HTTP Error: {r.status_code}")
+            print(f"[VERTEX] Response: {r.text}")
+            raise
+        op_name = r.json().get("name")
+        if not op_name:
+            raise RuntimeError(f"Vertex: no operation name: {r.text}")
+        handle = self._handle(op_name, submitted_at)
+        if on_submitted:
+            on_submitted(handle)
+        return self._poll_and_download(handle, cancel_event=cancel_event)
+
+    def _handle(self, operation_name: str, submitted_at: float) -> Dict[str, Any]:
+        return {"provider": "vertex", "operation_name": operation_name, "model": self.model, "location": self.location,
+                "submitted_at": submitted_at}
+
+    def _video_request(
+        self,
+        prompt: str,
+        first_frame_image: Optional[str],
+        last_frame_image: Optional[str],
+        reference_images: Optional[List[str]],
+        aspect_ratio: str,
+        generate_audio: bool,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """predictLongRunning URL and body; uploads the frames to GCS (shared with the async client)."""
         base = "https://us-central1-aiplatform.googleapis.com/v1"
         url = f"{base}/projects/{self.project_id}/locations/{self.location}/{self._model_path()}:predictLongRunning"
 
@@ -100,7 +189,7 @@ class VertexClient:
 
         if actual_start_frame:
             print(f"[VERTEX] Uploading start frame to GCS: {actual_start_frame}")
-            gcs_uri = self._upload_image_to_gcs(actual_start_frame)
+            gcs_uri = uploads.uploaded("vertex", actual_start_frame, "image/jpeg", self._upload_to_gcs)
             instance["image"] = {"gcsUri": gcs_uri, "mimeType": "image/jpeg"}
             print(f"[VERTEX] Start frame uploaded: {gcs_uri}")
         else:
@@ -108,7 +197,7 @@ class VertexClient:
 
         if last_frame_image:
             print(f"[VERTEX] Uploading end frame to GCS: {last_frame_image}")
-            gcs_uri = self._upload_image_to_gcs(last_frame_image)
+            gcs_uri = uploads.uploaded("vertex", last_frame_image, "image/jpeg", self._upload_to_gcs)
             instance["lastFrame"] = {"gcsUri": gcs_uri, "mimeType": "image/jpeg"}
             print(f"[VERTEX] End frame uploaded: {gcs_uri}")
 
@@ -127,18 +216,20 @@ class VertexClient:
         import json as json_mod
         print(f"[VERTEX] Sending request to: {url}")
         print(f"[VERTEX] Request body: {json_mod.dumps(body, indent=2)}")
-        
-        r = requests.post(url, headers=self._headers(), json=body, timeout=self.timeout)
+        return url, body
+
+    def resume(self, handle: Dict[str, Any], cancel_event: Optional[Any] = None) -> str:
+        """Keep polling an operation started earlier (handle from on_submitted)."""
+        return self._poll_and_download(handle, cancel_event=cancel_event)
+
+    def cancel_operation(self, operation_name: str) -> None:
+        """Ask Vertex to stop a long-running operation (best-effort; not every model honours it)."""
         try:
-            r.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            print(f"[VERTEX] HTTP Error: {r.status_code}")
-            print(f"[VERTEX] Response: {r.text}")
-            raise
-        op_name = r.json().get("name")
-        if not op_name:
-            raise RuntimeError(f"Vertex: no operation name: {r.text}")
-        return self._poll_and_download(op_name)
+            url = f"https://{self.location}-aiplatform.googleapis.com/v1/{operation_name}:cancel"
+            r = self._request("POST", url, headers=self._headers(), json={}, timeout=self.timeout)
+            print(f"[VERTEX] Cancel operation {operation_name}: HTTP {r.status_code}")
+        except Exception as e:
+            print(f"[VERTEX] Failed to cancel operation {operation_name}: {e}")
 
     def plan_shot_from_video(
         self,
@@ -179,7 +270,7 @@ class VertexClient:
         print("[GEMINI DIRECTOR] VIDEOS BEING SENT TO GEMINI FOR ANALYSIS")
         print("=" * 70)
 
-        # Read and encode primary video (the immediately previous shot)
+        # Primary video (the immediately previous shot), inline or uploaded by size
         print(f"\n--- PRIMARY VIDEO (immediately previous shot) ---")
         print(f"  Path: {video_path}")
         print(f"  Exists: {os.path.exists(video_path)}")
@@ -188,13 +279,12 @@ class VertexClient:
             print(f"  File size: {file_size} bytes ({file_size // 1024} KB)")
         mime_type = mimetypes.guess_type(video_path)[0] or "video/mp4"
         print(f"  MIME type: {mime_type}")
-        with open(video_path, "rb") as f:
-            video_data = base64.b64encode(f.read()).decode()
-        print(f"  Base64 size: {len(video_data)} chars (~{len(video_data) * 3 // 4 // 1024} KB)")
+        video_part = self._gemini_part(video_path, mime_type)
+        print(f"  Sent: {self._describe_part(video_part)}")
         print(f"  Status: ✓ SUCCESSFULLY LOADED")
 
-        # Read and encode additional context videos (earlier shots)
-        additional_videos_data: List[Dict[str, str]] = []
+        # Additional context videos (earlier shots)
+        additional_videos_data: List[Dict[str, Any]] = []
         if additional_video_paths:
             print(f"\n--- ADDITIONAL CONTEXT VIDEOS ({len(additional_video_paths)}) ---")
             for idx, add_path in enumerate(additional_video_paths):
@@ -207,11 +297,10 @@ class VertexClient:
                         print(f"    File size: {file_size} bytes ({file_size // 1024} KB)")
                     add_mime = mimetypes.guess_type(add_path)[0] or "video/mp4"
                     print(f"    MIME type: {add_mime}")
-                    with open(add_path, "rb") as f:
-                        add_data = base64.b64encode(f.read()).decode()
-                    print(f"    Base64 size: {len(add_data)} chars (~{len(add_data) * 3 // 4 // 1024} KB)")
+                    add_part = self._gemini_part(add_path, add_mime)
+                    print(f"    Sent: {self._describe_part(add_part)}")
                     print(f"    Status: ✓ SUCCESSFULLY LOADED")
-                    additional_videos_data.append({"mime": add_mime, "data": add_data, "path": add_path})
+                    additional_videos_data.append({"part": add_part, "path": add_path, "size": os.path.getsize(add_path)})
                 except Exception as e:
                     print(f"    Status: ✗ FAILED - {e}")
         else:
@@ -378,11 +467,11 @@ CRITICAL REMINDERS:
         if additional_videos_data:
             for i, vid_info in enumerate(additional_videos_data):
                 parts.append({"text": f"\n--- EARLIER SHOT VIDEO #{i+1} (for narrative context) ---"})
-                parts.append({"inlineData": {"mimeType": vid_info["mime"], "data": vid_info["data"]}})
+                parts.append(vid_info["part"])
 
         # Add the primary video (immediately previous shot - this is what Shot N+1 follows)
         parts.append({"text": "\n--- IMMEDIATELY PREVIOUS SHOT (Shot N) - Your new shot follows this ---"})
-        parts.append({"inlineData": {"mimeType": mime_type, "data": video_data}})
+        parts.append(video_part)
 
         # Add character reference images with labels
         print(f"\n--- CHARACTER REFERENCE IMAGES ---")
@@ -399,13 +488,12 @@ CRITICAL REMINDERS:
                         file_size = os.path.getsize(img_path)
                         print(f"      File size: {file_size} bytes ({file_size // 1024} KB)")
                     img_mime = mimetypes.guess_type(img_path)[0] or "image/jpeg"
-                    with open(img_path, "rb") as f:
-                        img_data = base64.b64encode(f.read()).decode()
-                    print(f"      Base64 size: {len(img_data)} chars (~{len(img_data) * 3 // 4 // 1024} KB)")
+                    img_part = self._gemini_part(img_path, img_mime)
+                    print(f"      Sent: {self._describe_part(img_part)}")
                     print(f"      Status: ✓ LOADED")
                     # Add label text before image
                     parts.append({"text": f"\n--- REFERENCE IMAGE for {char_name} (#{i+1}) ---"})
-                    parts.append({"inlineData": {"mimeType": img_mime, "data": img_data}})
+                    parts.append(img_part)
                     ref_image_count += 1
                 except Exception as e:
                     print(f"      Status: ✗ FAILED - {e}")
@@ -428,7 +516,7 @@ CRITICAL REMINDERS:
         }
 
         total_videos = 1 + len(additional_videos_data)
-        total_video_kb = (len(video_data) * 3 // 4 // 1024) + sum(len(v["data"]) * 3 // 4 // 1024 for v in additional_videos_data)
+        total_video_kb = (os.path.getsize(video_path) + sum(v["size"] for v in additional_videos_data)) // 1024
 
         print("\n" + "=" * 70)
         print("[GEMINI DIRECTOR] SUMMARY - SENDING TO GEMINI API")
@@ -465,6 +553,8 @@ CRITICAL REMINDERS:
                         "data": f"<BASE64 DATA: {data_size} chars, ~{data_size * 3 // 4 // 1024} KB>"
                     }
                 })
+            elif "fileData" in part:
+                debug_body["contents"][0]["parts"].append(part)
 
         import json as json_mod
         debug_file = "/tmp/gemini_request_debug.json"
@@ -473,7 +563,7 @@ CRITICAL REMINDERS:
         print(f"\n[GEMINI DIRECTOR] FULL REQUEST DUMPED TO: {debug_file}")
         print(f"[GEMINI DIRECTOR] Run: cat {debug_file}")
 
-        r = requests.post(url, headers=self._headers(), json=body, timeout=180)
+        r = self._request("POST", url, headers=self._headers(), json=body, timeout=180)
         try:
             r.raise_for_status()
         except requests.exceptions.HTTPError as e:
@@ -515,39 +605,59 @@ CRITICAL REMINDERS:
                 "error": f"Failed to parse Gemini response: {e}"
             }
 
-    def _poll_and_download(self, operation_name: str) -> str:
+    def _fetch_url(self) -> str:
         base = "https://us-central1-aiplatform.googleapis.com/v1"
-        fetch_url = f"{base}/projects/{self.project_id}/locations/{self.location}/{self._model_path()}:fetchPredictOperation"
-        headers = self._headers()
-        for _ in range(120):
-            time.sleep(5)
-            rr = requests.post(fetch_url, headers=headers, json={"operationName": operation_name}, timeout=self.timeout)
+        return f"{base}/projects/{self.project_id}/locations/{self.location}/{self._model_path()}:fetchPredictOperation"
+
+    @staticmethod
+    def _operation_video(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The video entry (gcsUri or bytesBase64Encoded) of a finished operation, None while running."""
+        if not data.get("done"):
+            return None
+        if "error" in data:
+            raise RuntimeError(f"Vertex error: {data['error']}")
+        for v in data.get("response", {}).get("videos", []):
+            if "gcsUri" in v or "bytesBase64Encoded" in v:
+                return v
+        raise RuntimeError("Vertex: no video in response")
+
+    def _poll_and_download(self, handle: Dict[str, Any], cancel_event: Optional[Any] = None, max_wait: float = 600) -> str:
+        operation_name = handle["operation_name"]
+        key = poll_key("vertex", handle.get("model") or self.model)
+        submitted_at = handle.get("submitted_at") or time.time()
+        fetch_url = self._fetch_url()
+        start = time.time()
+        attempt = 0
+        while time.time() - start < max_wait:
+            delay = adaptive_polling.delay(key, attempt, time.time() - submitted_at)
+            attempt += 1
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                self.cancel_operation(operation_name)
+                raise RuntimeError(f"Vertex operation cancelled: {operation_name}")
+            rr = self._request(
+                "POST", fetch_url, headers=self._headers(), json={"operationName": operation_name},
+                timeout=self.timeout, policy=POLL, cancel_event=cancel_event,
+            )
             rr.raise_for_status()
-            data = rr.json()
-            if data.get("done"):
-                if "error" in data:
-                    raise RuntimeError(f"Vertex error: {data['error']}")
-                resp = data.get("response", {})
-                videos = resp.get("videos", [])
-                if videos:
-                    v = videos[0]
-                    if "gcsUri" in v:
-                        # Download with authorization and return a local file path
-                        http_url = v["gcsUri"].replace("gs://", "https://storage.googleapis.com/")
-                        out = f"/tmp/vertex_{int(time.time())}.mp4"
-                        rr = requests.get(http_url, headers=self._headers(), stream=True, timeout=self.timeout)
-                        rr.raise_for_status()
-                        with open(out, "wb") as f:
-                            for chunk in rr.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
-                        return out
-                    if "bytesBase64Encoded" in v:
-                        out = f"/tmp/vertex_{int(time.time())}.mp4"
-                        with open(out, "wb") as f:
-                            f.write(base64.b64decode(v["bytesBase64Encoded"]))
-                        return out
-                raise RuntimeError("Vertex: no video in response")
+            v = self._operation_video(rr.json())
+            if v is None:
+                continue
+            adaptive_polling.record(key, time.time() - submitted_at)
+            fd, out = tempfile.mkstemp(prefix="vertex_", suffix=".mp4")
+            os.close(fd)
+            if "gcsUri" in v:
+                # Download with authorization and return a local file path
+                http_url = v["gcsUri"].replace("gs://", "https://storage.googleapis.com/")
+                rr = http_sessions.session("vertex").get(http_url, headers=self._headers(), stream=True, timeout=self.timeout)
+                rr.raise_for_status()
+                with open(out, "wb") as f:
+                    for chunk in rr.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                return out
+            with open(out, "wb") as f:
+                f.write(base64.b64decode(v["bytesBase64Encoded"]))
+            return out
         raise RuntimeError("Vertex: operation timed out")
-
-
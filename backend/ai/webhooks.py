@@ -0,0 +1,196 @@
+"""
+Provider completion webhooks.
+
+When `webhook_base_url` is set (an address providers can reach, e.g. a
+tunnel to this backend), the async clients ask Replicate and WaveSpeed to
+POST the finished prediction to `{webhook_base_url}/webhooks/{provider}`.
+The receiver verifies the signature and hands the payload to the poller task
+waiting on that prediction, which finishes the job straight away. Polling
+continues as a fallback at `webhook_fallback_interval` (default 120 s), so a
+lost webhook only delays a render.
+
+Signatures follow the Standard Webhooks scheme both providers use: an
+HMAC-SHA256 over "{webhook-id}.{webhook-timestamp}.{body}" with the
+endpoint secret ("whsec_..."), sent in the `webhook-signature` header.
+Replicate base64-encodes key and digest; WaveSpeed uses the secret as is
+with a hex digest. Secrets come from `replicate_webhook_secret` /
+`wavespeed_webhook_secret`; Replicate's is fetched with the API token when
+unset; a provider without one is not sent a callback URL and is polled as
+before. Deliveries older than five minutes are rejected.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from backend.ai.sessions import http_sessions
+
+PROVIDERS = ("replicate", "wavespeed")
+DEFAULT_FALLBACK_INTERVAL = 120.0
+TIMESTAMP_TOLERANCE = 300
+# Payloads that arrive before anything waits for them are kept this long
+UNCLAIMED_TTL = 900
+SIGNATURE_ENCODING = {"replicate": "base64", "wavespeed": "hex"}
+
+
+def signature(secret: str, msg_id: str, timestamp: str, body: bytes, encoding: str) -> str:
+    key = secret[len("whsec_"):] if secret.startswith("whsec_") else secret
+    key_bytes = base64.b64decode(key) if encoding == "base64" else key.encode()
+    digest = hmac.new(key_bytes, f"{msg_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode() if encoding == "base64" else digest.hex()
+
+
+def remote_id(provider: str, payload: Dict[str, Any]) -> Optional[str]:
+    """Prediction / request id a webhook payload is about."""
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+    return payload.get("id") or data.get("id") or payload.get("requestId")
+
+
+class WebhookHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[Tuple[str, str], List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._unclaimed: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._secrets: Dict[str, str] = {}
+        self._fetched_secrets: Dict[str, str] = {}
+        self.base_url: Optional[str] = None
+        self.fallback_interval = DEFAULT_FALLBACK_INTERVAL
+        self.replicate_api_token: Optional[str] = None
+        self.received = 0
+        self.rejected = 0
+        self.delivered = 0
+
+    def configure(self, settings: Dict[str, Any]) -> None:
+        """Apply the webhook_* settings and provider secrets."""
+        base_url = (settings.get("webhook_base_url") or "").strip().rstrip("/")
+        self.base_url = base_url or None
+        self.fallback_interval = float(settings.get("webhook_fallback_interval") or DEFAULT_FALLBACK_INTERVAL)
+        self.replicate_api_token = settings.get("replicate_api_token") or os.environ.get("REPLICATE_API_TOKEN")
+        with self._lock:
+            self._secrets = {p: settings[f"{p}_webhook_secret"] for p in PROVIDERS if settings.get(f"{p}_webhook_secret")}
+
+    def callback_url(self, provider: str) -> Optional[str]:
+        """
+        Where `provider` should POST completions. None when webhooks are off or
+        no signing secret is available, since such deliveries could not be
+        verified. May fetch Replicate's secret, so call it off the event loop.
+        """
+        if self.base_url and provider in PROVIDERS and self._secret(provider):
+            return f"{self.base_url}/webhooks/{provider}"
+        return None
+
+    def _secret(self, provider: str) -> Optional[str]:
+        with self._lock:
+            secret = self._secrets.get(provider) or self._fetched_secrets.get(provider)
+        if secret or provider != "replicate" or not self.replicate_api_token:
+            return secret
+        # Replicate signs with an account-wide secret that the API hands out
+        try:
+            r = http_sessions.request(
+                "replicate", "GET", "https://api.replicate.com/v1/webhooks/default/secret",
+                headers={"Authorization": f"Bearer {self.replicate_api_token}"}, timeout=15,
+            )
+            r.raise_for_status()
+            secret = r.json().get("key")
+        except Exception as e:
+            print(f"[WEBHOOK] Could not fetch the Replicate webhook secret: {e}")
+            return None
+        if secret:
+            with self._lock:
+                self._fetched_secrets[provider] = secret
+        return secret
+
+    def verify(self, provider: str, headers: Mapping[str, str], body: bytes) -> bool:
+        """Check the Standard Webhooks signature and timestamp of a delivery."""
+        secret = self._secret(provider)
+        msg_id = headers.get("webhook-id")
+        timestamp = headers.get("webhook-timestamp")
+        signatures = headers.get("webhook-signature") or ""
+        if not secret or not msg_id or not timestamp:
+            return False
+        try:
+            if abs(time.time() - int(timestamp)) > TIMESTAMP_TOLERANCE:
+                return False
+        except ValueError:
+            return False
+        expected = signature(secret, msg_id, timestamp, body, SIGNATURE_ENCODING.get(provider, "base64"))
+        # Space-separated "v1,<signature>" entries (several while a secret rotates)
+        for entry in signatures.split():
+            sig = entry.split(",", 1)[-1]
+            if hmac.compare_digest(sig, expected):
+                return True
+        return False
+
+    def deliver(self, provider: str, remote: str, payload: Dict[str, Any]) -> bool:
+        """Hand a verified payload to the task waiting on it; kept for a while if none is. True if one was."""
+        key = (provider, remote)
+        now = time.time()
+        with self._lock:
+            self.received += 1
+            waiters = self._waiters.pop(key, [])
+            if not waiters:
+                self._unclaimed = {k: v for k, v in self._unclaimed.items() if now - v[0] < UNCLAIMED_TTL}
+                self._unclaimed[key] = (now, payload)
+                return False
+            self.delivered += 1
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, payload)
+        return True
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    async def wait(self, provider: str, remote: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Sleep up to `timeout` seconds, returning early with the webhook payload
+        for `remote` if one arrives (or already did). None on timeout.
+        """
+        key = (provider, remote)
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            unclaimed = self._unclaimed.pop(key, None)
+            if unclaimed is not None:
+                self.delivered += 1
+                return unclaimed[1]
+            self._waiters.setdefault(key, []).append((asyncio.get_running_loop(), future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key)
+                if waiters:
+                    waiters[:] = [w for w in waiters if w[1] is not future]
+                    if not waiters:
+                        self._waiters.pop(key, None)
+
+    def poll_delay(self, delay: float, handle: Dict[str, Any]) -> float:
+        """Stretch a poll delay to the fallback interval for a prediction that will call back."""
+        return max(delay, self.fallback_interval) if handle.get("webhook") else delay
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.base_url is not None,
+                "fallback_interval": self.fallback_interval,
+                "received": self.received,
+                "delivered": self.delivered,
+                "rejected": self.rejected,
+                "waiting": sum(len(w) for w in self._waiters.values()),
+                "unclaimed": len(self._unclaimed),
+            }
+
+
+def _resolve(future: asyncio.Future, payload: Dict[str, Any]) -> None:
+    if not future.done():
+        future.set_result(payload)
+
+
+webhooks = WebhookHub()
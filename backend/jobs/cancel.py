@@ -0,0 +1,107 @@
+"""
+Cooperative cancellation for background jobs.
+
+Each running job gets a CancelToken (a threading.Event, so provider clients can
+take it as a plain `cancel_event` and sleep with `cancel_event.wait(interval)`).
+Cancelling sets the event, which wakes pollers immediately, and runs the
+callbacks registered with `on_cancel` (cancel the remote prediction, kill an
+ffmpeg child, drop a queued sub-task).
+
+The token of the job a thread is working for is available via current_token();
+the scheduler carries it across to sub-tasks it runs on other pools.
+"""
+
+from contextlib import contextmanager
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class JobCancelled(RuntimeError):
+    pass
+
+
+class CancelToken(threading.Event):
+    def __init__(self, job_id: Optional[str] = None):
+        super().__init__()
+        self.job_id = job_id
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run `callback` on cancel (at once if already cancelled); returns an unregister function."""
+        with self._lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.is_set():
+                return
+            self.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[JOBS] Cancel callback failed: {e}")
+
+    def raise_if_cancelled(self) -> None:
+        if self.is_set():
+            raise JobCancelled("Job cancelled")
+
+
+class CancelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, CancelToken] = {}
+
+    def token_for(self, job_id: str) -> CancelToken:
+        with self._lock:
+            token = self._tokens.get(job_id)
+            if token is None:
+                token = self._tokens[job_id] = CancelToken(job_id)
+            return token
+
+    def cancel(self, job_id: str) -> None:
+        self.token_for(job_id).cancel()
+
+    def cancel_existing(self, job_id: str) -> bool:
+        """Cancel `job_id`'s token only if something registered one; returns whether it did."""
+        with self._lock:
+            token = self._tokens.get(job_id)
+        if token is None:
+            return False
+        token.cancel()
+        return True
+
+    def release(self, job_id: str) -> None:
+        with self._lock:
+            self._tokens.pop(job_id, None)
+
+
+_local = threading.local()
+
+
+def current_token() -> Optional[CancelToken]:
+    return getattr(_local, "token", None)
+
+
+@contextmanager
+def use_token(token: Optional[CancelToken]) -> Iterator[Optional[CancelToken]]:
+    previous = current_token()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+cancel_tokens = CancelRegistry()
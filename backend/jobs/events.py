@@ -0,0 +1,85 @@
+"""
+Fan-out of job state changes to live subscribers (the /jobs/stream SSE endpoint).
+
+JobStore calls `publish(job)` from whatever worker thread updated the job;
+each subscriber lives on an asyncio event loop and is handed the change with
+call_soon_threadsafe. Subscribers keep only the latest state per job, so a
+slow client receives coalesced updates instead of an ever-growing backlog.
+"""
+
+import asyncio
+from collections import OrderedDict
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class JobSubscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, project_id: Optional[str] = None,
+                 job_type: Optional[str] = None, job_id: Optional[str] = None):
+        self.loop = loop
+        self.project_id = project_id
+        self.job_type = job_type
+        self.job_id = job_id
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def matches(self, job: Dict[str, Any]) -> bool:
+        if self.project_id is not None and job.get("project_id") != self.project_id:
+            return False
+        if self.job_type is not None and job.get("type") != self.job_type:
+            return False
+        if self.job_id is not None and job.get("id") != self.job_id:
+            return False
+        return True
+
+    def _push(self, job: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop; a newer state replaces an unsent one
+        self._pending.pop(job["id"], None)
+        self._pending[job["id"]] = job
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """Updates since the last call, or [] after `timeout` seconds of quiet."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class JobEvents:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[JobSubscription] = []
+
+    def subscribe(self, **filters: Optional[str]) -> JobSubscription:
+        """Must be called from the event loop that will consume the subscription."""
+        sub = JobSubscription(asyncio.get_running_loop(), **filters)
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: JobSubscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            targets = [sub for sub in self._subscribers if sub.matches(job)]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._push, job)
+            except RuntimeError:
+                # Loop already closed: the client went away
+                self.unsubscribe(sub)
+
+
+job_events = JobEvents()
@@ -0,0 +1,232 @@
+"""
+Runs a set of jobs with dependencies on the scheduler.
+
+Nodes are submitted as soon as every dependency has finished successfully,
+subject to a per-group in-flight limit (groups are providers for shot
+generation). Nothing blocks while waiting: completion callbacks on the
+scheduler futures submit whatever became ready, so a graph never holds a
+worker slot of its own. When a node fails, everything downstream of it is
+skipped.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+# Node states
+WAITING = "waiting"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, SKIPPED, CANCELLED)
+
+
+def topological_order(deps: Dict[str, Iterable[str]]) -> List[str]:
+    """Order node ids so each comes after its deps; raises ValueError on unknown deps or cycles."""
+    dependents: Dict[str, List[str]] = {node_id: [] for node_id in deps}
+    remaining: Dict[str, int] = {}
+    for node_id, node_deps in deps.items():
+        node_deps = list(dict.fromkeys(node_deps))
+        for dep in node_deps:
+            if dep not in dependents:
+                raise ValueError(f"{node_id} depends on unknown node {dep}")
+            dependents[dep].append(node_id)
+        remaining[node_id] = len(node_deps)
+    order = [node_id for node_id, count in remaining.items() if count == 0]
+    for node_id in order:
+        for child in dependents[node_id]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                order.append(child)
+    if len(order) != len(deps):
+        cyclic = sorted(node_id for node_id in deps if node_id not in set(order))
+        raise ValueError(f"Dependency cycle between: {', '.join(cyclic)}")
+    return order
+
+
+def downstream(deps: Dict[str, Iterable[str]], roots: Iterable[str]) -> Set[str]:
+    """`roots` plus every node that depends on one of them, directly or transitively."""
+    dependents: Dict[str, List[str]] = {}
+    for node_id, node_deps in deps.items():
+        for dep in node_deps:
+            dependents.setdefault(dep, []).append(node_id)
+    seen: Set[str] = set()
+    stack = list(roots)
+    while stack:
+        node_id = stack.pop()
+        if node_id not in seen:
+            seen.add(node_id)
+            stack.extend(dependents.get(node_id, ()))
+    return seen
+
+
+class GraphNode:
+    def __init__(self, node_id: str, run: Callable[[], Any], deps: Iterable[str], group: Optional[str],
+                 pool: str, priority: int, job_id: Optional[str]):
+        self.node_id = node_id
+        self.run = run
+        self.deps = list(dict.fromkeys(deps))
+        self.dependents: List[str] = []
+        self.group = group
+        self.pool = pool
+        self.priority = priority
+        self.job_id = job_id
+        self.state = WAITING
+        self.error: Optional[str] = None
+        self.result: Any = None
+
+
+class JobGraph:
+    def __init__(
+        self,
+        scheduler,
+        limits: Optional[Dict[str, int]] = None,
+        default_limit: Optional[int] = None,
+        on_node_change: Optional[Callable[[GraphNode], None]] = None,
+        on_finished: Optional[Callable[["JobGraph"], None]] = None,
+    ):
+        self.scheduler = scheduler
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.on_node_change = on_node_change
+        self.on_finished = on_finished
+        self.nodes: Dict[str, GraphNode] = {}
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Optional[str], int] = {}
+        self._started = False
+        self._cancelled = False
+        self._finished = threading.Event()
+
+    def add(self, node_id: str, run: Callable[[], Any], deps: Iterable[str] = (), group: Optional[str] = None,
+            pool: str = "remote", priority: int = 0, job_id: Optional[str] = None) -> GraphNode:
+        """`run()` executes the node on a scheduler worker; raising marks it failed."""
+        if node_id in self.nodes:
+            raise ValueError(f"Duplicate node: {node_id}")
+        node = self.nodes[node_id] = GraphNode(node_id, run, deps, group, pool, priority, job_id)
+        return node
+
+    def validate(self) -> List[str]:
+        """Link dependents and return a topological order; raises ValueError on unknown deps or cycles."""
+        order = topological_order({node_id: node.deps for node_id, node in self.nodes.items()})
+        for node in self.nodes.values():
+            node.dependents = []
+        for node_id in order:
+            for dep in self.nodes[node_id].deps:
+                self.nodes[dep].dependents.append(node_id)
+        return order
+
+    def start(self) -> None:
+        self.validate()
+        with self._lock:
+            self._started = True
+        if not self.nodes:
+            self._finish()
+            return
+        self._pump()
+
+    def cancel(self) -> List[GraphNode]:
+        """Stop submitting; nodes not yet started become cancelled. Returns the nodes still running."""
+        with self._lock:
+            self._cancelled = True
+            changed = [node for node in self.nodes.values() if node.state == WAITING]
+            for node in changed:
+                node.state = CANCELLED
+            running = [node for node in self.nodes.values() if node.state == RUNNING]
+        for node in changed:
+            self._notify(node)
+        self._maybe_finish()
+        return running
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for node in self.nodes.values():
+                counts[node.state] = counts.get(node.state, 0) + 1
+            return counts
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    # -- internals -------------------------------------------------------
+
+    def _limit(self, group: Optional[str]) -> Optional[int]:
+        return self.limits.get(group, self.default_limit) if group is not None else None
+
+    def _pump(self) -> None:
+        """Submit every node whose dependencies are done, within group limits."""
+        with self._lock:
+            if self._cancelled:
+                return
+            ready = []
+            for node in self.nodes.values():
+                if node.state != WAITING or any(self.nodes[dep].state != DONE for dep in node.deps):
+                    continue
+                limit = self._limit(node.group)
+                if limit is not None and self._in_flight.get(node.group, 0) >= limit:
+                    continue
+                node.state = RUNNING
+                self._in_flight[node.group] = self._in_flight.get(node.group, 0) + 1
+                ready.append(node)
+        for node in ready:
+            self._notify(node)
+            future = self.scheduler.submit(node.job_id, node.run, pool=node.pool, priority=node.priority)
+            future.add_done_callback(lambda f, node=node: self._node_done(node, f))
+
+    def _node_done(self, node: GraphNode, future) -> None:
+        skipped: List[GraphNode] = []
+        with self._lock:
+            self._in_flight[node.group] = self._in_flight.get(node.group, 1) - 1
+            if future.cancelled():
+                node.state = CANCELLED
+            elif future.exception() is not None:
+                node.state = FAILED
+                node.error = str(future.exception())
+            else:
+                node.state = DONE
+                node.result = future.result()
+            if node.state != DONE:
+                # Everything downstream of a failed/cancelled node is skipped
+                stack = list(node.dependents)
+                while stack:
+                    child = self.nodes[stack.pop()]
+                    if child.state == WAITING:
+                        child.state = SKIPPED
+                        child.error = f"Skipped: depends on {node.node_id}, which {node.state}"
+                        skipped.append(child)
+                        stack.extend(child.dependents)
+        self._notify(node)
+        for child in skipped:
+            self._notify(child)
+        self._pump()
+        self._maybe_finish()
+
+    def _notify(self, node: GraphNode) -> None:
+        if self.on_node_change:
+            try:
+                self.on_node_change(node)
+            except Exception as e:
+                print(f"[JOBS] Graph node callback failed: {e}")
+
+    def _maybe_finish(self) -> None:
+        with self._lock:
+            if not self._started or self._finished.is_set():
+                return
+            if any(node.state not in FINISHED_STATES for node in self.nodes.values()):
+                return
+        self._finish()
+
+    def _finish(self) -> None:
+        with self._lock:
+            if self._finished.is_set():
+                return
+            self._finished.set()
+        if self.on_finished:
+            try:
+                self.on_finished(self)
+            except Exception as e:
+                print(f"[JOBS] Graph completion callback failed: {e}")
@@ -0,0 +1,279 @@
+"""
+Bounded worker pools for background jobs.
+
+Jobs are queued on the pool for the resource they are bound by instead of each
+getting its own thread:
+
+- "remote": waiting on provider APIs (uploads, polling, downloads)
+- "ffmpeg": local encoding / compositing (CPU-bound)
+
+Each pool runs at most `max_workers` tasks at once and serves its queue by
+priority (higher first), FIFO within a priority. Worker threads are started
+lazily and exit after being idle for a while.
+
+A task waiting on the provider poller (JobScheduler.wait) is parked: it gives
+its slot back while the render is in flight, so the pool limits concurrent
+submissions and post-processing rather than how many renders are out.
+"""
+
+from concurrent.futures import CancelledError, Future
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.jobs.cancel import JobCancelled, current_token, use_token
+
+
+def _default_pool_sizes() -> Dict[str, int]:
+    return {"remote": 4, "ffmpeg": max(1, (os.cpu_count() or 2) // 2)}
+
+
+class _Task:
+    __slots__ = ("job_id", "fn", "args", "kwargs", "priority", "seq", "queued_at", "started_at", "future")
+
+    def __init__(self, job_id: Optional[str], fn: Callable, args: Tuple, kwargs: Dict[str, Any], priority: int, seq: int):
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.future: Future = Future()
+
+
+class WorkerPool:
+    IDLE_EXIT_SECONDS = 60.0
+    # Parked tasks keep their (blocked) thread; past this many, waiting holds the slot
+    MAX_PARKED = 256
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._heap: List[Tuple[int, int, _Task]] = []
+        self._running: Dict[int, _Task] = {}
+        self._parked: Dict[int, _Task] = {}
+        self._cond = threading.Condition()
+        self._workers = 0
+        self._idle = 0
+        self._local = threading.local()
+        self.completed = 0
+        self.total_wait = 0.0
+
+    def _start_worker(self) -> None:
+        # Called with self._cond held
+        self._workers += 1
+        threading.Thread(target=self._worker, name=f"jobs-{self.name}-{self._workers}", daemon=True).start()
+
+    def _wake(self) -> None:
+        """A task is queued or a slot freed: start a worker if none is idle (self._cond held)."""
+        if self._idle == 0 and self._workers - len(self._parked) < self.max_workers:
+            self._start_worker()
+        else:
+            self._cond.notify()
+
+    def submit(self, task: _Task) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (-task.priority, task.seq, task))
+            self._wake()
+
+    def resize(self, max_workers: int) -> None:
+        with self._cond:
+            self.max_workers = max(1, int(max_workers))
+            missing = min(len(self._heap), self.max_workers - (self._workers - len(self._parked)))
+            for _ in range(max(0, missing)):
+                self._start_worker()
+
+    def in_worker(self) -> bool:
+        return getattr(self._local, "active", False)
+
+    def park(self, future: Future) -> Any:
+        """
+        Wait for `future` from a task on this pool with its slot released, so
+        another queued task can run meanwhile; the task takes its slot back
+        (briefly over the limit if the pool filled up) once the future is done.
+        """
+        task = getattr(self._local, "task", None)
+        with self._cond:
+            parked = task is not None and len(self._parked) < self.MAX_PARKED
+            if parked:
+                self._running.pop(task.seq, None)
+                self._parked[task.seq] = task
+                if self._heap:
+                    self._wake()
+        try:
+            return future.result()
+        finally:
+            if parked:
+                with self._cond:
+                    self._parked.pop(task.seq, None)
+                    self._running[task.seq] = task
+
+    def _worker(self) -> None:
+        self._local.active = True
+        while True:
+            with self._cond:
+                self._idle += 1
+                deadline = time.time() + self.IDLE_EXIT_SECONDS
+                while not self._heap or len(self._running) >= self.max_workers:
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or self._workers - len(self._parked) > self.max_workers:
+                        self._idle -= 1
+                        self._workers -= 1
+                        return
+                    self._cond.wait(remaining)
+                self._idle -= 1
+                _, _, task = heapq.heappop(self._heap)
+                task.started_at = time.time()
+                self._running[task.seq] = task
+                self._local.task = task
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.fn(*task.args, **task.kwargs))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                self._local.task = None
+                with self._cond:
+                    self._running.pop(task.seq, None)
+                    self.completed += 1
+                    self.total_wait += task.started_at - task.queued_at
+                    self._cond.notify()
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a job that is still waiting in the queue; False if it is not queued."""
+        with self._cond:
+            kept = [entry for entry in self._heap if entry[2].job_id != job_id]
+            if len(kept) == len(self._heap):
+                return False
+            removed = [entry[2] for entry in self._heap if entry[2].job_id == job_id]
+            self._heap = kept
+            heapq.heapify(self._heap)
+        for task in removed:
+            task.future.cancel()
+        return True
+
+    def find(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position / wait time for a job queued or running on this pool."""
+        with self._cond:
+            now = time.time()
+            for task in [*self._running.values(), *self._parked.values()]:
+                if task.job_id == job_id:
+                    return {
+                        "pool": self.name,
+                        "state": "parked" if task.seq in self._parked else "running",
+                        "position": 0,
+                        "wait_seconds": round(task.started_at - task.queued_at, 3),
+                    }
+            ordered = sorted(self._heap)
+            for position, (_, _, task) in enumerate(ordered, start=1):
+                if task.job_id == job_id:
+                    return {
+                        "pool": self.name,
+                        "state": "queued",
+                        "position": position,
+                        "queue_depth": len(ordered),
+                        "wait_seconds": round(now - task.queued_at, 3),
+                        "priority": task.priority,
+                    }
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.time()
+            oldest = max((now - t.queued_at for _, _, t in self._heap), default=0.0)
+            return {
+                "max_workers": self.max_workers,
+                "workers": self._workers,
+                "running": len(self._running),
+                "parked": len(self._parked),
+                "queue_depth": len(self._heap),
+                "oldest_wait_seconds": round(oldest, 3),
+                "completed": self.completed,
+                "avg_wait_seconds": round(self.total_wait / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+class JobScheduler:
+    def __init__(self, pool_sizes: Optional[Dict[str, int]] = None):
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.pools: Dict[str, WorkerPool] = {}
+        for name, size in {**_default_pool_sizes(), **(pool_sizes or {})}.items():
+            self.pools[name] = WorkerPool(name, size)
+
+    def pool(self, name: str) -> WorkerPool:
+        with self._lock:
+            pool = self.pools.get(name)
+            if pool is None:
+                pool = self.pools[name] = WorkerPool(name, _default_pool_sizes().get(name, 2))
+            return pool
+
+    def configure(self, pool_sizes: Dict[str, int]) -> None:
+        for name, size in pool_sizes.items():
+            if size:
+                self.pool(name).resize(size)
+
+    def submit(self, job_id: Optional[str], fn: Callable, *args: Any, pool: str = "remote", priority: int = 0, **kwargs: Any) -> Future:
+        """Queue `fn(*args, **kwargs)` on a pool; returns a Future for its result."""
+        task = _Task(job_id, fn, args, kwargs, int(priority or 0), next(self._seq))
+        self.pool(pool).submit(task)
+        return task.future
+
+    def run(self, pool: str, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run one stage of a job (e.g. an ffmpeg composite inside a remote job) on
+        another pool and wait for it, so CPU-heavy steps respect that pool's limit.
+        Runs inline when already on a worker of that pool. The caller's cancel
+        token follows the stage, and cancelling it drops a stage still queued.
+        """
+        target = self.pool(pool)
+        if target.in_worker():
+            return fn(*args, **kwargs)
+        token = current_token()
+
+        def stage():
+            with use_token(token):
+                return fn(*args, **kwargs)
+
+        future = self.submit(None, stage, pool=pool, priority=10)
+        unregister = token.on_cancel(future.cancel) if token is not None else None
+        try:
+            return future.result()
+        finally:
+            if unregister is not None:
+                unregister()
+
+    def wait(self, future: Future) -> Any:
+        """
+        Wait for `future` (e.g. a provider coroutine on the poller) from inside a
+        job; when called on a worker its slot is parked meanwhile. Raises
+        JobCancelled if the future was cancelled.
+        """
+        pool = next((p for p in list(self.pools.values()) if p.in_worker()), None)
+        try:
+            return pool.park(future) if pool is not None else future.result()
+        except CancelledError:
+            raise JobCancelled("Job cancelled")
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a queued job from its pool; returns False if it is not queued."""
+        return any(pool.remove(job_id) for pool in list(self.pools.values()))
+
+    def queue_info(self, job_id: str) -> Optional[Dict[str, Any]]:
+        for pool in list(self.pools.values()):
+            info = pool.find(job_id)
+            if info is not None:
+                return info
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: pool.stats() for name, pool in list(self.pools.items())}
+
+
+scheduler = JobScheduler()
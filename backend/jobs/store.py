@@ -0,0 +1,243 @@
+"""
+Persistence for background job state.
+
+Jobs live in memory; disk holds a compacted snapshot (`_jobs.json`, the old
+format) plus an append-only log of per-job field updates (`_jobs.log.jsonl`).
+
+- Job creation, state transitions, remote handles, ... are appended and
+  fsynced immediately.
+- Progress-only updates (PROGRESS_FIELDS) are merged per job and appended by
+  a background flusher at most once per `debounce_seconds`.
+- Once the log grows past `compact_every` lines the snapshot is rewritten and
+  the log truncated; finished jobs older than `ttl_seconds` are dropped then
+  (and on load).
+
+Configure with OPENFILMAI_JOBS_DEBOUNCE_SECONDS (default 1),
+OPENFILMAI_JOBS_TTL_SECONDS (default 7 days; 0 keeps finished jobs forever)
+and OPENFILMAI_JOBS_COMPACT_EVERY (default 500 log lines).
+"""
+
+from pathlib import Path
+import atexit
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.storage.codec import get_row_codec
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+# Updates touching only these fields are batched; anything else is durable at once
+PROGRESS_FIELDS = frozenset(("progress", "message", "stage"))
+# Updates a cancelled job no longer accepts
+CANCELLED_IGNORES = frozenset(("status", "progress", "message", "stage", "error", "started_at"))
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+class JobStore:
+    def __init__(
+        self,
+        directory: Path,
+        debounce_seconds: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        compact_every: Optional[int] = None,
+    ):
+        self.snapshot_path = Path(directory) / "_jobs.json"
+        self.log_path = Path(directory) / "_jobs.log.jsonl"
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else _env_float("OPENFILMAI_JOBS_DEBOUNCE_SECONDS", 1.0)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else _env_float("OPENFILMAI_JOBS_TTL_SECONDS", 7 * 24 * 3600)
+        self.compact_every = compact_every if compact_every is not None else int(_env_float("OPENFILMAI_JOBS_COMPACT_EVERY", 500))
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        # Guards `jobs` and `_pending`; held only for in-memory work
+        self.lock = threading.RLock()
+        # Serializes file writes so they never block readers/updaters
+        self._io_lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._log_lines = 0
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        # Called with a copy of the job after every create/update
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        atexit.register(self.flush)
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, job: Dict[str, Any]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"[JOBS] Job listener failed: {e}")
+
+    # -- loading ---------------------------------------------------------
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot + replayed log; prunes expired jobs and compacts."""
+        codec = get_row_codec()
+        jobs: Dict[str, Dict[str, Any]] = {}
+        if self.snapshot_path.exists():
+            try:
+                jobs = codec.read_file(self.snapshot_path) or {}
+            except Exception:
+                jobs = {}
+        lines = 0
+        if self.log_path.exists():
+            with open(self.log_path, "rb") as f:
+                for raw in f:
+                    try:
+                        record = codec.loads(raw)
+                    except Exception:
+                        # Torn trailing line from a crash mid-append
+                        continue
+                    lines += 1
+                    job_id = record.get("id")
+                    fields = record.get("fields") or {}
+                    if record.get("delete"):
+                        jobs.pop(job_id, None)
+                    elif job_id in jobs or "type" in fields:
+                        # Updates to a job the snapshot already pruned are dropped
+                        jobs.setdefault(job_id, {}).update(fields)
+        with self.lock:
+            self.jobs = jobs
+            self._pending.clear()
+            self._log_lines = lines
+            self.prune()
+        self.compact()
+        return self.jobs
+
+    # -- mutations -------------------------------------------------------
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self.lock:
+            self.jobs[job["id"]] = dict(job)
+            self._pending.setdefault(job["id"], {}).update(job)
+        self.flush()
+        self._notify(dict(job))
+
+    def update(self, job_id: str, **fields: Any) -> bool:
+        """Merge fields into a job; returns False for unknown ids."""
+        return self.update_with(job_id, lambda job: fields)
+
+    def update_with(self, job_id: str, compute: Callable[[Dict[str, Any]], Dict[str, Any]]) -> bool:
+        """
+        Read-modify-write: merge the fields `compute(job)` returns for a copy of
+        the current job, under the same lock, so concurrent increments are not
+        lost. `compute` must not call back into the store. Returns False for
+        unknown ids.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            fields = compute(dict(job))
+            if not fields:
+                return True
+            if job.get("status") == "cancelled":
+                # A cancelled job's worker may still report in while it winds down
+                fields = {k: v for k, v in fields.items() if k not in CANCELLED_IGNORES}
+                if not fields:
+                    return True
+            if fields.get("status") in TERMINAL_STATUSES and "finished_at" not in fields:
+                fields["finished_at"] = time.time()
+            job.update(fields)
+            self._pending.setdefault(job_id, {}).update(fields)
+            snapshot = dict(job)
+        if set(fields) <= PROGRESS_FIELDS:
+            self._schedule_flush()
+        else:
+            self.flush()
+        self._notify(snapshot)
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop finished jobs older than the TTL. Returns how many were removed."""
+        if not self.ttl_seconds:
+            return 0
+        cutoff = (now or time.time()) - self.ttl_seconds
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job.get("status") in TERMINAL_STATUSES
+                and (job.get("finished_at") or job.get("created_at") or 0) < cutoff
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+                self._pending[job_id] = None  # type: ignore[assignment]
+        return len(expired)
+
+    # -- disk ------------------------------------------------------------
+
+    def _schedule_flush(self) -> None:
+        if self._flusher is None or not self._flusher.is_alive():
+            with self.lock:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._flush_loop, name="job-store-flush", daemon=True)
+                    self._flusher.start()
+        self._wake.set()
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self.debounce_seconds)
+            self._wake.clear()
+            try:
+                self.flush(sync=False)
+            except Exception as e:
+                print(f"[JOBS] Failed to persist job updates: {e}")
+
+    def flush(self, sync: bool = True) -> None:
+        """Append every pending update to the log (fsync unless sync=False)."""
+        codec = get_row_codec()
+        with self._io_lock:
+            with self.lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            lines = []
+            for job_id, fields in pending.items():
+                record = {"id": job_id, "delete": True} if fields is None else {"id": job_id, "fields": fields}
+                lines.append(codec.dumps(record) + "\n")
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+            self._log_lines += len(lines)
+            needs_compaction = self._log_lines >= self.compact_every
+        if needs_compaction:
+            self.prune()
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Rewrite the snapshot from memory and truncate the log. Pending updates
+        stay queued: replaying them over the new snapshot is harmless, and if
+        we crash before the unlink the old log replays to the same state.
+        """
+        codec = get_row_codec()
+        with self._io_lock:
+            with self.lock:
+                snapshot = {job_id: dict(job) for job_id, job in self.jobs.items()}
+            codec.write_file(self.snapshot_path, snapshot)
+            try:
+                self.log_path.unlink()
+            except FileNotFoundError:
+                pass
+            self._log_lines = 0
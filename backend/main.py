@@ -1,15 +1,15 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+import asyncio
 import re
 from pathlib import Path
 import json
 import shutil
 import subprocess
 from urllib.parse import urlparse
-import threading
 import time
 import uuid
 import logging
@@ -35,15 +35,45 @@ from backend.storage.files import (
     list_characters,
     upsert_character,
     get_character,
+    get_media,
+    get_shot,
+    query_media,
+    backfill_media_timestamps,
+    project_revision,
     delete_character,
     archive_media,
     bulk_archive_media,
+    media_references,
+    configure_metadata_backend,
+    get_metadata_store,
+    import_metadata_json,
+    export_metadata_json,
+    metadata_cache_stats,
+    project_lock,
+    project_transaction,
+    read_metadata_for_update,
 )
-from backend.ai.replicate_client import ReplicateClient
+from backend.storage.codec import get_row_codec
+from backend.storage.metadata_index import MEDIA_SORT_KEYS
+from backend.storage.metadata_store import METADATA_BACKENDS
+from backend.jobs.scheduler import scheduler as job_scheduler
+from backend.jobs.store import JobStore, TERMINAL_STATUSES
+from backend.jobs.events import job_events
+from backend.jobs.cancel import JobCancelled, cancel_tokens, current_token as current_cancel_token, use_token
+from backend.jobs.graph import JobGraph, downstream, topological_order
 from backend.ai.vertex_client import VertexClient
+from backend.ai.async_clients import (
+    AsyncElevenLabsProvider, AsyncReplicateClient, AsyncVertexClient, AsyncWaveSpeedProvider,
+)
+from backend.ai.poller import poller
+from backend.ai.polling import adaptive_polling
+from backend.ai.ratelimit import limited_request, rate_limits
+from backend.ai.retry import add_retry_listener, notify_retry
+from backend.ai.sessions import http_sessions
+from backend.ai.uploads import uploads
+from backend.ai.webhooks import PROVIDERS as WEBHOOK_PROVIDERS, remote_id as webhook_remote_id, webhooks
 from backend.ai.cinematographer import generate_shot_list, refine_shot_prompt
-from ai_porting_bundle.providers.elevenlabs import ElevenLabsProvider
-from ai_porting_bundle.providers.wavespeed import WaveSpeedProvider
+from ai_porting_bundle.providers.base import AIProvider
 from backend.storage.settings import read_settings, write_settings
 
 app = FastAPI(title="OpenFilmAI Backend", version="0.1.0")
@@ -66,7 +96,7 @@ app.add_middleware(
 
 # Serve project_data files (videos, frames) under /files/*
 # StaticFiles doesn't inherit middleware, so we need a custom wrapper
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, JSONResponse, Response
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 @app.get("/files/{full_path:path}")
@@ -140,37 +170,46 @@ def reveal_file_in_finder(req: RevealFileRequest):
 @app.on_event("startup")
 async def startup_event():
     """Load persisted jobs on startup"""
-    _load_jobs()
-    # Mark any "running" jobs as "failed" since backend reload killed them
-    with jobs_lock:
-        for job_id, job in background_jobs.items():
-            if job.get("status") == "running":
-                job["status"] = "failed"
-                job["error"] = "Backend reloaded during job execution"
-                job["message"] = "Job was interrupted by backend reload. Please retry."
-        _save_jobs()
+    job_store.load()
+    _configure_job_pools(read_settings())
+    _recover_jobs()
 
 # In-memory job queue for long-running tasks
-# Persisted to disk to survive backend reloads
-JOBS_FILE = Path.cwd() / "project_data" / "_jobs.json"
-background_jobs: Dict[str, Dict] = {}
-jobs_lock = threading.Lock()
-
-def _load_jobs():
-    """Load jobs from disk on startup"""
-    global background_jobs
-    if JOBS_FILE.exists():
-        try:
-            with open(JOBS_FILE, "r") as f:
-                background_jobs = json.load(f)
-        except Exception:
-            background_jobs = {}
+# Persisted to disk (snapshot + append-only log) to survive backend reloads
+job_store = JobStore(Path.cwd() / "project_data")
+job_store.add_listener(job_events.publish)
+
+# Our provider clients and the porting-bundle providers share one set of API
+# rate limits and report their retries to the same listeners...
+AIProvider.request_limiter = rate_limits
+AIProvider.on_retry = staticmethod(notify_retry)
+# ...and one pooled keep-alive session per provider, and learn typical render times
+AIProvider.session_source = staticmethod(http_sessions.session)
+AIProvider.poll_strategy = adaptive_polling
+# Large input files are uploaded once and passed by URL
+AIProvider.file_uploads = uploads
+
+
+def _on_provider_retry(event: Dict) -> None:
+    """Count provider API retries on the job the calling thread (or poller task) works for."""
+    job_id = event.get("job_id") or getattr(current_cancel_token(), "job_id", None)
+    if not job_id:
+        return
+    last_retry = {**event, "at": time.time()}
+
+    def count(job: Dict) -> Dict:
+        return {"retries": (job.get("retries") or 0) + 1, "last_retry": last_retry}
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        job_store.update_with(job_id, count)
+    else:
+        # Retried from the poller loop: the update fsyncs, so keep it off the loop thread
+        loop.run_in_executor(None, job_store.update_with, job_id, count)
+
 
-def _save_jobs():
-    """Save jobs to disk"""
-    JOBS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(JOBS_FILE, "w") as f:
-        json.dump(background_jobs, f, indent=2)
+add_retry_listener(_on_provider_retry)
 
 
 @app.api_route("/health", methods=["GET", "HEAD"])
@@ -213,33 +252,293 @@ def show_in_finder(req: dict):
 def create_job(job_type: str, **kwargs) -> str:
     """Create a new background job and return its ID"""
     job_id = str(uuid.uuid4())
-    with jobs_lock:
-        background_jobs[job_id] = {
-            "id": job_id,
-            "type": job_type,
-            "status": "running",
-            "progress": 0,
-            "result": None,
-            "error": None,
-            "created_at": time.time(),
-            **kwargs
-        }
-        _save_jobs()
+    job_store.create({
+        "id": job_id,
+        "type": job_type,
+        "status": "running",
+        "progress": 0,
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        **kwargs
+    })
     return job_id
 
 
 def update_job(job_id: str, **kwargs):
-    """Update a job's status"""
-    with jobs_lock:
-        if job_id in background_jobs:
-            background_jobs[job_id].update(kwargs)
-            _save_jobs()
+    """
+    Update a job's status (progress-only updates are persisted in batches).
+    Called from a job that has been cancelled, any non-final update raises
+    JobCancelled, so progress reports double as cancellation checkpoints.
+    """
+    token = current_cancel_token()
+    if token is not None and token.is_set() and kwargs.get("status") not in TERMINAL_STATUSES:
+        raise JobCancelled("Job cancelled")
+    job_store.update(job_id, **kwargs)
 
 
 def get_job(job_id: str) -> Optional[Dict]:
     """Get a job's current status"""
-    with jobs_lock:
-        return background_jobs.get(job_id)
+    return job_store.get(job_id)
+
+
+def _configure_job_pools(settings: Dict) -> None:
+    """Apply worker pool sizes, provider rate limits, HTTP pool, polling, webhook and upload settings (unset keeps the defaults)."""
+    job_scheduler.configure({
+        "remote": settings.get("job_workers_remote"),
+        "ffmpeg": settings.get("job_workers_ffmpeg"),
+    })
+    rate_limits.configure(settings.get("provider_rate_limits"))
+    http_sessions.configure(settings)
+    poller.configure(settings)
+    adaptive_polling.configure(settings)
+    webhooks.configure(settings)
+    uploads.configure(settings)
+
+
+def _recover_jobs():
+    """
+    Pick up jobs interrupted by a backend reload. Queued jobs are requeued;
+    running jobs that already have a remote handle (the provider is still
+    rendering, and billing) are requeued too and their runner resumes polling
+    instead of resubmitting. Anything else is marked failed.
+    """
+    for job in job_store.list():
+        if job.get("status") not in ("running", "queued", "waiting"):
+            continue
+        # Scene batches (and their shots still waiting on a dependency) lived in memory
+        resumable = None if job["status"] == "waiting" else _RESUMABLE_JOBS.get(job.get("type"))
+        request = job.get("request")
+        if resumable and request is not None and (job["status"] == "queued" or job.get("remote")):
+            runner, request_model = resumable
+            try:
+                req = request_model(**request)
+            except Exception as e:
+                logger.warning(f"[Job {job['id']}] Cannot restore request: {e}")
+            else:
+                logger.info(f"[Job {job['id']}] Resuming {job['type']} after backend reload")
+                update_job(job["id"], status="queued", resumed_at=time.time(), message="Resuming after backend reload...")
+                job_scheduler.submit(job["id"], _run_job, job["id"], runner, req, pool=job.get("pool", "remote"), priority=job.get("priority", 0))
+                continue
+        update_job(
+            job["id"],
+            status="failed",
+            error="Backend reloaded during job execution",
+            message="Job was interrupted by backend reload. Please retry.",
+        )
+
+
+def _remote_step(job_id: str, key: str, submit, resume):
+    """
+    One remote generation inside a job. If the job already has a persisted
+    handle for `key` (it was submitted before a reload) `resume(handle)` polls
+    it to completion; otherwise `submit(on_submitted)` starts it and the handle
+    is persisted as soon as the provider accepts the request.
+    """
+    job = get_job(job_id) or {}
+    handle = (job.get("remote") or {}).get(key)
+    if handle:
+        logger.info(f"[Job {job_id}] Resuming remote {key}: {handle}")
+        return resume(handle, cancel_event=current_cancel_token())
+
+    def on_submitted(new_handle):
+        remote = dict((get_job(job_id) or {}).get("remote") or {})
+        remote[key] = new_handle
+        # Straight to the store: the handle must be kept even if the job was
+        # cancelled mid-upload (the poller then cancels the remote side)
+        job_store.update(job_id, remote=remote)
+
+    return submit(on_submitted)
+
+
+def _await_provider(coro):
+    """
+    Run a provider coroutine (backend.ai.async_clients) on the shared poller
+    and wait for it; a job's worker slot is parked meanwhile, and cancelling
+    the job cancels the coroutine.
+    """
+    return job_scheduler.wait(poller.submit(coro, cancel_event=current_cancel_token()))
+
+
+def _run_job(job_id: str, runner, *args):
+    """Scheduler entry point: mark the job as started, then run its worker under its cancel token."""
+    token = cancel_tokens.token_for(job_id)
+    try:
+        if token.is_set():
+            # Cancelled between leaving the queue and starting
+            return
+        update_job(job_id, status="running", started_at=time.time())
+        with use_token(token):
+            runner(job_id, *args)
+    except JobCancelled:
+        logger.info(f"[Job {job_id}] Cancelled")
+    finally:
+        cancel_tokens.release(job_id)
+
+
+def submit_job(job_type: str, runner, *args, pool: str = "remote", priority: Optional[int] = 0, **fields) -> str:
+    """
+    Create a queued job and hand `runner(job_id, *args)` to the scheduler.
+    `pool` is the resource the job is bound by ("remote" or "ffmpeg").
+    """
+    job_id = create_job(job_type, status="queued", pool=pool, priority=priority or 0, **fields)
+    job_scheduler.submit(job_id, _run_job, job_id, runner, *args, pool=pool, priority=priority or 0)
+    return job_id
+
+
+@app.get("/jobs/scheduler/stats")
+def get_job_scheduler_stats():
+    """Worker pool sizes, queue depths and wait times, provider rate limit usage, HTTP connection reuse, poller load, learned render times, webhook deliveries and input uploads"""
+    return {
+        "status": "ok",
+        "pools": job_scheduler.stats(),
+        "rate_limits": rate_limits.stats(),
+        "http": http_sessions.stats(),
+        "poller": poller.stats(),
+        "polling": adaptive_polling.stats(),
+        "webhooks": webhooks.stats(),
+        "uploads": uploads.stats(),
+    }
+
+
+@app.get("/jobs/stream")
+async def stream_jobs(
+    request: Request,
+    project_id: Optional[str] = None,
+    job_type: Optional[str] = Query(None, alias="type"),
+    job_id: Optional[str] = None,
+):
+    """
+    Server-Sent Events feed of job changes (`event: job`, data = the job as
+    returned by GET /jobs/{job_id}), optionally filtered by project, job type
+    or a single job. Active matching jobs are sent first; bursts of progress
+    updates for one job are coalesced to its latest state.
+    """
+    from starlette.responses import StreamingResponse
+
+    codec = get_row_codec()
+    sub = job_events.subscribe(project_id=project_id, job_type=job_type, job_id=job_id)
+
+    def frame(job: Dict) -> str:
+        return f"event: job\nid: {job.get('id')}\ndata: {codec.dumps(job)}\n\n"
+
+    async def events():
+        try:
+            yield "retry: 2000\n\n"
+            for job in job_store.list():
+                if sub.matches(job) and (job_id is not None or job.get("status") not in TERMINAL_STATUSES):
+                    yield frame(job)
+            while not await request.is_disconnected():
+                batch = await sub.next_batch(timeout=15)
+                if not batch:
+                    yield ": keepalive\n\n"
+                for job in batch:
+                    yield frame(job)
+        finally:
+            job_events.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/webhooks/{provider}")
+async def provider_webhook(provider: str, request: Request):
+    """
+    Completion callback from Replicate or WaveSpeed (see backend.ai.webhooks).
+    A delivery with a valid signature is handed to the poller waiting on that
+    prediction, which finishes its job right away.
+    """
+    from starlette.concurrency import run_in_threadpool
+
+    if provider not in WEBHOOK_PROVIDERS:
+        return JSONResponse({"status": "error", "detail": f"Unknown webhook provider: {provider}"}, status_code=404)
+    body = await request.body()
+    # May fetch the signing secret from the provider on first use
+    if not await run_in_threadpool(webhooks.verify, provider, request.headers, body):
+        webhooks.reject()
+        logger.warning(f"[WEBHOOK] Rejected {provider} delivery {request.headers.get('webhook-id')}: bad signature")
+        return JSONResponse({"status": "error", "detail": "Invalid webhook signature"}, status_code=401)
+    try:
+        payload = json.loads(body)
+        remote = webhook_remote_id(provider, payload)
+    except (ValueError, AttributeError):
+        return JSONResponse({"status": "error", "detail": "Invalid webhook payload"}, status_code=400)
+    if not remote:
+        return JSONResponse({"status": "error", "detail": "Webhook payload has no prediction id"}, status_code=400)
+    delivered = webhooks.deliver(provider, remote, payload)
+    # A scan of every job and a durable update: keep both off the server loop
+    job_id = await run_in_threadpool(_mark_webhook, provider, remote)
+    logger.info(f"[WEBHOOK] {provider} {remote} -> job {job_id or '?'} ({'delivered' if delivered else 'held'})")
+    return {"status": "ok", "job_id": job_id, "delivered": delivered}
+
+
+def _mark_webhook(provider: str, remote: str) -> Optional[str]:
+    """Record the delivery on the job waiting for `remote`; returns its id."""
+    job_id = _job_for_remote(provider, remote)
+    if job_id:
+        job_store.update(job_id, webhook_at=time.time())
+    return job_id
+
+
+def _job_for_remote(provider: str, remote: str) -> Optional[str]:
+    """The active job whose persisted remote handle (see _remote_step) is `remote`."""
+    for job in job_store.list():
+        if job.get("status") in TERMINAL_STATUSES:
+            continue
+        for handle in (job.get("remote") or {}).values():
+            if isinstance(handle, dict) and handle.get("provider") == provider and remote in (handle.get("prediction_id"), handle.get("request_id")):
+                return job["id"]
+    return None
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job. A queued job leaves the queue; a running
+    one has its pollers woken, its remote prediction cancelled where the
+    provider supports it (Replicate, Vertex) and its ffmpeg children killed.
+    """
+    job = get_job(job_id)
+    if not job:
+        return {"status": "not_found"}
+    was_queued = _cancel_job(job_id)
+    if was_queued is None:
+        # Finished before (or while) we got to it
+        return {"status": "error", "detail": f"Job already {(get_job(job_id) or job)['status']}"}
+    return {"status": "ok", "job_id": job_id, "was_queued": was_queued}
+
+
+def _cancel_job(job_id: str, message: str = "Cancelled") -> Optional[bool]:
+    """
+    Cancel a job; returns True if it was still queued, False if it was
+    running, None if it had already finished (or does not exist).
+    """
+    marked = False
+
+    def mark(job: Dict) -> Dict:
+        nonlocal marked
+        if job.get("status") in TERMINAL_STATUSES:
+            return {}
+        marked = True
+        return {"status": "cancelled", "message": message, "cancelled_at": time.time()}
+
+    # Mark first (checked and set under the store lock) so the worker's own "failed" update is ignored
+    job_store.update_with(job_id, mark)
+    if not marked:
+        return None
+    was_queued = job_scheduler.cancel(job_id)
+    if not was_queued:
+        if job_scheduler.queue_info(job_id) is not None:
+            # On a worker: its runner releases the token when it exits
+            cancel_tokens.cancel(job_id)
+        else:
+            # Not on a worker (a scene batch, or a runner that just exited): creating a
+            # token here would leak it, so only cancel one its owner registered
+            cancel_tokens.cancel_existing(job_id)
+    return was_queued
 
 
 @app.get("/jobs/{job_id}")
@@ -248,6 +547,14 @@ def get_job_status(job_id: str):
     job = get_job(job_id)
     if not job:
         return {"status": "not_found"}
+    queue = job_scheduler.queue_info(job_id)
+    if queue is not None:
+        # Position in the pool queue (queued) or how long it waited (running)
+        pool_stats = job_scheduler.pool(queue["pool"]).stats()
+        queue["queue_depth"] = pool_stats["queue_depth"]
+        queue["running"] = pool_stats["running"]
+        queue["max_workers"] = pool_stats["max_workers"]
+        return {**job, "queue": queue}
     return job
 
 
@@ -283,66 +590,132 @@ class ShotGenerateRequest(BaseModel):
     reference_images: Optional[List[str]] = None
     generate_audio: Optional[bool] = False
     num_outputs: Optional[int] = 1  # For image generation (e.g., Seedream-4)
+    background: Optional[bool] = False  # Return a job_id at once and generate on the job scheduler
+    priority: Optional[int] = 0  # higher runs first when the job queue is busy
 
 
 @app.post("/ai/generate-shot")
 def generate_shot(req: ShotGenerateRequest):
+    if req.background:
+        # Return at once; the pipeline runs on the job scheduler (watch GET /jobs/{job_id} or /jobs/stream)
+        shot_id = req.shot_id or next_shot_id(req.scene_id)
+        job_id = submit_job(
+            "generate_shot", _run_generate_shot_job, req, priority=req.priority,
+            project_id=req.project_id, scene_id=req.scene_id, shot_id=shot_id, stage="queued",
+            request=req.model_dump(),
+        )
+        return {"status": "ok", "job_id": job_id, "shot_id": shot_id}
+    try:
+        return _generate_shot(req)
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+# Progress reported for each stage of a background shot generation
+_SHOT_STAGES = {
+    "submitted": (5, "Submitting to provider..."),
+    "rendering": (20, "Rendering..."),
+    "downloading": (70, "Downloading result..."),
+    "post-processing": (85, "Extracting frames and saving to library..."),
+}
+
+
+def _run_generate_shot_job(job_id: str, req: ShotGenerateRequest):
+    """Background worker for POST /ai/generate-shot with background=true"""
+    try:
+        job = get_job(job_id) or {}
+        result = _generate_shot(req, shot_id=job.get("shot_id"), job_id=job_id)
+        update_job(job_id, status="completed", stage="completed", progress=100, result=result, message="Shot generated!")
+    except Exception as e:
+        logger.error(f"[Job {job_id}] Shot generation failed: {e}", exc_info=True)
+        update_job(job_id, status="failed", error=str(e), message=f"Error: {str(e)}")
+
+
+def _generate_shot(req: ShotGenerateRequest, shot_id: Optional[str] = None, job_id: Optional[str] = None) -> Dict:
+    """
+    Generate a shot (or images) and store it in the scene and media library.
+    Raises on failure. With `job_id` the job's stage/progress is updated and
+    the provider handle is persisted so a backend reload resumes the render.
+    """
+    def stage(name: str):
+        if job_id:
+            progress, message = _SHOT_STAGES[name]
+            update_job(job_id, stage=name, progress=progress, message=message)
+
+    def remote(submit, resume):
+        # submit(on_submitted) starts the provider call; resume(handle) finishes one started earlier
+        if not job_id:
+            return submit(None)
+
+        def submit_tracked(on_submitted):
+            def submitted(handle):
+                on_submitted(handle)
+                stage("rendering")
+            return submit(submitted)
+
+        def resume_tracked(handle, **kwargs):
+            stage("rendering")
+            return resume(handle, **kwargs)
+
+        return _remote_step(job_id, "shot", submit_tracked, resume_tracked)
+
     # Ensure directories
     dirs = ensure_scene_dirs(req.project_id, req.scene_id)
     # Use provided shot_id if updating existing shot, otherwise generate new
-    shot_id = req.shot_id or next_shot_id(req.scene_id)
+    shot_id = shot_id or req.shot_id or next_shot_id(req.scene_id)
     is_update = req.shot_id is not None
     logger.info(f"[GENERATE] shot_id={shot_id}, is_update={is_update}, media_type={req.media_type}")
-    try:
-        if (req.provider or "").lower() == "vertex":
-            print("=" * 60)
-            print("[VERTEX REQUEST] Received from frontend:")
-            print(f"  provider: {req.provider}")
-            print(f"  model: {req.model}")
-            print(f"  start_frame_path: {req.start_frame_path}")
-            print(f"  end_frame_path: {req.end_frame_path}")
-            print(f"  reference_images: {req.reference_images}")
-            print(f"  reference_frame: {req.reference_frame}")
-            print("=" * 60)
-            s = read_settings()
-            cred = s.get("vertex_service_account_path")
-            pid = s.get("vertex_project_id")
-            loc = s.get("vertex_location") or "us-central1"
-            temp_bucket = s.get("vertex_temp_bucket")
-            if not cred or not pid:
-                raise RuntimeError("Vertex settings missing. Set service account path and project id in Settings.")
-            # Enforce mutual exclusivity: reference_images vs start/end frames
-            if (req.start_frame_path or req.end_frame_path) and (req.reference_images and len(req.reference_images) > 0):
-                raise RuntimeError("Vertex: start/end frame cannot be combined with reference images.")
-            # Vertex frame interpolation requires BOTH start and end frames
-            # If only end frame is provided, reject it
-            if req.end_frame_path and not req.start_frame_path:
-                raise RuntimeError("Vertex: end frame requires a start frame for interpolation. Provide both or only a start frame.")
-            client_v = VertexClient(credentials_path=cred, project_id=pid, location=loc, model=req.model or "veo-3.1-fast-generate-preview", temp_bucket=temp_bucket)
-            # Allow start-only or end-only; client handles whichever is provided.
-            # Normalize paths (convert project_data/... to absolute paths)
-            start_img = req.start_frame_path or req.reference_frame
-            if start_img:
-                start_p = Path(start_img)
-                if not start_p.is_absolute():
-                    start_img = str(Path.cwd() / start_img)
-            end_img = req.end_frame_path
-            if end_img:
-                end_p = Path(end_img)
-                if not end_p.is_absolute():
-                    end_img = str(Path.cwd() / end_img)
-            ref_imgs = req.reference_images
-            if ref_imgs:
-                print(f"[VERTEX] Reference images before path normalization: {ref_imgs}")
-                ref_imgs = [str(Path.cwd() / r) if not Path(r).is_absolute() else r for r in ref_imgs]
-                print(f"[VERTEX] Reference images after path normalization: {ref_imgs}")
-                # Verify files exist
-                for rp in ref_imgs:
-                    exists = Path(rp).exists()
-                    print(f"[VERTEX]   {rp} -> exists={exists}")
-            else:
-                print("[VERTEX] No reference_images provided from frontend")
-            output_url = client_v.generate_video(
+    stage("submitted")
+    if (req.provider or "").lower() == "vertex":
+        print("=" * 60)
+        print("[VERTEX REQUEST] Received from frontend:")
+        print(f"  provider: {req.provider}")
+        print(f"  model: {req.model}")
+        print(f"  start_frame_path: {req.start_frame_path}")
+        print(f"  end_frame_path: {req.end_frame_path}")
+        print(f"  reference_images: {req.reference_images}")
+        print(f"  reference_frame: {req.reference_frame}")
+        print("=" * 60)
+        s = read_settings()
+        cred = s.get("vertex_service_account_path")
+        pid = s.get("vertex_project_id")
+        loc = s.get("vertex_location") or "us-central1"
+        temp_bucket = s.get("vertex_temp_bucket")
+        if not cred or not pid:
+            raise RuntimeError("Vertex settings missing. Set service account path and project id in Settings.")
+        # Enforce mutual exclusivity: reference_images vs start/end frames
+        if (req.start_frame_path or req.end_frame_path) and (req.reference_images and len(req.reference_images) > 0):
+            raise RuntimeError("Vertex: start/end frame cannot be combined with reference images.")
+        # Vertex frame interpolation requires BOTH start and end frames
+        # If only end frame is provided, reject it
+        if req.end_frame_path and not req.start_frame_path:
+            raise RuntimeError("Vertex: end frame requires a start frame for interpolation. Provide both or only a start frame.")
+        client_v = AsyncVertexClient(credentials_path=cred, project_id=pid, location=loc, model=req.model or "veo-3.1-fast-generate-preview", temp_bucket=temp_bucket)
+        # Allow start-only or end-only; client handles whichever is provided.
+        # Normalize paths (convert project_data/... to absolute paths)
+        start_img = req.start_frame_path or req.reference_frame
+        if start_img:
+            start_p = Path(start_img)
+            if not start_p.is_absolute():
+                start_img = str(Path.cwd() / start_img)
+        end_img = req.end_frame_path
+        if end_img:
+            end_p = Path(end_img)
+            if not end_p.is_absolute():
+                end_img = str(Path.cwd() / end_img)
+        ref_imgs = req.reference_images
+        if ref_imgs:
+            print(f"[VERTEX] Reference images before path normalization: {ref_imgs}")
+            ref_imgs = [str(Path.cwd() / r) if not Path(r).is_absolute() else r for r in ref_imgs]
+            print(f"[VERTEX] Reference images after path normalization: {ref_imgs}")
+            # Verify files exist
+            for rp in ref_imgs:
+                exists = Path(rp).exists()
+                print(f"[VERTEX]   {rp} -> exists={exists}")
+        else:
+            print("[VERTEX] No reference_images provided from frontend")
+        output_url = remote(
+            lambda on_submitted: _await_provider(client_v.generate_video(
                 prompt=req.prompt,
                 first_frame_image=start_img,
                 last_frame_image=end_img,
@@ -351,110 +724,118 @@ def generate_shot(req: ShotGenerateRequest):
                 resolution=req.resolution or "1080p",
                 aspect_ratio=req.aspect_ratio or "16:9",
                 generate_audio=bool(req.generate_audio),
-            )
-            model_used = req.model or "veo-3.1-fast-generate-preview"
-        else:
-            # Default to Replicate
-            s = read_settings()
-            client_r = ReplicateClient(api_token=s.get("replicate_api_token"))
-            model_used = req.model or ("bytedance/seedream-4" if req.media_type == "image" else "google/veo-3.1")
-            
-            # Handle character reference images
-            ref_imgs = req.reference_images
-            print(f"[IMAGE GEN] Received reference_images from frontend: {ref_imgs}")
-            print(f"[IMAGE GEN] character_id: {req.character_id}")
-            if req.character_id and not ref_imgs:
-                char = get_character(req.project_id, req.character_id)
-                if char and char.get("reference_image_ids"):
-                    ref_imgs = []
-                    for img_id in char["reference_image_ids"]:
-                        media_item = next((m for m in list_media(req.project_id) if m.get("id") == img_id), None)
-                        if media_item:
-                            img_path = _normalize_path(media_item["path"])
-                            ref_imgs.append(str(img_path))
-            
-            # Normalize reference image paths - convert media IDs to actual file paths
-            if ref_imgs:
-                resolved_refs = []
-                for r in ref_imgs:
-                    # Check if this looks like a media ID (no slashes, no project_data prefix)
-                    if '/' not in r and not r.startswith('project_data'):
-                        # This is likely a media ID - look it up
-                        media_item = next((m for m in list_media(req.project_id) if m.get("id") == r), None)
-                        if media_item and media_item.get("path"):
-                            resolved_refs.append(str(_normalize_path(media_item["path"])))
-                        else:
-                            print(f"[WARN] Could not resolve media ID: {r}")
+                on_submitted=on_submitted,
+            )),
+            lambda handle, **kwargs: _await_provider(client_v.resume(handle)),
+        )
+        model_used = req.model or "veo-3.1-fast-generate-preview"
+    else:
+        # Default to Replicate
+        s = read_settings()
+        client_r = AsyncReplicateClient(api_token=s.get("replicate_api_token"))
+        model_used = req.model or ("bytedance/seedream-4" if req.media_type == "image" else "google/veo-3.1")
+        
+        # Handle character reference images
+        ref_imgs = req.reference_images
+        print(f"[IMAGE GEN] Received reference_images from frontend: {ref_imgs}")
+        print(f"[IMAGE GEN] character_id: {req.character_id}")
+        if req.character_id and not ref_imgs:
+            char = get_character(req.project_id, req.character_id)
+            if char and char.get("reference_image_ids"):
+                ref_imgs = []
+                for img_id in char["reference_image_ids"]:
+                    media_item = get_media(req.project_id, img_id)
+                    if media_item:
+                        img_path = _normalize_path(media_item["path"])
+                        ref_imgs.append(str(img_path))
+        
+        # Normalize reference image paths - convert media IDs to actual file paths
+        if ref_imgs:
+            resolved_refs = []
+            for r in ref_imgs:
+                # Check if this looks like a media ID (no slashes, no project_data prefix)
+                if '/' not in r and not r.startswith('project_data'):
+                    # This is likely a media ID - look it up
+                    media_item = get_media(req.project_id, r)
+                    if media_item and media_item.get("path"):
+                        resolved_refs.append(str(_normalize_path(media_item["path"])))
                     else:
-                        # This is a path - normalize it
-                        resolved_refs.append(str(_normalize_path(r)) if not Path(r).is_absolute() else r)
-                ref_imgs = resolved_refs
-                print(f"[IMAGE GEN] Resolved reference images: {ref_imgs}")
-
-            if req.media_type == "image":
-                # Image generation (e.g., Seedream-4)
-                print(f"[IMAGE GEN] Model: {model_used}, num_outputs: {req.num_outputs}, ref_imgs: {len(ref_imgs) if ref_imgs else 0}")
-                if ref_imgs:
-                    for i, path in enumerate(ref_imgs):
-                        exists = Path(path).exists() if path else False
-                        print(f"[IMAGE GEN]   Ref {i+1}: {path} (exists: {exists})")
-                output_urls = client_r.generate_image(
+                        print(f"[WARN] Could not resolve media ID: {r}")
+                else:
+                    # This is a path - normalize it
+                    resolved_refs.append(str(_normalize_path(r)) if not Path(r).is_absolute() else r)
+            ref_imgs = resolved_refs
+            print(f"[IMAGE GEN] Resolved reference images: {ref_imgs}")
+
+        if req.media_type == "image":
+            # Image generation (e.g., Seedream-4)
+            print(f"[IMAGE GEN] Model: {model_used}, num_outputs: {req.num_outputs}, ref_imgs: {len(ref_imgs) if ref_imgs else 0}")
+            if ref_imgs:
+                for i, path in enumerate(ref_imgs):
+                    exists = Path(path).exists() if path else False
+                    print(f"[IMAGE GEN]   Ref {i+1}: {path} (exists: {exists})")
+            output_urls = remote(
+                lambda on_submitted: _await_provider(client_r.generate_image(
                     model=model_used,
                     prompt=req.prompt,
                     reference_images=ref_imgs or None,
                     aspect_ratio=req.aspect_ratio or "16:9",
                     num_outputs=req.num_outputs or 1,
-                )
-                print(f"[IMAGE GEN] Received {len(output_urls)} image URLs from API")
-                # For images, we'll save them to media/images and create image items
-                import requests
-                media_images_dir = PROJECT_DATA_DIR / req.project_id / "media" / "images"
-                media_images_dir.mkdir(parents=True, exist_ok=True)
-                
-                saved_images = []
-                import time
-                timestamp = int(time.time())
-                for idx, img_url in enumerate(output_urls):
-                    # Put timestamp first for better sorting
-                    img_filename = f"{timestamp}_{shot_id}_{idx}.jpg" if len(output_urls) > 1 else f"{timestamp}_{shot_id}.jpg"
-                    img_path = media_images_dir / img_filename
-                    
-                    # Download image
-                    with requests.get(img_url, stream=True, timeout=120) as r:
-                        r.raise_for_status()
-                        with open(img_path, "wb") as f:
-                            for chunk in r.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
-                    
-                    rel_img = str(img_path.relative_to(PROJECT_DATA_DIR))
-                    add_media(req.project_id, {
-                        "id": img_filename,
-                        "type": "image",
-                        "path": f"project_data/{rel_img}",
-                        "url": f"/files/{rel_img}",
-                        "timestamp": timestamp
-                    })
-                    saved_images.append(f"project_data/{rel_img}")
+                    on_submitted=on_submitted,
+                )),
+                lambda handle, **kwargs: _await_provider(client_r.resume(handle)),
+            )
+            print(f"[IMAGE GEN] Received {len(output_urls)} image URLs from API")
+            stage("downloading")
+            # For images, we'll save them to media/images and create image items
+            media_images_dir = PROJECT_DATA_DIR / req.project_id / "media" / "images"
+            media_images_dir.mkdir(parents=True, exist_ok=True)
+            
+            saved_images = []
+            import time
+            timestamp = int(time.time())
+            for idx, img_url in enumerate(output_urls):
+                # Put timestamp first for better sorting
+                img_filename = f"{timestamp}_{shot_id}_{idx}.jpg" if len(output_urls) > 1 else f"{timestamp}_{shot_id}.jpg"
+                img_path = media_images_dir / img_filename
                 
-                # Return first image as the "shot" (for compatibility)
-                return {"status": "ok", "shot_id": shot_id, "images": saved_images, "model": model_used}
-            else:
-                # Video generation
-                # Normalize start/end frame paths
-                start_img = None
-                end_img = None
-                if req.start_frame_path:
-                    start_img = str(_normalize_path(req.start_frame_path))
-                elif req.reference_frame:
-                    start_img = str(_normalize_path(req.reference_frame))
-                if req.end_frame_path:
-                    end_img = str(_normalize_path(req.end_frame_path))
+                # Download image
+                with http_sessions.session("downloads").get(img_url, stream=True, timeout=120) as r:
+                    r.raise_for_status()
+                    with open(img_path, "wb") as f:
+                        for chunk in r.iter_content(chunk_size=8192):
+                            if chunk:
+                                f.write(chunk)
                 
-                # NOTE: Video models do NOT support reference_images directly.
-                # Consistency is achieved through start_frame_path (generated from refs in image step).
-                # The ref_imgs parameter is passed for API compatibility but is ignored by all video models.
-                output_url = client_r.generate_video(
+                rel_img = str(img_path.relative_to(PROJECT_DATA_DIR))
+                add_media(req.project_id, {
+                    "id": img_filename,
+                    "type": "image",
+                    "path": f"project_data/{rel_img}",
+                    "url": f"/files/{rel_img}",
+                    "timestamp": timestamp
+                })
+                saved_images.append(f"project_data/{rel_img}")
+            
+            # Return first image as the "shot" (for compatibility)
+            return {"status": "ok", "shot_id": shot_id, "images": saved_images, "model": model_used}
+        else:
+            # Video generation
+            # Normalize start/end frame paths
+            start_img = None
+            end_img = None
+            if req.start_frame_path:
+                start_img = str(_normalize_path(req.start_frame_path))
+            elif req.reference_frame:
+                start_img = str(_normalize_path(req.reference_frame))
+            if req.end_frame_path:
+                end_img = str(_normalize_path(req.end_frame_path))
+            
+            # NOTE: Video models do NOT support reference_images directly.
+            # Consistency is achieved through start_frame_path (generated from refs in image step).
+            # The ref_imgs parameter is passed for API compatibility but is ignored by all video models.
+            output_url = remote(
+                lambda on_submitted: _await_provider(client_r.generate_video(
                     model=model_used,
                     prompt=req.prompt,
                     first_frame_image=start_img,
@@ -464,77 +845,84 @@ def generate_shot(req: ShotGenerateRequest):
                     resolution=req.resolution or "1080p",
                     aspect_ratio=req.aspect_ratio or "16:9",
                     generate_audio=bool(req.generate_audio),
-                )
-        
-        # Download video file
-        import requests, os
-        video_path = dirs["shots"] / f"{shot_id}.mp4"
-        parsed = urlparse(str(output_url))
-        if parsed.scheme in ("http", "https"):
-            with requests.get(output_url, stream=True, timeout=120) as r:
-                r.raise_for_status()
-                with open(video_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-        else:
-            # Treat as local filesystem path produced by client; move/copy into scene shots folder.
-            src = Path(str(output_url))
-            if not src.exists():
-                raise RuntimeError(f"Vertex output not found: {src}")
-            shutil.copyfile(src, video_path)
-        # Extract frames & strip audio if disabled
-        from backend.video.ffmpeg import extract_first_last_frames, strip_audio
-        if not req.generate_audio:
-            strip_audio(str(video_path))
-        first = dirs["frames"] / f"{shot_id}_first.png"
-        last = dirs["frames"] / f"{shot_id}_last.png"
-        extract_first_last_frames(str(video_path), str(first), str(last))
-        
-        # Copy video to media library so it's available for reuse
-        media_video_dir = PROJECT_DATA_DIR / req.project_id / "media" / "video"
-        media_video_dir.mkdir(parents=True, exist_ok=True)
-        media_video_path = media_video_dir / f"{shot_id}.mp4"
-        shutil.copyfile(video_path, media_video_path)
-        
-        # Also copy extracted frames to media/images
-        media_images_dir = PROJECT_DATA_DIR / req.project_id / "media" / "images"
-        media_images_dir.mkdir(parents=True, exist_ok=True)
-        media_first = media_images_dir / f"{shot_id}_first.png"
-        media_last = media_images_dir / f"{shot_id}_last.png"
-        shutil.copyfile(first, media_first)
-        shutil.copyfile(last, media_last)
-        
-        # Add to media library
-        rel_media_video = str(media_video_path.relative_to(PROJECT_DATA_DIR))
-        rel_media_first = str(media_first.relative_to(PROJECT_DATA_DIR))
-        rel_media_last = str(media_last.relative_to(PROJECT_DATA_DIR))
+                    on_submitted=on_submitted,
+                )),
+                lambda handle, **kwargs: _await_provider(client_r.resume(handle)),
+            )
+    
+    # Download video file
+    stage("downloading")
+    import os
+    video_path = dirs["shots"] / f"{shot_id}.mp4"
+    parsed = urlparse(str(output_url))
+    if parsed.scheme in ("http", "https"):
+        with http_sessions.session("downloads").get(output_url, stream=True, timeout=120) as r:
+            r.raise_for_status()
+            with open(video_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=8192):
+                    if chunk:
+                        f.write(chunk)
+    else:
+        # Treat as local filesystem path produced by client; move/copy into scene shots folder.
+        src = Path(str(output_url))
+        if not src.exists():
+            raise RuntimeError(f"Vertex output not found: {src}")
+        shutil.copyfile(src, video_path)
+    # Extract frames & strip audio if disabled
+    stage("post-processing")
+    from backend.video.ffmpeg import extract_first_last_frames, strip_audio
+    if not req.generate_audio:
+        job_scheduler.run("ffmpeg", strip_audio, str(video_path))
+    first = dirs["frames"] / f"{shot_id}_first.png"
+    last = dirs["frames"] / f"{shot_id}_last.png"
+    job_scheduler.run("ffmpeg", extract_first_last_frames, str(video_path), str(first), str(last))
+    
+    # Copy video to media library so it's available for reuse
+    media_video_dir = PROJECT_DATA_DIR / req.project_id / "media" / "video"
+    media_video_dir.mkdir(parents=True, exist_ok=True)
+    media_video_path = media_video_dir / f"{shot_id}.mp4"
+    shutil.copyfile(video_path, media_video_path)
+    
+    # Also copy extracted frames to media/images
+    media_images_dir = PROJECT_DATA_DIR / req.project_id / "media" / "images"
+    media_images_dir.mkdir(parents=True, exist_ok=True)
+    media_first = media_images_dir / f"{shot_id}_first.png"
+    media_last = media_images_dir / f"{shot_id}_last.png"
+    shutil.copyfile(first, media_first)
+    shutil.copyfile(last, media_last)
+    
+    # Add to media library
+    rel_media_video = str(media_video_path.relative_to(PROJECT_DATA_DIR))
+    rel_media_first = str(media_first.relative_to(PROJECT_DATA_DIR))
+    rel_media_last = str(media_last.relative_to(PROJECT_DATA_DIR))
+    
+    # Update metadata
+    rel_from_project = str(video_path.relative_to(PROJECT_DATA_DIR))
+    # Static URL under /files maps to project_data dir
+    video_url = f"/files/{rel_from_project}"
+    rel_first = str(first.relative_to(PROJECT_DATA_DIR))
+    rel_last = str(last.relative_to(PROJECT_DATA_DIR))
+    shot_meta = {
+        "shot_id": shot_id,
+        "prompt": req.prompt,
+        "model": model_used,
+        "duration": req.duration,
+        "file_path": f"project_data/{rel_from_project}",
+        "first_frame_path": f"project_data/{rel_first}",
+        "last_frame_path": f"project_data/{rel_last}",
+        "continuity_source": None,
+    }
+
+    # Media entries and the shot land in a single metadata write
+    with project_transaction(req.project_id) as meta:
         add_media(req.project_id, {"id": media_video_path.name, "type": "video", "path": f"project_data/{rel_media_video}", "url": f"/files/{rel_media_video}"})
         add_media(req.project_id, {"id": media_first.name, "type": "image", "path": f"project_data/{rel_media_first}", "url": f"/files/{rel_media_first}"})
         add_media(req.project_id, {"id": media_last.name, "type": "image", "path": f"project_data/{rel_media_last}", "url": f"/files/{rel_media_last}"})
-        
-        # Update metadata
-        rel_from_project = str(video_path.relative_to(PROJECT_DATA_DIR))
-        # Static URL under /files maps to project_data dir
-        video_url = f"/files/{rel_from_project}"
-        rel_first = str(first.relative_to(PROJECT_DATA_DIR))
-        rel_last = str(last.relative_to(PROJECT_DATA_DIR))
-        shot_meta = {
-            "shot_id": shot_id,
-            "prompt": req.prompt,
-            "model": model_used,
-            "duration": req.duration,
-            "file_path": f"project_data/{rel_from_project}",
-            "first_frame_path": f"project_data/{rel_first}",
-            "last_frame_path": f"project_data/{rel_last}",
-            "continuity_source": None,
-        }
 
         # Update existing shot or create new one
         if is_update:
             # Update existing shot with video info
             logger.info(f"[GENERATE] Updating existing shot {shot_id} with video")
-            meta = read_metadata(req.project_id)
             for s in meta.get("scenes", []):
                 if s.get("scene_id") == req.scene_id:
                     for sh in s.get("shots", []):
@@ -545,16 +933,362 @@ def generate_shot(req: ShotGenerateRequest):
                             sh["last_frame_path"] = shot_meta["last_frame_path"]
                             sh["model"] = shot_meta["model"]
                             sh["status"] = "video_ready"  # Mark shot as complete
-                            write_metadata(req.project_id, meta)
                             logger.info(f"[GENERATE] Shot {shot_id} updated successfully")
                             return {"status": "ok", "shot": sh, "file_url": video_url}
             # If shot not found, fall through to create new
             logger.warning(f"[GENERATE] Shot {shot_id} not found, creating new")
 
         add_shot(req.project_id, req.scene_id, shot_meta)
-        return {"status": "ok", "shot": shot_meta, "file_url": video_url}
-    except Exception as e:
+    return {"status": "ok", "shot": shot_meta, "file_url": video_url}
+
+
+class SceneGenerateRequest(BaseModel):
+    project_id: str
+    scene_id: str
+    shot_ids: Optional[List[str]] = None  # Default: every shot in the scene without a video yet
+    provider: Optional[str] = "replicate"  # replicate | vertex
+    model: Optional[str] = None  # Default: each shot's own model, else the provider default
+    resolution: Optional[str] = "1080p"
+    aspect_ratio: Optional[str] = "16:9"
+    generate_audio: Optional[bool] = False
+    use_prev_last_frame: Optional[bool] = False  # Start every shot from the previous shot's last frame
+    depends_on: Optional[Dict[str, str]] = None  # shot_id -> shot_id whose last frame it starts from
+    max_concurrent: Optional[int] = None  # Shots in flight for this provider (default: settings, else 2)
+    priority: Optional[int] = 0
+
+
+# Running scene batches by parent job id
+_job_graphs: Dict[str, JobGraph] = {}
+# Per batch: last reported progress of each running child job, and the last parent update
+_graph_progress: Dict[str, Dict] = {}
+
+
+def _provider_concurrency(provider: str, override: Optional[int] = None) -> int:
+    if override:
+        return max(1, int(override))
+    limits = read_settings().get("provider_concurrency") or {}
+    return max(1, int(limits.get(provider) or 2))
+
+
+def _shot_last_frame_path(project_id: str, scene_id: str, shot_id: str) -> str:
+    """Where generate-shot writes a shot's last frame (known before the shot exists)."""
+    return f"project_data/{project_id}/scenes/{scene_id}/frames/{shot_id}_last.png"
+
+
+def _run_graph_child(job_id: str, req: ShotGenerateRequest):
+    """Graph node: run a child generate_shot job and raise unless it completed."""
+    _run_job(job_id, _run_generate_shot_job, req)
+    job = get_job(job_id) or {}
+    if job.get("status") != "completed":
+        raise RuntimeError(job.get("error") or f"Shot job {job.get('status', 'missing')}")
+    return job.get("result")
+
+
+def _start_shot_graph(parent_id: str, project_id: str, shot_requests: Dict[str, ShotGenerateRequest],
+                      deps: Dict[str, List[str]], limits: Dict[str, int], priority: int = 0) -> Dict[str, str]:
+    """
+    Create a child generate_shot job per shot and run them as a JobGraph under
+    the parent job, which tracks aggregate progress and is completed (or
+    failed) once every shot has finished. Returns shot_id -> child job id.
+    """
+    children: Dict[str, str] = {}
+
+    def node_changed(node):
+        if node.state == "running" and node.job_id:
+            # Dependencies are done; the shot now waits for a worker slot
+            job_store.update(node.job_id, status="queued", stage="queued", message="Queued")
+        elif node.state in ("skipped", "cancelled") and node.job_id:
+            job = get_job(node.job_id) or {}
+            if job.get("status") not in TERMINAL_STATUSES:
+                if node.state == "skipped":
+                    update_job(node.job_id, status="failed", error=node.error, message=node.error)
+                else:
+                    _cancel_job(node.job_id)
+        _update_graph_progress(parent_id)
+
+    def finished(graph):
+        _job_graphs.pop(parent_id, None)
+        _graph_progress.pop(parent_id, None)
+        cancel_tokens.release(parent_id)
+        counts = graph.counts()
+        summary = {
+            node.node_id: {"job_id": node.job_id, "state": node.state, "error": node.error}
+            for node in graph.nodes.values()
+        }
+        ok = counts.get("done", 0) == len(graph.nodes)
+        update_job(
+            parent_id,
+            status="completed" if ok else ("cancelled" if counts.get("cancelled") else "failed"),
+            progress=100,
+            result={"shots": summary, "counts": counts},
+            error=None if ok else f"{len(graph.nodes) - counts.get('done', 0)} of {len(graph.nodes)} shots did not complete",
+            message=f"{counts.get('done', 0)}/{len(graph.nodes)} shots generated",
+        )
+
+    graph = JobGraph(job_scheduler, limits=limits, on_node_change=node_changed, on_finished=finished)
+    for shot_id, shot_req in shot_requests.items():
+        graph.add(shot_id, lambda shot_id=shot_id: _run_graph_child(children[shot_id], shot_requests[shot_id]),
+                  deps=deps.get(shot_id, []), group=(shot_req.provider or "replicate").lower(), priority=priority)
+    graph.validate()  # Before any child job exists
+    for shot_id, shot_req in shot_requests.items():
+        children[shot_id] = graph.nodes[shot_id].job_id = create_job(
+            "generate_shot", status="waiting", stage="waiting", pool="remote", priority=priority,
+            parent_job_id=parent_id, project_id=project_id, scene_id=shot_req.scene_id, shot_id=shot_id,
+            depends_on=deps.get(shot_id, []), request=shot_req.model_dump(),
+        )
+    update_job(parent_id, children=children)
+    _graph_progress[parent_id] = {"children": {}, "reported": None}
+    _job_graphs[parent_id] = graph
+
+    def cancel_graph():
+        for node in graph.cancel():
+            _cancel_job(node.job_id)
+
+    cancel_tokens.token_for(parent_id).on_cancel(cancel_graph)
+    graph.start()
+    return children
+
+
+def _update_graph_progress(parent_id: str) -> None:
+    graph = _job_graphs.get(parent_id)
+    tracked = _graph_progress.get(parent_id)
+    if graph is None or tracked is None:
+        return
+    # Child progress comes from the listener's cache, not one store read per node
+    child_progress = tracked["children"]
+    total = 0.0
+    for node in graph.nodes.values():
+        if node.state in ("done", "failed", "skipped", "cancelled"):
+            total += 100
+        elif node.state == "running" and node.job_id:
+            total += child_progress.get(node.job_id) or 0
+    counts = graph.counts()
+    n = len(graph.nodes) or 1
+    progress = int(total / n)
+    message = f"{counts.get('done', 0)}/{len(graph.nodes)} shots done, {counts.get('running', 0)} running, {counts.get('waiting', 0)} waiting"
+    if tracked["reported"] == (progress, message):
+        return
+    tracked["reported"] = (progress, message)
+    job_store.update(parent_id, progress=progress, message=message)
+
+
+def _on_job_change(job: Dict) -> None:
+    # Child progress feeds its batch's aggregate progress
+    parent_id = job.get("parent_job_id")
+    tracked = _graph_progress.get(parent_id) if parent_id else None
+    if tracked is not None and "progress" in job:
+        if tracked["children"].get(job["id"]) == job["progress"]:
+            return
+        tracked["children"][job["id"]] = job["progress"]
+        _update_graph_progress(parent_id)
+
+
+job_store.add_listener(_on_job_change)
+
+
+def _frame_key(path: Optional[str]) -> Optional[str]:
+    """A frame path as stored on a shot (project_data/..., /files/... or absolute), relative to project_data."""
+    if not path:
+        return None
+    p = str(path).replace("\\", "/")
+    root = str(PROJECT_DATA_DIR.resolve()).replace("\\", "/") + "/"
+    for prefix in ("/files/", root, "project_data/"):
+        if p.startswith(prefix):
+            return p[len(prefix):]
+    return p
+
+
+def _project_shot_links(project_id: str):
+    """
+    Every shot of a project (shot_id -> (scene_id, shot), in scene order) and
+    the continuity links between them: shot_id -> the shot whose last frame it
+    starts from, derived from continuity_frame_path / start_frame_path.
+    """
+    shots: Dict[str, tuple] = {}
+    for scene in list_scenes(project_id):
+        for sh in scene.get("shots", []):
+            if sh.get("shot_id"):
+                shots.setdefault(sh["shot_id"], (scene["scene_id"], sh))
+    owners: Dict[str, str] = {}
+    for shot_id, (scene_id, sh) in shots.items():
+        owners[_frame_key(_shot_last_frame_path(project_id, scene_id, shot_id))] = shot_id
+        if sh.get("last_frame_path"):
+            owners[_frame_key(sh["last_frame_path"])] = shot_id
+    links: Dict[str, str] = {}
+    for shot_id, (_, sh) in shots.items():
+        for field in ("continuity_frame_path", "start_frame_path"):
+            key = _frame_key(sh.get(field))
+            if not key:
+                continue
+            source_id = owners.get(key)
+            name = key.rsplit("/", 1)[-1]
+            if source_id is None and name.endswith("_last.png"):
+                # Media library copies of a shot's frames are named {shot_id}_last.png
+                source_id = name[:-len("_last.png")] if name[:-len("_last.png")] in shots else None
+            if source_id and source_id != shot_id:
+                links[shot_id] = source_id
+                break
+    return shots, links
+
+
+def _start_shot_batch(job_type: str, req, selected: List[str], shots: Dict[str, tuple],
+                      start_from: Dict[str, str], new_links: Dict[str, str], **fields) -> Dict:
+    """
+    Shared by the batch endpoints: build a generate request per selected shot
+    (a shot whose source shot is in the batch starts from the frame that shot
+    is about to produce, and waits for it), record new continuity links on the
+    shots and start the graph under a `job_type` parent job.
+    """
+    no_prompt = [shot_id for shot_id in selected if not shots[shot_id][1].get("prompt")]
+    if no_prompt:
+        return {"status": "error", "detail": f"Shots without a prompt: {', '.join(no_prompt)}"}
+    selected_ids = set(selected)
+    provider = (req.provider or "replicate").lower()
+    shot_requests: Dict[str, ShotGenerateRequest] = {}
+    deps: Dict[str, List[str]] = {}
+    for shot_id in selected:
+        scene_id, sh = shots[shot_id]
+        start_frame = sh.get("start_frame_path") or sh.get("continuity_frame_path")
+        source_id = start_from.get(shot_id)
+        if source_id in selected_ids:
+            deps[shot_id] = [source_id]
+            start_frame = _shot_last_frame_path(req.project_id, shots[source_id][0], source_id)
+        elif source_id:
+            # Source shot is not part of this batch: it must already have a video
+            start_frame = shots[source_id][1].get("last_frame_path")
+            if not start_frame:
+                return {"status": "error", "detail": f"{shot_id} starts from {source_id}, which has no video yet"}
+        shot_requests[shot_id] = ShotGenerateRequest(
+            project_id=req.project_id,
+            scene_id=scene_id,
+            shot_id=shot_id,
+            prompt=sh["prompt"],
+            provider=provider,
+            model=req.model or sh.get("model"),
+            duration=int(sh.get("duration") or 8),
+            resolution=req.resolution,
+            aspect_ratio=req.aspect_ratio,
+            start_frame_path=start_frame,
+            generate_audio=req.generate_audio,
+            priority=req.priority,
+        )
+
+    try:
+        topological_order({shot_id: deps.get(shot_id, []) for shot_id in shot_requests})
+    except ValueError as e:
         return {"status": "error", "detail": str(e)}
+    if new_links:
+        # Record the chain on the shots so later batches (and regenerations) find it
+        with project_transaction(req.project_id) as meta:
+            for scene in meta.get("scenes", []):
+                for sh in scene.get("shots", []):
+                    source_id = new_links.get(sh.get("shot_id"))
+                    if source_id:
+                        sh["continuity_frame_path"] = _shot_last_frame_path(req.project_id, shots[source_id][0], source_id)
+
+    parent_id = create_job(
+        job_type, project_id=req.project_id, shot_ids=list(shot_requests),
+        message=f"Generating {len(shot_requests)} shots...", **fields,
+    )
+    children = _start_shot_graph(
+        parent_id, req.project_id, shot_requests, deps,
+        limits={provider: _provider_concurrency(provider, req.max_concurrent)}, priority=req.priority or 0,
+    )
+    return {"status": "ok", "job_id": parent_id, "shots": children}
+
+
+@app.post("/ai/generate-scene")
+def generate_scene(req: SceneGenerateRequest):
+    """
+    Generate several shots of a scene as one batch job. Shots run in parallel
+    on the job scheduler (at most `max_concurrent` per provider); a shot that
+    starts from another shot's last frame waits for that shot. Returns the
+    batch job id (aggregate progress; result lists each shot's outcome) and
+    the child job id of every shot.
+    """
+    scene = get_scene(req.project_id, req.scene_id)
+    if scene is None:
+        return {"status": "error", "detail": "Scene not found"}
+    order = [sh["shot_id"] for sh in scene.get("shots", []) if sh.get("shot_id")]
+    shots, links = _project_shot_links(req.project_id)
+    if req.shot_ids:
+        missing = [sid for sid in req.shot_ids if sid not in order]
+        if missing:
+            return {"status": "error", "detail": f"Shots not found in scene: {', '.join(missing)}"}
+        selected = [sid for sid in order if sid in set(req.shot_ids)]
+    else:
+        selected = [sid for sid in order if not shots[sid][1].get("file_path")]
+    if not selected:
+        return {"status": "error", "detail": "No shots to generate"}
+
+    # Which shot's last frame each shot starts from: the links already on the
+    # shots, overridden by the ones requested here
+    new_links: Dict[str, str] = {}
+    if req.use_prev_last_frame:
+        for shot_id in selected:
+            idx = order.index(shot_id)
+            if idx > 0:
+                new_links[shot_id] = order[idx - 1]
+    for shot_id, source_id in (req.depends_on or {}).items():
+        if shot_id not in order or source_id not in shots:
+            return {"status": "error", "detail": f"Unknown shot in depends_on: {shot_id} -> {source_id}"}
+        new_links[shot_id] = source_id
+    new_links = {shot_id: source_id for shot_id, source_id in new_links.items() if links.get(shot_id) != source_id}
+    start_from = {shot_id: links[shot_id] for shot_id in selected if shot_id in links}
+    start_from.update(new_links)
+    return _start_shot_batch("generate_scene", req, selected, shots, start_from, new_links, scene_id=req.scene_id)
+
+
+class ShotBatchGenerateRequest(BaseModel):
+    project_id: str
+    scene_ids: Optional[List[str]] = None  # Default: every scene
+    shot_ids: Optional[List[str]] = None  # Default: every shot in those scenes without a video yet
+    regenerate: Optional[List[str]] = None  # Generate these shots again, plus every shot continuing from them
+    provider: Optional[str] = "replicate"  # replicate | vertex
+    model: Optional[str] = None
+    resolution: Optional[str] = "1080p"
+    aspect_ratio: Optional[str] = "16:9"
+    generate_audio: Optional[bool] = False
+    max_concurrent: Optional[int] = None
+    priority: Optional[int] = 0
+
+
+@app.post("/ai/generate-shots")
+def generate_shots(req: ShotBatchGenerateRequest):
+    """
+    Generate shots across scenes as one batch job, following the continuity
+    chains recorded on the shots (a shot whose start or continuity frame is
+    another shot's last frame runs after that shot). Independent chains run in
+    parallel. With `regenerate`, only those shots and the shots downstream of
+    them are generated again; the rest of the project is left as is.
+    """
+    shots, links = _project_shot_links(req.project_id)
+    requested = (req.regenerate or []) + (req.shot_ids or [])
+    missing = [sid for sid in requested if sid not in shots]
+    if missing:
+        return {"status": "error", "detail": f"Shots not found: {', '.join(missing)}"}
+    if req.scene_ids:
+        missing = [sid for sid in req.scene_ids if get_scene(req.project_id, sid) is None]
+        if missing:
+            return {"status": "error", "detail": f"Scenes not found: {', '.join(missing)}"}
+
+    if req.regenerate:
+        chosen = downstream({shot_id: [source_id] for shot_id, source_id in links.items()}, req.regenerate)
+    elif req.shot_ids:
+        chosen = set(req.shot_ids)
+    else:
+        chosen = {
+            shot_id for shot_id, (scene_id, sh) in shots.items()
+            if not sh.get("file_path") and (not req.scene_ids or scene_id in req.scene_ids)
+        }
+    selected = [shot_id for shot_id in shots if shot_id in chosen]
+    if not selected:
+        return {"status": "error", "detail": "No shots to generate"}
+    start_from = {shot_id: links[shot_id] for shot_id in selected if shot_id in links}
+    return _start_shot_batch(
+        "generate_shots", req, selected, shots, start_from, {},
+        scene_ids=sorted({shots[shot_id][0] for shot_id in selected}),
+    )
 
 
 class VoiceTTSRequest(BaseModel):
@@ -572,9 +1306,9 @@ def voice_tts(req: VoiceTTSRequest):
     key = s.get("elevenlabs_api_key")
     if not key:
         return {"status": "error", "detail": "ElevenLabs API key not set in Settings"}
-    prov = ElevenLabsProvider(api_key=key)
+    prov = AsyncElevenLabsProvider(api_key=key)
     try:
-        out = prov.generate(text=req.text, voice_id=req.voice_id, model_id=req.model_id or None, output_format="mp3", voice_settings=req.voice_settings)
+        out = _await_provider(prov.generate(text=req.text, voice_id=req.voice_id, model_id=req.model_id or None, output_format="mp3", voice_settings=req.voice_settings))
         # Save to project audio folder and index
         proj_audio = ensure_scene_dirs(req.project_id, "tmp")["audio"].parent.parent / "media" / "audio"
         proj_audio.mkdir(parents=True, exist_ok=True)
@@ -606,12 +1340,12 @@ def voice_v2v(req: VoiceV2VRequest):
     key = s.get("elevenlabs_api_key")
     if not key:
         return {"status": "error", "detail": "ElevenLabs API key not set in Settings"}
-    prov = ElevenLabsProvider(api_key=key)
+    prov = AsyncElevenLabsProvider(api_key=key)
     try:
         src = Path(req.source_wav)
         if not src.is_absolute():
             src = Path.cwd() / req.source_wav
-        out = prov.speech_to_speech(audio_path=str(src), voice_id=req.voice_id or None, model_id=req.model_id or "eleven_multilingual_sts_v2", output_format="mp3", voice_settings=req.voice_settings, remove_background_noise=req.remove_background_noise or False)
+        out = _await_provider(prov.speech_to_speech(audio_path=str(src), voice_id=req.voice_id or None, model_id=req.model_id or "eleven_multilingual_sts_v2", output_format="mp3", voice_settings=req.voice_settings, remove_background_noise=req.remove_background_noise or False))
         proj_audio = ensure_scene_dirs(req.project_id, "tmp")["audio"].parent.parent / "media" / "audio"
         proj_audio.mkdir(parents=True, exist_ok=True)
         stub = f"voice_v2v_{int(__import__('time').time())}"
@@ -631,6 +1365,7 @@ class LipSyncImageRequest(BaseModel):
     audio_wav_path: str
     prompt: Optional[str] = None
     filename: Optional[str] = None
+    priority: Optional[int] = 0  # higher runs first when the job queue is busy
 
 
 class LipSyncVideoRequest(BaseModel):
@@ -639,6 +1374,7 @@ class LipSyncVideoRequest(BaseModel):
     audio_wav_path: str
     prompt: Optional[str] = None
     filename: Optional[str] = None
+    priority: Optional[int] = 0  # higher runs first when the job queue is busy
 
 
 def _wavespeed_provider():
@@ -646,7 +1382,7 @@ def _wavespeed_provider():
     key = s.get("wavespeed_api_key")
     if not key:
         raise RuntimeError("Wavespeed API key not set in Settings")
-    return WaveSpeedProvider(api_key=key)
+    return AsyncWaveSpeedProvider(api_key=key)
 
 
 def _save_video_to_media(project_id: str, tmp_path: str, desired_name: Optional[str] = None) -> Dict[str, str]:
@@ -666,17 +1402,21 @@ def _save_video_to_media(project_id: str, tmp_path: str, desired_name: Optional[
     proj_images.mkdir(parents=True, exist_ok=True)
     thumb_first = proj_images / f"{target.stem}_first.png"
     thumb_last = proj_images / f"{target.stem}_last.png"
+    thumbs = []
     try:
         extract_first_last_frames(str(target), str(thumb_first), str(thumb_last))
         rel_first = str(thumb_first.relative_to(PROJECT_DATA_DIR))
         rel_last = str(thumb_last.relative_to(PROJECT_DATA_DIR))
-        add_media(project_id, {"id": thumb_first.name, "type": "image", "path": f"project_data/{rel_first}", "url": f"/files/{rel_first}"})
-        add_media(project_id, {"id": thumb_last.name, "type": "image", "path": f"project_data/{rel_last}", "url": f"/files/{rel_last}"})
+        thumbs.append({"id": thumb_first.name, "type": "image", "path": f"project_data/{rel_first}", "url": f"/files/{rel_first}"})
+        thumbs.append({"id": thumb_last.name, "type": "image", "path": f"project_data/{rel_last}", "url": f"/files/{rel_last}"})
     except Exception as e:
         logger.warning(f"Failed to extract thumbnail for {target.name}: {e}")
     
     item = {"id": target.name, "type": "video", "path": f"project_data/{rel}", "url": f"/files/{rel}"}
-    add_media(project_id, item)
+    with project_transaction(project_id):
+        for thumb in thumbs:
+            add_media(project_id, thumb)
+        add_media(project_id, item)
     return item
 
 
@@ -693,7 +1433,11 @@ def _run_lipsync_image_job(job_id: str, req: LipSyncImageRequest):
             aud = Path.cwd() / req.audio_wav_path
         
         update_job(job_id, progress=20, message="Uploading to WaveSpeed (may take 5-30 min)...")
-        tmp = prov.generate(prompt=req.prompt or "", image_path=str(img), audio_path=str(aud))
+        tmp = _remote_step(
+            job_id, "lipsync",
+            lambda on_submitted: _await_provider(prov.generate(prompt=req.prompt or "", image_path=str(img), audio_path=str(aud), on_submitted=on_submitted)),
+            lambda handle, **kwargs: _await_provider(prov.resume(handle)),
+        )
         
         update_job(job_id, progress=90, message="Saving result...")
         item = _save_video_to_media(req.project_id, tmp, req.filename)
@@ -722,45 +1466,44 @@ def _run_lipsync_video_job(job_id: str, req: LipSyncVideoRequest):
         
         logger.info(f"[Job {job_id}] Video: {vid}, Audio: {aud}")
         
-        # Get video duration
-        update_job(job_id, progress=15, message="Preparing audio...")
-        probe_vid = subprocess.run([
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1", str(vid)
-        ], capture_output=True, text=True)
-        
-        if probe_vid.returncode != 0:
-            raise RuntimeError(f"Failed to probe video duration: {probe_vid.stderr}")
-        
-        video_duration = float(probe_vid.stdout.strip())
-        logger.info(f"[Job {job_id}] Video duration: {video_duration}s")
-        
-        # Pad audio to match video duration (WaveSpeed generates video matching audio length)
-        from backend.video.ffmpeg import pad_audio_to_duration
-        padded_audio = tempfile.mktemp(suffix=".aac", dir="/tmp")
-        try:
-            pad_audio_to_duration(str(aud), video_duration, padded_audio)
-            logger.info(f"[Job {job_id}] Audio padded to {video_duration}s")
-            audio_to_use = padded_audio
-        except Exception as e:
-            logger.warning(f"[Job {job_id}] Failed to pad audio: {e}, using original")
-            audio_to_use = str(aud)
+        def submit(on_submitted):
+            # Get video duration
+            update_job(job_id, progress=15, message="Preparing audio...")
+            # Registered with the job's cancel token, so a cancel kills the probe
+            from backend.video.ffmpeg import get_video_duration, pad_audio_to_duration
+            video_duration = get_video_duration(str(vid))
+            if video_duration <= 0:
+                raise RuntimeError(f"Failed to probe video duration: {vid}")
+            logger.info(f"[Job {job_id}] Video duration: {video_duration}s")
+            
+            # Pad audio to match video duration (WaveSpeed generates video matching audio length)
+            padded_audio = tempfile.mktemp(suffix=".aac", dir="/tmp")
+            try:
+                job_scheduler.run("ffmpeg", pad_audio_to_duration, str(aud), video_duration, padded_audio)
+                logger.info(f"[Job {job_id}] Audio padded to {video_duration}s")
+                audio_to_use = padded_audio
+            except Exception as e:
+                logger.warning(f"[Job {job_id}] Failed to pad audio: {e}, using original")
+                audio_to_use = str(aud)
+            
+            update_job(job_id, progress=20, message="Uploading to WaveSpeed (may take 5-30 min)...")
+            try:
+                return _await_provider(prov.generate(prompt=req.prompt or "", video_path=str(vid), audio_path=audio_to_use, on_submitted=on_submitted))
+            finally:
+                # Clean up padded audio
+                if audio_to_use == padded_audio:
+                    Path(padded_audio).unlink(missing_ok=True)
         
-        update_job(job_id, progress=20, message="Uploading to WaveSpeed (may take 5-30 min)...")
-        tmp_lipsync = prov.generate(prompt=req.prompt or "", video_path=str(vid), audio_path=audio_to_use)
+        tmp_lipsync = _remote_step(job_id, "lipsync", submit, lambda handle, **kwargs: _await_provider(prov.resume(handle)))
         logger.info(f"[Job {job_id}] WaveSpeed returned: {tmp_lipsync}")
         
-        # Clean up padded audio
-        if audio_to_use == padded_audio:
-            Path(padded_audio).unlink(missing_ok=True)
-        
         # Ensure browser-compatible format
         update_job(job_id, progress=85, message="Converting to browser-compatible format...")
         from backend.video.ffmpeg import ensure_compatible_format
         compatible_tmp = tempfile.mktemp(suffix=".mp4", dir="/tmp")
         try:
             logger.info(f"[Job {job_id}] Converting {tmp_lipsync} to compatible format")
-            ensure_compatible_format(tmp_lipsync, compatible_tmp)
+            job_scheduler.run("ffmpeg", ensure_compatible_format, tmp_lipsync, compatible_tmp)
             Path(tmp_lipsync).unlink(missing_ok=True)
             tmp = compatible_tmp
             logger.info(f"[Job {job_id}] Format conversion successful")
@@ -784,18 +1527,14 @@ def _run_lipsync_video_job(job_id: str, req: LipSyncVideoRequest):
 @app.post("/ai/lipsync/image")
 def lipsync_image(req: LipSyncImageRequest):
     """Start image lip-sync job in background"""
-    job_id = create_job("lipsync_image", project_id=req.project_id, filename=req.filename)
-    thread = threading.Thread(target=_run_lipsync_image_job, args=(job_id, req), daemon=True)
-    thread.start()
+    job_id = submit_job("lipsync_image", _run_lipsync_image_job, req, priority=req.priority, project_id=req.project_id, filename=req.filename, request=req.model_dump())
     return {"status": "ok", "job_id": job_id}
 
 
 @app.post("/ai/lipsync/video")
 def lipsync_video(req: LipSyncVideoRequest):
     """Start video lip-sync job in background"""
-    job_id = create_job("lipsync_video", project_id=req.project_id, filename=req.filename)
-    thread = threading.Thread(target=_run_lipsync_video_job, args=(job_id, req), daemon=True)
-    thread.start()
+    job_id = submit_job("lipsync_video", _run_lipsync_video_job, req, priority=req.priority, project_id=req.project_id, filename=req.filename, request=req.model_dump())
     return {"status": "ok", "job_id": job_id}
 
 
@@ -805,6 +1544,7 @@ class MultiCharacterLipSyncRequest(BaseModel):
     characters: List[dict]  # [{character_id, character_name, audio_path, bounding_box: {x, y, width, height}}]
     prompt: Optional[str] = None
     filename: Optional[str] = None
+    priority: Optional[int] = 0  # higher runs first when the job queue is busy
 
 
 @app.post("/ai/lipsync/multi-character")
@@ -813,9 +1553,7 @@ def lipsync_multi_character(req: MultiCharacterLipSyncRequest):
     Multi-character lip-sync with precise audio-to-character mapping.
     Generates each character separately and composites them using FFmpeg.
     """
-    job_id = create_job("lipsync_multi_character", project_id=req.project_id, filename=req.filename)
-    thread = threading.Thread(target=_run_multi_character_lipsync_job, args=(job_id, req), daemon=True)
-    thread.start()
+    job_id = submit_job("lipsync_multi_character", _run_multi_character_lipsync_job, req, priority=req.priority, project_id=req.project_id, filename=req.filename, request=req.model_dump())
     return {"status": "ok", "job_id": job_id}
 
 
@@ -869,11 +1607,16 @@ def _run_multi_character_lipsync_job(job_id: str, req: MultiCharacterLipSyncRequ
             logger.info(f"  {char_name}: bbox=({x_px},{y_px},{w_px},{h_px}), audio={audio_path.name}")
             
             # Generate full-image lip-sync for this character's audio
-            tmp_video = prov.generate(
-                prompt=req.prompt or f"focus on character at position {bbox['x']},{bbox['y']}",
-                image_path=str(img_path),
-                audio_path=str(audio_path),
-                resolution="720p"
+            tmp_video = _remote_step(
+                job_id, f"character_{i}",
+                lambda on_submitted: _await_provider(prov.generate(
+                    prompt=req.prompt or f"focus on character at position {bbox['x']},{bbox['y']}",
+                    image_path=str(img_path),
+                    audio_path=str(audio_path),
+                    resolution="720p",
+                    on_submitted=on_submitted,
+                )),
+                lambda handle, **kwargs: _await_provider(prov.resume(handle)),
             )
             
             character_videos.append({
@@ -905,6 +1648,15 @@ def _run_multi_character_lipsync_job(job_id: str, req: MultiCharacterLipSyncRequ
         update_job(job_id, status="failed", error=str(e))
 
 
+# Job types that can be picked up again after a backend reload: (runner, request model)
+_RESUMABLE_JOBS = {
+    "generate_shot": (_run_generate_shot_job, ShotGenerateRequest),
+    "lipsync_image": (_run_lipsync_image_job, LipSyncImageRequest),
+    "lipsync_video": (_run_lipsync_video_job, LipSyncVideoRequest),
+    "lipsync_multi_character": (_run_multi_character_lipsync_job, MultiCharacterLipSyncRequest),
+}
+
+
 # ============================================================================
 # AI Cinematographer - Shot Planning
 # ============================================================================
@@ -982,48 +1734,50 @@ def plan_shots(req: ShotPlanRequest):
 
         # If apply_to_scene is True, clear existing shots and create the new shots in the scene
         if req.apply_to_scene and req.scene_id:
-            # Clear existing shots first to avoid duplicates
-            cleared_count = clear_scene_shots(req.project_id, req.scene_id)
-            logger.info(f"Cleared {cleared_count} existing shots from scene {req.scene_id}")
-
-            for i, shot_data in enumerate(shots):
-                shot_id = f"shot_{int(time.time())}_{i+1:03d}"
-
-                # Auto-ID characters from characters_visible
-                characters_in_shot = []
-                logger.info(f"[SHOT {i+1}] Processing shot: {shot_data.get('subject', 'unknown')}")
-                logger.info(f"[SHOT {i+1}] characters_visible from AI: {shot_data.get('characters_visible', [])}")
-                logger.info(f"[SHOT {i+1}] name_to_id mapping: {name_to_id}")
-
-                for char_name in shot_data.get("characters_visible", []):
-                    char_id = name_to_id.get(char_name.lower())
-                    logger.info(f"[SHOT {i+1}] Looking up '{char_name}' (lowercase: '{char_name.lower()}') -> {char_id}")
-                    if char_id:
-                        characters_in_shot.append(char_id)
-
-                # Also check subject and speaker for character matches
-                for field in ["subject", "speaker"]:
-                    val = shot_data.get(field, "") or ""
-                    for name, cid in name_to_id.items():
-                        if name in val.lower() and cid not in characters_in_shot:
-                            logger.info(f"[SHOT {i+1}] Found character '{name}' in {field}: '{val}'")
-                            characters_in_shot.append(cid)
-
-                logger.info(f"[SHOT {i+1}] Final characters_in_shot: {characters_in_shot}")
-
-                shot_meta = {
-                    "shot_id": shot_id,
-                    "shot_number": shot_data.get("shot_number", i + 1),
-                    "camera_angle": shot_data.get("camera_angle"),
-                    "subject": shot_data.get("subject"),
-                    "action": shot_data.get("action"),
-                    "dialogue": shot_data.get("dialogue"),
-                    "characters_in_shot": characters_in_shot,
-                    "prompt": shot_data.get("prompt_suggestion"),
-                    "duration": shot_data.get("duration_suggestion", 5),
-                    "status": "planned"
-                }
-                add_shot(req.project_id, req.scene_id, shot_meta)
+            # One metadata write for the clear plus every new shot
+            with project_transaction(req.project_id):
+                # Clear existing shots first to avoid duplicates
+                cleared_count = clear_scene_shots(req.project_id, req.scene_id)
+                logger.info(f"Cleared {cleared_count} existing shots from scene {req.scene_id}")
+
+                for i, shot_data in enumerate(shots):
+                    shot_id = f"shot_{int(time.time())}_{i+1:03d}"
+
+                    # Auto-ID characters from characters_visible
+                    characters_in_shot = []
+                    logger.info(f"[SHOT {i+1}] Processing shot: {shot_data.get('subject', 'unknown')}")
+                    logger.info(f"[SHOT {i+1}] characters_visible from AI: {shot_data.get('characters_visible', [])}")
+                    logger.info(f"[SHOT {i+1}] name_to_id mapping: {name_to_id}")
+
+                    for char_name in shot_data.get("characters_visible", []):
+                        char_id = name_to_id.get(char_name.lower())
+                        logger.info(f"[SHOT {i+1}] Looking up '{char_name}' (lowercase: '{char_name.lower()}') -> {char_id}")
+                        if char_id:
+                            characters_in_shot.append(char_id)
+
+                    # Also check subject and speaker for character matches
+                    for field in ["subject", "speaker"]:
+                        val = shot_data.get(field, "") or ""
+                        for name, cid in name_to_id.items():
+                            if name in val.lower() and cid not in characters_in_shot:
+                                logger.info(f"[SHOT {i+1}] Found character '{name}' in {field}: '{val}'")
+                                characters_in_shot.append(cid)
+
+                    logger.info(f"[SHOT {i+1}] Final characters_in_shot: {characters_in_shot}")
+
+                    shot_meta = {
+                        "shot_id": shot_id,
+                        "shot_number": shot_data.get("shot_number", i + 1),
+                        "camera_angle": shot_data.get("camera_angle"),
+                        "subject": shot_data.get("subject"),
+                        "action": shot_data.get("action"),
+                        "dialogue": shot_data.get("dialogue"),
+                        "characters_in_shot": characters_in_shot,
+                        "prompt": shot_data.get("prompt_suggestion"),
+                        "duration": shot_data.get("duration_suggestion", 5),
+                        "status": "planned"
+                    }
+                    add_shot(req.project_id, req.scene_id, shot_meta)
 
         return {"status": "ok", "shots": shots, "applied": req.apply_to_scene}
     except Exception as e:
@@ -1110,9 +1864,8 @@ def analyze_scene(req: SceneAnalyzeRequest):
 
     try:
         if provider == "anthropic":
-            import requests
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
+            response = limited_request(
+                "anthropic", "POST", "https://api.anthropic.com/v1/messages",
                 headers={
                     "x-api-key": api_key,
                     "anthropic-version": "2023-06-01",
@@ -1130,9 +1883,8 @@ def analyze_scene(req: SceneAnalyzeRequest):
                 return {"status": "error", "detail": f"Anthropic API error: {response.status_code}"}
             content = response.json().get("content", [{}])[0].get("text", "")
         else:
-            import requests
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
+            response = limited_request(
+                "openai", "POST", "https://api.openai.com/v1/chat/completions",
                 headers={
                     "Authorization": f"Bearer {api_key}",
                     "Content-Type": "application/json"
@@ -1215,7 +1967,7 @@ def refine_prompt(req: PromptRefineRequest):
     if not scene:
         return {"status": "error", "detail": "Scene not found"}
 
-    shot = next((s for s in scene.get("shots", []) if s.get("shot_id") == req.shot_id), None)
+    shot = get_shot(req.project_id, req.shot_id, req.scene_id)
     if not shot:
         return {"status": "error", "detail": "Shot not found"}
 
@@ -1280,7 +2032,7 @@ def plan_shot_from_video(req: AIShotPlanRequest):
         return {"status": "error", "detail": "Scene not found"}
 
     # Find the shot we're planning
-    shot = next((s for s in scene.get("shots", []) if s.get("shot_id") == req.shot_id), None)
+    shot = get_shot(req.project_id, req.shot_id, req.scene_id)
     if not shot:
         return {"status": "error", "detail": "Shot not found"}
 
@@ -1290,11 +2042,13 @@ def plan_shot_from_video(req: AIShotPlanRequest):
     # Get scene cast (which characters are IN this scene)
     scene_cast = scene.get("cast", [])
     cast_character_ids = [c.get("character_id") for c in scene_cast]
+    cast_by_character = {}
+    for c in scene_cast:
+        cast_by_character.setdefault(c.get("character_id"), c)
 
     # Build character reference images dict: {character_name: [image_paths]}
     # If user selected specific refs, use ONLY those
     character_ref_images: Dict[str, List[str]] = {}
-    all_media = list_media(req.project_id)  # Get media once, outside the loop
 
     # Log what we received
     print(f"[AI DIRECTOR] selected_ref_ids from frontend: {req.selected_ref_ids}")
@@ -1314,7 +2068,7 @@ def plan_shot_from_video(req: AIShotPlanRequest):
                 media_to_character[ref_id] = char_name
 
             # Check scene-specific refs
-            cast_entry = next((c for c in scene_cast if c.get("character_id") == char_id), None)
+            cast_entry = cast_by_character.get(char_id)
             if cast_entry:
                 for ref_id in cast_entry.get("scene_reference_ids", []):
                     media_to_character[ref_id] = char_name
@@ -1324,7 +2078,7 @@ def plan_shot_from_video(req: AIShotPlanRequest):
 
         # Now build character_ref_images from ONLY selected IDs
         for ref_id in req.selected_ref_ids:
-            media_item = next((m for m in all_media if m.get("id") == ref_id), None)
+            media_item = get_media(req.project_id, ref_id)
             if media_item and media_item.get("path"):
                 full_path = PROJECT_DATA_DIR / media_item["path"].replace("project_data/", "")
                 if full_path.exists():
@@ -1355,7 +2109,7 @@ def plan_shot_from_video(req: AIShotPlanRequest):
             char_id = char.get("character_id")
 
             # Check if character is in scene cast and has scene-specific refs
-            cast_entry = next((c for c in scene_cast if c.get("character_id") == char_id), None)
+            cast_entry = cast_by_character.get(char_id)
             if cast_entry and cast_entry.get("scene_reference_ids"):
                 ref_ids = cast_entry["scene_reference_ids"]
             else:
@@ -1365,7 +2119,7 @@ def plan_shot_from_video(req: AIShotPlanRequest):
             ref_paths = []
             for ref_id in ref_ids[:2]:  # Limit to 2 refs per character to avoid token limits
                 # Look up media by ID
-                media_item = next((m for m in all_media if m.get("id") == ref_id), None)
+                media_item = get_media(req.project_id, ref_id)
                 if media_item and media_item.get("path"):
                     full_path = PROJECT_DATA_DIR / media_item["path"].replace("project_data/", "")
                     if full_path.exists():
@@ -1496,66 +2250,64 @@ def extract_ref_frame(req: ExtractRefFrameRequest):
 
         # Add to media library
         rel_path = str(output_path.relative_to(PROJECT_DATA_DIR))
-        media_item = add_media(req.project_id, {
-            "id": filename,
-            "type": "image",
-            "path": f"project_data/{rel_path}",
-            "url": f"/files/{rel_path}",
-            "source": "extracted_ref",
-            "description": req.description,
-            "from_video": req.video_path,
-            "extracted_timestamp": req.timestamp_seconds
-        })
-
-        result = {
-            "status": "ok",
-            "media_id": media_item.get("id"),
-            "path": media_item.get("path"),
-            "url": media_item.get("url")
-        }
-
-        # Auto-add to scene-specific refs if requested
-        if req.auto_add_to_refs:
-            meta = read_metadata(req.project_id)
+        # The media entry and any reference links are committed together
+        with project_transaction(req.project_id) as meta:
+            media_item = add_media(req.project_id, {
+                "id": filename,
+                "type": "image",
+                "path": f"project_data/{rel_path}",
+                "url": f"/files/{rel_path}",
+                "source": "extracted_ref",
+                "description": req.description,
+                "from_video": req.video_path,
+                "extracted_timestamp": req.timestamp_seconds
+            })
 
-            if req.frame_type == "character" and req.character_name:
-                # Find the character by name
-                characters = meta.get("characters", [])
-                char = next((c for c in characters if c.get("name") == req.character_name), None)
+            result = {
+                "status": "ok",
+                "media_id": media_item.get("id"),
+                "path": media_item.get("path"),
+                "url": media_item.get("url")
+            }
 
-                if char:
-                    char_id = char.get("character_id")
-                    # Find scene and update cast's scene_reference_ids
+            # Auto-add to scene-specific refs if requested
+            if req.auto_add_to_refs:
+                if req.frame_type == "character" and req.character_name:
+                    # Find the character by name
+                    characters = meta.get("characters", [])
+                    char = next((c for c in characters if c.get("name") == req.character_name), None)
+
+                    if char:
+                        char_id = char.get("character_id")
+                        # Find scene and update cast's scene_reference_ids
+                        for s in meta.get("scenes", []):
+                            if s.get("scene_id") == req.scene_id:
+                                cast = s.setdefault("cast", [])
+                                # Find or create cast entry for this character
+                                cast_entry = next((c for c in cast if c.get("character_id") == char_id), None)
+                                if cast_entry:
+                                    scene_refs = cast_entry.setdefault("scene_reference_ids", [])
+                                    if media_item.get("id") not in scene_refs:
+                                        scene_refs.append(media_item.get("id"))
+                                else:
+                                    # Create new cast entry
+                                    cast.append({
+                                        "character_id": char_id,
+                                        "scene_reference_ids": [media_item.get("id")]
+                                    })
+                                result["added_to_character_refs"] = req.character_name
+                                break
+
+                elif req.frame_type == "scene":
+                    # Add to scene master_image_ids
                     for s in meta.get("scenes", []):
                         if s.get("scene_id") == req.scene_id:
-                            cast = s.setdefault("cast", [])
-                            # Find or create cast entry for this character
-                            cast_entry = next((c for c in cast if c.get("character_id") == char_id), None)
-                            if cast_entry:
-                                scene_refs = cast_entry.setdefault("scene_reference_ids", [])
-                                if media_item.get("id") not in scene_refs:
-                                    scene_refs.append(media_item.get("id"))
-                            else:
-                                # Create new cast entry
-                                cast.append({
-                                    "character_id": char_id,
-                                    "scene_reference_ids": [media_item.get("id")]
-                                })
-                            write_metadata(req.project_id, meta)
-                            result["added_to_character_refs"] = req.character_name
+                            master_ids = s.setdefault("master_image_ids", [])
+                            if media_item.get("id") not in master_ids:
+                                master_ids.append(media_item.get("id"))
+                            result["added_to_scene_masters"] = True
                             break
 
-            elif req.frame_type == "scene":
-                # Add to scene master_image_ids
-                for s in meta.get("scenes", []):
-                    if s.get("scene_id") == req.scene_id:
-                        master_ids = s.setdefault("master_image_ids", [])
-                        if media_item.get("id") not in master_ids:
-                            master_ids.append(media_item.get("id"))
-                        write_metadata(req.project_id, meta)
-                        result["added_to_scene_masters"] = True
-                        break
-
         return result
 
     except Exception as e:
@@ -1633,24 +2385,33 @@ def render_film(req: FilmRenderRequest):
 
 @app.post("/storage/init-project/{project_id}")
 def init_project(project_id: str):
-    proj_dir = PROJECT_DATA_DIR / project_id
+    proj_dir = ensure_project(project_id)
+    # Index files already on disk if the library is empty (e.g. copied-in project)
     media_dir = proj_dir / "media"
-    proj_dir.mkdir(parents=True, exist_ok=True)
-    media_dir.mkdir(parents=True, exist_ok=True)
-    meta_path = proj_dir / "metadata.json"
-    if not meta_path.exists():
-        meta = {
-            "project_id": project_id,
-            "scenes": [],
-            "shots": [],
-            "characters": [],
-            "media": []
-        }
-        with open(meta_path, "w", encoding="utf-8") as f:
-            json.dump(meta, f, indent=2)
+    has_files = any(any((media_dir / kind).glob("*")) for kind in ("video", "audio", "images"))
+    if not read_metadata(project_id).get("media") and has_files:
+        api_scan_media(project_id)
+    else:
+        backfill_media_timestamps(project_id)
     return {"status": "ok", "project_dir": str(proj_dir)}
 
 
+def _etag_response(request: Request, project_id: str, build):
+    """
+    Conditional GET for project reads: the ETag is the storage layer's project
+    revision, so a poll with a matching If-None-Match gets an empty 304 without
+    building the body. `no-cache` makes browsers revalidate on every fetch.
+    """
+    etag = f'"{project_revision(project_id)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+
 # Storage: scenes & shots
 class SceneCreate(BaseModel):
     scene_id: str
@@ -1658,8 +2419,8 @@ class SceneCreate(BaseModel):
 
 
 @app.get("/storage/{project_id}/scenes")
-def api_list_scenes(project_id: str):
-    return {"scenes": list_scenes(project_id)}
+def api_list_scenes(project_id: str, request: Request):
+    return _etag_response(request, project_id, lambda: {"scenes": list_scenes(project_id)})
 
 
 @app.post("/storage/{project_id}/scenes")
@@ -1669,11 +2430,13 @@ def api_add_scene(project_id: str, body: SceneCreate):
 
 
 @app.get("/storage/{project_id}/scenes/{scene_id}")
-def api_get_scene(project_id: str, scene_id: str):
-    scene = get_scene(project_id, scene_id)
-    if scene is None:
-        return {"status": "not_found"}
-    return {"scene": scene}
+def api_get_scene(project_id: str, scene_id: str, request: Request):
+    def build():
+        scene = get_scene(project_id, scene_id)
+        if scene is None:
+            return {"status": "not_found"}
+        return {"scene": scene}
+    return _etag_response(request, project_id, build)
 
 
 class SceneCast(BaseModel):
@@ -1701,46 +2464,44 @@ class SceneUpdate(BaseModel):
 
 @app.put("/storage/{project_id}/scenes/{scene_id}")
 def api_update_scene(project_id: str, scene_id: str, body: SceneUpdate):
-    meta_path = PROJECT_DATA_DIR / project_id / "metadata.json"
-    if not meta_path.exists():
+    if not (PROJECT_DATA_DIR / project_id).exists():
+        return {"status": "not_found"}
+    with project_lock(project_id):
+        data = read_metadata_for_update(project_id)
+        for s in data.get("scenes", []):
+            if s.get("scene_id") == scene_id:
+                if body.title is not None:
+                    s["title"] = body.title
+                if body.description is not None:
+                    s["description"] = body.description
+                if body.location_notes is not None:
+                    s["location_notes"] = body.location_notes
+                if body.master_image_ids is not None:
+                    s["master_image_ids"] = body.master_image_ids
+                if body.cast is not None:
+                    s["cast"] = body.cast
+                if body.visual_style is not None:
+                    s["visual_style"] = body.visual_style
+                if body.color_palette is not None:
+                    s["color_palette"] = body.color_palette
+                if body.camera_style is not None:
+                    s["camera_style"] = body.camera_style
+                if body.tone_notes is not None:
+                    s["tone_notes"] = body.tone_notes
+                if body.setup_complete is not None:
+                    s["setup_complete"] = body.setup_complete
+                if body.shot_order is not None:
+                    # Reorder shots based on shot_order list
+                    shots = s.get("shots", [])
+                    shot_map = {sh["shot_id"]: sh for sh in shots}
+                    reordered = []
+                    for shot_id in body.shot_order:
+                        if shot_id in shot_map:
+                            reordered.append(shot_map[shot_id])
+                    s["shots"] = reordered
+                write_metadata(project_id, data)
+                return {"status": "ok", "scene": s}
         return {"status": "not_found"}
-    with open(meta_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    for s in data.get("scenes", []):
-        if s.get("scene_id") == scene_id:
-            if body.title is not None:
-                s["title"] = body.title
-            if body.description is not None:
-                s["description"] = body.description
-            if body.location_notes is not None:
-                s["location_notes"] = body.location_notes
-            if body.master_image_ids is not None:
-                s["master_image_ids"] = body.master_image_ids
-            if body.cast is not None:
-                s["cast"] = body.cast
-            if body.visual_style is not None:
-                s["visual_style"] = body.visual_style
-            if body.color_palette is not None:
-                s["color_palette"] = body.color_palette
-            if body.camera_style is not None:
-                s["camera_style"] = body.camera_style
-            if body.tone_notes is not None:
-                s["tone_notes"] = body.tone_notes
-            if body.setup_complete is not None:
-                s["setup_complete"] = body.setup_complete
-            if body.shot_order is not None:
-                # Reorder shots based on shot_order list
-                shots = s.get("shots", [])
-                shot_map = {sh["shot_id"]: sh for sh in shots}
-                reordered = []
-                for shot_id in body.shot_order:
-                    if shot_id in shot_map:
-                        reordered.append(shot_map[shot_id])
-                s["shots"] = reordered
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-            return {"status": "ok", "scene": s}
-    return {"status": "not_found"}
 
 
 class ShotCreate(BaseModel):
@@ -1844,41 +2605,54 @@ def api_add_shot(project_id: str, scene_id: str, body: ShotCreate):
 
 # Media upload/list
 @app.get("/storage/{project_id}/media")
-def api_list_media(project_id: str):
-    # Auto-scan if metadata is empty but files exist on disk
-    items = list_media(project_id)
+def api_list_media(
+    request: Request,
+    project_id: str,
+    media_type: Optional[str] = Query(None, alias="type"),
+    source: Optional[str] = None,
+    archived: Optional[str] = None,
+    since: Optional[float] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    List media from the project index. Read-only: scanning the media folders and
+    backfilling timestamps happen in init-project / media/scan.
+
+    archived: "false" (default, active only) | "true" (archived only) | "all"
+    since: only items with a newer `timestamp`
+    sort: timestamp | id | type | source, "-" prefix for descending (default: insertion order)
+    limit / cursor: page size and the `next_cursor` returned by the previous page
+    fields: comma-separated keys to return per item
+    """
+    archived_filter = {"true": True, "all": None}.get((archived or "false").lower(), False)
+    if sort and sort.lstrip("-") not in MEDIA_SORT_KEYS:
+        return {"status": "error", "detail": f"Unknown sort key '{sort}'. Use one of: {', '.join(MEDIA_SORT_KEYS)}"}
     try:
-        proj_dir = PROJECT_DATA_DIR / project_id
-        media_dir = proj_dir / "media"
-        video_dir = media_dir / "video"
-        audio_dir = media_dir / "audio"
-        images_dir = media_dir / "images"
-        has_files = any(video_dir.glob("*")) or any(audio_dir.glob("*")) or any(images_dir.glob("*"))
-        if (not items) and has_files:
-            api_scan_media(project_id)
-            items = list_media(project_id)
-    except Exception:
-        pass
-    
-    # Backfill timestamps for any items missing them
-    import time as time_module
-    meta = read_metadata(project_id)
-    media_list = meta.get("media", [])
-    modified = False
-    for item in media_list:
-        if "timestamp" not in item:
-            # Try to extract timestamp from ID, or use current time
-            try:
-                match = __import__('re').match(r'^(\d{10,13})', item.get("id", ""))
-                item["timestamp"] = int(match.group(1)) if match else int(time_module.time())
-            except:
-                item["timestamp"] = int(time_module.time())
-            modified = True
-    if modified:
-        write_metadata(project_id, meta)
-        items = list_media(project_id)
-    
-    return {"media": items}
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        return {"status": "error", "detail": "Invalid cursor"}
+    if limit is not None and limit < 1:
+        return {"status": "error", "detail": "Invalid limit"}
+
+    def build():
+        items = query_media(project_id, media_type=media_type, source=source, archived=archived_filter, since=since, sort=sort)
+        total = len(items)
+        if limit is not None:
+            items = items[offset:offset + limit]
+            next_cursor = str(offset + len(items)) if offset + len(items) < total else None
+        else:
+            items = items[offset:]
+            next_cursor = None
+        if fields:
+            keys = [f.strip() for f in fields.split(",") if f.strip()]
+            items = [{k: item[k] for k in keys if k in item} for item in items]
+        return {"media": items, "total": total, "next_cursor": next_cursor}
+    return _etag_response(request, project_id, build)
 
 
 @app.post("/storage/{project_id}/media")
@@ -1925,6 +2699,36 @@ def api_list_projects():
             projects.append(p.name)
     return {"projects": projects}
 
+
+@app.get("/storage/cache-stats")
+def api_metadata_cache_stats():
+    """Hit/miss counters for the in-process metadata cache."""
+    return {"status": "ok", "backend": get_metadata_store().name, "cache": metadata_cache_stats()}
+
+
+class MetadataTransferRequest(BaseModel):
+    path: Optional[str] = None  # Defaults to the project's metadata.json
+
+
+@app.post("/storage/{project_id}/metadata/import")
+def api_import_metadata(project_id: str, body: MetadataTransferRequest):
+    """Load a metadata.json document into the active metadata backend."""
+    try:
+        meta = import_metadata_json(project_id, _normalize_path(body.path) if body.path else None)
+        return {"status": "ok", "backend": get_metadata_store().name, "media": len(meta.get("media", []))}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+@app.post("/storage/{project_id}/metadata/export")
+def api_export_metadata(project_id: str, body: MetadataTransferRequest):
+    """Export the active metadata backend's document as a JSON file."""
+    try:
+        out = export_metadata_json(project_id, _normalize_path(body.path) if body.path else None)
+        return {"status": "ok", "backend": get_metadata_store().name, "path": str(out)}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
 # Shot update/delete
 class ShotUpdate(BaseModel):
     # Planning fields
@@ -1952,52 +2756,48 @@ class ShotUpdate(BaseModel):
 
 @app.put("/storage/{project_id}/scenes/{scene_id}/shots/{shot_id}")
 def api_update_shot(project_id: str, scene_id: str, shot_id: str, body: ShotUpdate):
-    meta_path = PROJECT_DATA_DIR / project_id / "metadata.json"
-    if not meta_path.exists():
+    if not (PROJECT_DATA_DIR / project_id).exists():
+        return {"status": "not_found"}
+    with project_lock(project_id):
+        data = read_metadata_for_update(project_id)
+        for s in data.get("scenes", []):
+            if s.get("scene_id") == scene_id:
+                for sh in s.get("shots", []):
+                    if sh.get("shot_id") == shot_id:
+                        updates = body.model_dump(exclude_none=True)
+                        for k, v in updates.items():
+                            sh[k] = v
+
+                        # Auto-update status based on what's being set
+                        # Priority: video_ready > audio_ready > image_ready > planned
+                        if "file_path" in updates and updates["file_path"]:
+                            sh["status"] = "video_ready"
+                        elif "audio_path" in updates and updates["audio_path"]:
+                            if sh.get("status") != "video_ready":
+                                sh["status"] = "audio_ready"
+                        elif "start_frame_path" in updates and updates["start_frame_path"]:
+                            if sh.get("status") not in ("video_ready", "audio_ready"):
+                                sh["status"] = "image_ready"
+
+                        write_metadata(project_id, data)
+                        return {"status": "ok", "shot": sh}
         return {"status": "not_found"}
-    with open(meta_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    for s in data.get("scenes", []):
-        if s.get("scene_id") == scene_id:
-            for sh in s.get("shots", []):
-                if sh.get("shot_id") == shot_id:
-                    updates = body.model_dump(exclude_none=True)
-                    for k, v in updates.items():
-                        sh[k] = v
-
-                    # Auto-update status based on what's being set
-                    # Priority: video_ready > audio_ready > image_ready > planned
-                    if "file_path" in updates and updates["file_path"]:
-                        sh["status"] = "video_ready"
-                    elif "audio_path" in updates and updates["audio_path"]:
-                        if sh.get("status") != "video_ready":
-                            sh["status"] = "audio_ready"
-                    elif "start_frame_path" in updates and updates["start_frame_path"]:
-                        if sh.get("status") not in ("video_ready", "audio_ready"):
-                            sh["status"] = "image_ready"
-
-                    with open(meta_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2)
-                    return {"status": "ok", "shot": sh}
-    return {"status": "not_found"}
 
 
 @app.delete("/storage/{project_id}/scenes/{scene_id}/shots/{shot_id}")
 def api_delete_shot(project_id: str, scene_id: str, shot_id: str):
-    meta_path = PROJECT_DATA_DIR / project_id / "metadata.json"
-    if not meta_path.exists():
+    if not (PROJECT_DATA_DIR / project_id).exists():
+        return {"status": "not_found"}
+    with project_lock(project_id):
+        data = read_metadata_for_update(project_id)
+        for s in data.get("scenes", []):
+            if s.get("scene_id") == scene_id:
+                before = len(s.get("shots", []))
+                s["shots"] = [sh for sh in s.get("shots", []) if sh.get("shot_id") != shot_id]
+                after = len(s["shots"])
+                write_metadata(project_id, data)
+                return {"status": "ok", "deleted": before - after}
         return {"status": "not_found"}
-    with open(meta_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    for s in data.get("scenes", []):
-        if s.get("scene_id") == scene_id:
-            before = len(s.get("shots", []))
-            s["shots"] = [sh for sh in s.get("shots", []) if sh.get("shot_id") != shot_id]
-            after = len(s["shots"])
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-            return {"status": "ok", "deleted": before - after}
-    return {"status": "not_found"}
 
 
 @app.get("/media/metadata")
@@ -2136,36 +2936,37 @@ def api_normalize_media_types(project_id: str):
     Returns number of items fixed.
     """
     ensure_project(project_id)
-    meta = read_metadata(project_id)
-    media_list = meta.get("media", [])
-    fixed_count = 0
+    with project_lock(project_id):
+        meta = read_metadata_for_update(project_id)
+        media_list = meta.get("media", [])
+        fixed_count = 0
     
-    for item in media_list:
-        old_type = item.get("type")
-        # Normalize types
-        if old_type == "images":
-            item["type"] = "image"
-            fixed_count += 1
-        elif old_type == "videos":
-            item["type"] = "video"
-            fixed_count += 1
-        elif old_type == "audios":
-            item["type"] = "audio"
-            fixed_count += 1
-        
-        # Also ensure source is set
-        if "source" not in item:
-            file_id = item.get("id", "")
-            if "_first.png" in file_id or "_last.png" in file_id:
-                item["source"] = "extracted"
-            else:
-                item["source"] = "generated"
-            fixed_count += 1
+        for item in media_list:
+            old_type = item.get("type")
+            # Normalize types
+            if old_type == "images":
+                item["type"] = "image"
+                fixed_count += 1
+            elif old_type == "videos":
+                item["type"] = "video"
+                fixed_count += 1
+            elif old_type == "audios":
+                item["type"] = "audio"
+                fixed_count += 1
+        
+            # Also ensure source is set
+            if "source" not in item:
+                file_id = item.get("id", "")
+                if "_first.png" in file_id or "_last.png" in file_id:
+                    item["source"] = "extracted"
+                else:
+                    item["source"] = "generated"
+                fixed_count += 1
     
-    if fixed_count > 0:
-        write_metadata(project_id, meta)
+        if fixed_count > 0:
+            write_metadata(project_id, meta)
     
-    return {"status": "ok", "fixed": fixed_count}
+        return {"status": "ok", "fixed": fixed_count}
 
 @app.post("/storage/{project_id}/media/scan")
 def api_scan_media(project_id: str):
@@ -2185,67 +2986,67 @@ def api_scan_media(project_id: str):
     audio_dir.mkdir(parents=True, exist_ok=True)
     images_dir.mkdir(parents=True, exist_ok=True)
 
-    # First, deduplicate existing items
-    existing = read_metadata(project_id).get("media", [])
-    seen_ids = set()
-    unique_existing = []
-    for item in existing:
-        mid = item.get("id")
-        if mid not in seen_ids:
-            seen_ids.add(mid)
-            unique_existing.append(item)
-    existing = unique_existing
-    existing_ids = seen_ids
-
-    new_items = []
-
-    def add_item(file_path: Path, kind: str):
-        nonlocal new_items, existing_ids, existing
-        file_id = file_path.name
-        if file_id in existing_ids:
-            return
-        rel_from_project = str(file_path.relative_to(PROJECT_DATA_DIR))
-        url = f"/files/{rel_from_project}"
-        import time as time_module
-        # Auto-tag source based on filename patterns
-        source = "extracted" if ("_first.png" in file_id or "_last.png" in file_id) else "generated"
-        item = {
-            "id": file_id,
-            "type": kind,
-            "path": f"project_data/{rel_from_project}",
-            "url": url,
-            "source": source,
-            "timestamp": int(time_module.time()),
-        }
-        existing.append(item)
-        existing_ids.add(file_id)
-        new_items.append(item)
-
-    # Scan each folder
-    for f in video_dir.glob("*"):
-        if f.is_file() and f.suffix.lower() in {".mp4", ".mov", ".m4v"}:
-            add_item(f, "video")
-    for f in audio_dir.glob("*"):
-        if f.is_file() and f.suffix.lower() in {".wav", ".mp3", ".aac", ".flac"}:
-            add_item(f, "audio")
-    for f in images_dir.glob("*"):
-        if f.is_file() and f.suffix.lower() in {".png", ".jpg", ".jpeg", ".webp"}:
-            add_item(f, "image")
-
-    # Normalize types in existing items before persisting
-    for item in existing:
-        if item.get("type") == "images":
-            item["type"] = "image"
-        elif item.get("type") == "videos":
-            item["type"] = "video"
-        elif item.get("type") == "audios":
-            item["type"] = "audio"
-    
-    # Persist
-    meta = read_metadata(project_id)
-    meta["media"] = existing
-    write_metadata(project_id, meta)
-    return {"status": "ok", "indexed": len(new_items), "items": new_items}
+    with project_transaction(project_id) as meta:
+        # First, deduplicate existing items
+        existing = meta.get("media", [])
+        seen_ids = set()
+        unique_existing = []
+        for item in existing:
+            mid = item.get("id")
+            if mid not in seen_ids:
+                seen_ids.add(mid)
+                unique_existing.append(item)
+        existing = unique_existing
+        existing_ids = seen_ids
+
+        new_items = []
+
+        def add_item(file_path: Path, kind: str):
+            nonlocal new_items, existing_ids, existing
+            file_id = file_path.name
+            if file_id in existing_ids:
+                return
+            rel_from_project = str(file_path.relative_to(PROJECT_DATA_DIR))
+            url = f"/files/{rel_from_project}"
+            import time as time_module
+            # Auto-tag source based on filename patterns
+            source = "extracted" if ("_first.png" in file_id or "_last.png" in file_id) else "generated"
+            item = {
+                "id": file_id,
+                "type": kind,
+                "path": f"project_data/{rel_from_project}",
+                "url": url,
+                "source": source,
+                "timestamp": int(time_module.time()),
+            }
+            existing.append(item)
+            existing_ids.add(file_id)
+            new_items.append(item)
+
+        # Scan each folder
+        for f in video_dir.glob("*"):
+            if f.is_file() and f.suffix.lower() in {".mp4", ".mov", ".m4v"}:
+                add_item(f, "video")
+        for f in audio_dir.glob("*"):
+            if f.is_file() and f.suffix.lower() in {".wav", ".mp3", ".aac", ".flac"}:
+                add_item(f, "audio")
+        for f in images_dir.glob("*"):
+            if f.is_file() and f.suffix.lower() in {".png", ".jpg", ".jpeg", ".webp"}:
+                add_item(f, "image")
+
+        # Normalize types in existing items before persisting
+        for item in existing:
+            if item.get("type") == "images":
+                item["type"] = "image"
+            elif item.get("type") == "videos":
+                item["type"] = "video"
+            elif item.get("type") == "audios":
+                item["type"] = "audio"
+
+        # Persist (committed with the timestamp backfill when the block exits)
+        meta["media"] = existing
+        backfill_media_timestamps(project_id)
+        return {"status": "ok", "indexed": len(new_items), "items": new_items}
 
 
 class ArchiveMediaRequest(BaseModel):
@@ -2289,6 +3090,15 @@ def api_list_archived_media(project_id: str):
     archived = [m for m in all_media if m.get("archived", False)]
     return {"media": archived}
 
+
+@app.get("/storage/{project_id}/media/{media_id}/references")
+def api_media_references(project_id: str, media_id: str):
+    """List the characters and scenes that use a media item."""
+    if not (PROJECT_DATA_DIR / project_id).exists():
+        return {"status": "error", "detail": "Project not found"}
+    refs = media_references(project_id, media_id)
+    return {"status": "ok", "media_id": media_id, "references": refs, "in_use": bool(refs)}
+
 # Settings
 @app.get("/settings")
 def api_get_settings():
@@ -2307,13 +3117,42 @@ class SettingsBody(BaseModel):
     openai_api_key: Optional[str] = None
     anthropic_api_key: Optional[str] = None
     llm_provider: Optional[str] = None  # "openai" or "anthropic"
+    # Project metadata storage
+    metadata_backend: Optional[str] = None  # "json", "sqlite" or "journal"
+    # Background job worker pools
+    job_workers_remote: Optional[int] = None  # concurrent provider jobs (uploads/polling)
+    job_workers_ffmpeg: Optional[int] = None  # concurrent local ffmpeg stages
+    provider_concurrency: Optional[Dict[str, int]] = None  # shots in flight per provider in scene batches
+    # API rate limits per provider: {"replicate": {"requests_per_second": 10, "burst": 20, "max_in_flight": 16}}
+    provider_rate_limits: Optional[Dict[str, Dict[str, float]]] = None
+    # Pooled HTTP sessions: connections kept per host (overrides per host name) and timeouts in seconds
+    http_pool_size: Optional[int] = None
+    http_pool_sizes: Optional[Dict[str, int]] = None
+    http_connect_timeout: Optional[float] = None
+    http_read_timeout: Optional[float] = None
+    # Status polls: first check after poll_initial_interval, growing to poll_max_interval (seconds)
+    poll_initial_interval: Optional[float] = None
+    poll_max_interval: Optional[float] = None
+    # Completion webhooks: public base URL of this backend (enables them), signing secrets
+    # ("whsec_..."; Replicate's is fetched with the API token if unset) and the fallback poll interval
+    webhook_base_url: Optional[str] = None
+    replicate_webhook_secret: Optional[str] = None
+    wavespeed_webhook_secret: Optional[str] = None
+    webhook_fallback_interval: Optional[float] = None
+    # Input files larger than this (bytes) are uploaded to the provider instead of sent as base64
+    upload_inline_max_bytes: Optional[int] = None
 
 
 @app.post("/settings")
 def api_set_settings(body: SettingsBody):
+    if body.metadata_backend and body.metadata_backend.lower() not in METADATA_BACKENDS:
+        return {"status": "error", "detail": f"Unknown metadata backend: {body.metadata_backend} (expected one of {', '.join(METADATA_BACKENDS)})"}
     current = read_settings()
     current.update({k: v for k, v in body.model_dump().items() if v is not None})
     write_settings(current)
+    if body.metadata_backend:
+        configure_metadata_backend(body.metadata_backend)
+    _configure_job_pools(current)
     return {"status": "ok"}
 
 
@@ -2355,17 +3194,14 @@ def api_reveal_file(body: RevealFileRequest):
 # Last frame info for a shot
 @app.get("/storage/{project_id}/scenes/{scene_id}/shots/{shot_id}/last-frame")
 def api_last_frame(project_id: str, scene_id: str, shot_id: str):
-    scene = get_scene(project_id, scene_id)
-    if not scene:
+    sh = get_shot(project_id, shot_id, scene_id)
+    if not sh:
         return {"status": "not_found"}
-    for sh in scene.get("shots", []):
-        if sh.get("shot_id") == shot_id:
-            path = sh.get("last_frame_path")
-            if not path:
-                return {"status": "not_found"}
-            rel = path.replace("project_data/", "")
-            return {"status": "ok", "path": path, "url": f"/files/{rel}"}
-    return {"status": "not_found"}
+    path = sh.get("last_frame_path")
+    if not path:
+        return {"status": "not_found"}
+    rel = path.replace("project_data/", "")
+    return {"status": "ok", "path": path, "url": f"/files/{rel}"}
 
 
 class OpticalFlowRequest(BaseModel):
@@ -2387,9 +3223,8 @@ async def api_optical_flow(req: OpticalFlowRequest):
     if not scene:
         return {"status": "error", "detail": "Scene not found"}
     
-    shots = scene.get("shots", [])
-    shot_a = next((s for s in shots if s["shot_id"] == req.shot_a_id), None)
-    shot_b = next((s for s in shots if s["shot_id"] == req.shot_b_id), None)
+    shot_a = get_shot(req.project_id, req.shot_a_id, req.scene_id)
+    shot_b = get_shot(req.project_id, req.shot_b_id, req.scene_id)
     
     if not shot_a or not shot_b:
         return {"status": "error", "detail": "Shots not found"}
@@ -2432,63 +3267,58 @@ async def api_optical_flow(req: OpticalFlowRequest):
             "path": rel_path,
             "url": f"/files/{req.project_id}/scenes/{req.scene_id}/shots/{output_filename}"
         }
-        add_media(req.project_id, media_entry)
-        
-        # Add frames to media library too
-        add_media(req.project_id, {"id": merged_first.name, "type": "image", "path": rel_first, "url": f"/files/{req.project_id}/scenes/{req.scene_id}/shots/{merged_first.name}"})
-        add_media(req.project_id, {"id": merged_last.name, "type": "image", "path": rel_last, "url": f"/files/{req.project_id}/scenes/{req.scene_id}/shots/{merged_last.name}"})
-        
-        # If replace_shots is True, replace the two shots with the merged one
-        # NOTE: Original clips remain in media library, only removed from timeline
-        if req.replace_shots:
-            # Get combined duration
-            duration_a = shot_a.get("duration", 8)
-            duration_b = shot_b.get("duration", 8)
-            combined_duration = duration_a + duration_b + (req.transition_frames / 24)
-            
-            # Create merged shot metadata
-            merged_shot = {
-                "shot_id": f"{req.shot_a_id}_merged_{req.shot_b_id}",
-                "prompt": f"Merged: {shot_a.get('prompt', '')} → {shot_b.get('prompt', '')}",
-                "model": "optical_flow_merge",
-                "provider": "ffmpeg",
-                "duration": int(combined_duration),
-                "file_path": rel_path,
-                "first_frame_path": rel_first,
-                "last_frame_path": rel_last,
-            }
+        # Media entries and the timeline edit are committed together
+        with project_transaction(req.project_id) as data:
+            add_media(req.project_id, media_entry)
+        
+            # Add frames to media library too
+            add_media(req.project_id, {"id": merged_first.name, "type": "image", "path": rel_first, "url": f"/files/{req.project_id}/scenes/{req.scene_id}/shots/{merged_first.name}"})
+            add_media(req.project_id, {"id": merged_last.name, "type": "image", "path": rel_last, "url": f"/files/{req.project_id}/scenes/{req.scene_id}/shots/{merged_last.name}"})
+        
+            # If replace_shots is True, replace the two shots with the merged one
+            # NOTE: Original clips remain in media library, only removed from timeline
+            if req.replace_shots:
+                # Get combined duration
+                duration_a = shot_a.get("duration", 8)
+                duration_b = shot_b.get("duration", 8)
+                combined_duration = duration_a + duration_b + (req.transition_frames / 24)
             
-            # Update scene: remove shot_a and shot_b, insert merged shot at shot_a's position
-            meta_path = PROJECT_DATA_DIR / req.project_id / "metadata.json"
-            with open(meta_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+                # Create merged shot metadata
+                merged_shot = {
+                    "shot_id": f"{req.shot_a_id}_merged_{req.shot_b_id}",
+                    "prompt": f"Merged: {shot_a.get('prompt', '')} → {shot_b.get('prompt', '')}",
+                    "model": "optical_flow_merge",
+                    "provider": "ffmpeg",
+                    "duration": int(combined_duration),
+                    "file_path": rel_path,
+                    "first_frame_path": rel_first,
+                    "last_frame_path": rel_last,
+                }
             
-            for s in data.get("scenes", []):
-                if s.get("scene_id") == req.scene_id:
-                    shots_list = s.get("shots", [])
-                    # Find indices
-                    idx_a = next((i for i, sh in enumerate(shots_list) if sh["shot_id"] == req.shot_a_id), -1)
-                    idx_b = next((i for i, sh in enumerate(shots_list) if sh["shot_id"] == req.shot_b_id), -1)
-                    
-                    if idx_a != -1 and idx_b != -1:
-                        # Remove both shots
-                        if idx_a < idx_b:
-                            shots_list.pop(idx_b)
-                            shots_list.pop(idx_a)
-                            insert_idx = idx_a
-                        else:
-                            shots_list.pop(idx_a)
-                            shots_list.pop(idx_b)
-                            insert_idx = idx_b
-                        
-                        # Insert merged shot
-                        shots_list.insert(insert_idx, merged_shot)
-                        s["shots"] = shots_list
+                # Update scene: remove shot_a and shot_b, insert merged shot at shot_a's position
+                for s in data.get("scenes", []):
+                    if s.get("scene_id") == req.scene_id:
+                        shots_list = s.get("shots", [])
+                        # Find indices
+                        idx_a = next((i for i, sh in enumerate(shots_list) if sh["shot_id"] == req.shot_a_id), -1)
+                        idx_b = next((i for i, sh in enumerate(shots_list) if sh["shot_id"] == req.shot_b_id), -1)
+                
+                        if idx_a != -1 and idx_b != -1:
+                            # Remove both shots
+                            if idx_a < idx_b:
+                                shots_list.pop(idx_b)
+                                shots_list.pop(idx_a)
+                                insert_idx = idx_a
+                            else:
+                                shots_list.pop(idx_a)
+                                shots_list.pop(idx_b)
+                                insert_idx = idx_b
                     
-                    break
-            
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+                            # Insert merged shot
+                            shots_list.insert(insert_idx, merged_shot)
+                            s["shots"] = shots_list
+                
+                        break
         
         return {
             "status": "ok",
@@ -2519,8 +3349,8 @@ class CharacterUpdate(BaseModel):
 
 
 @app.get("/storage/{project_id}/characters")
-def api_list_characters(project_id: str):
-    return {"characters": list_characters(project_id)}
+def api_list_characters(project_id: str, request: Request):
+    return _etag_response(request, project_id, lambda: {"characters": list_characters(project_id)})
 
 
 @app.post("/storage/{project_id}/characters")
@@ -2535,6 +3365,7 @@ def api_update_character(project_id: str, character_id: str, body: CharacterUpda
     existing = get_character(project_id, character_id)
     if not existing:
         return {"status": "not_found"}
+    existing = dict(existing)
     existing.update(body.model_dump(exclude_none=True))
     upsert_character(project_id, existing)
     return {"status": "ok", "character": existing}
@@ -2584,7 +3415,7 @@ def api_fetch_replicate_schema(req: CustomModelFetchRequest):
         schema_url = f"https://replicate.com/{owner}/{name}/api/schema"
         print(f"[CUSTOM MODEL] Fetching schema from: {schema_url}")
         
-        response = requests.get(schema_url, timeout=10)
+        response = http_sessions.request("replicate", "GET", schema_url, timeout=10)
         response.raise_for_status()
         schema = response.json()
         
@@ -0,0 +1,145 @@
+"""
+JSON serialization used for metadata snapshots, SQLite rows, the metadata
+journal and the job store (the last three always compact and uncompressed).
+
+Defaults to compact separators and orjson when it is importable. Configure
+with environment variables:
+
+- OPENFILMAI_JSON_PRETTY=1   indent=2 output (the old format; larger, slower)
+- OPENFILMAI_JSON_ORJSON=0   never use orjson even if installed
+- OPENFILMAI_METADATA_GZIP=1 gzip metadata snapshots (metadata.json.gz)
+
+Readers accept every variant, so settings can be flipped at any time.
+"""
+
+from pathlib import Path
+import gzip
+import json
+import os
+import tempfile
+from typing import Any, Optional, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+# Read once: os.umask can only be queried by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: Path) -> int:
+    """Permission bits of `path`, or those a new file would get under the umask."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class JsonCodec:
+    def __init__(self, pretty: bool = False, use_orjson: bool = True, gzip_level: Optional[int] = None):
+        self.pretty = pretty
+        self.use_orjson = use_orjson and orjson is not None
+        # None disables compression; 1-9 trade write time for size
+        self.gzip_level = gzip_level
+
+    @property
+    def name(self) -> str:
+        parts = ["orjson" if self.use_orjson else "json", "pretty" if self.pretty else "compact"]
+        if self.gzip_level is not None:
+            parts.append(f"gzip{self.gzip_level}")
+        return "+".join(parts)
+
+    def without_gzip(self) -> "JsonCodec":
+        if self.gzip_level is None:
+            return self
+        return JsonCodec(pretty=self.pretty, use_orjson=self.use_orjson)
+
+    def dumps(self, obj: Any) -> str:
+        """Serialize to text (never compressed)."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if self.pretty else 0).decode("utf-8")
+            except TypeError:
+                # Non-str keys, >64-bit ints, ...: the stdlib encoder copes
+                pass
+        if self.pretty:
+            return json.dumps(obj, indent=2, ensure_ascii=False)
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        if self.use_orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def encode(self, obj: Any) -> bytes:
+        """File payload: dumps(), gzipped when enabled."""
+        payload = self.dumps(obj).encode("utf-8")
+        if self.gzip_level is not None:
+            payload = gzip.compress(payload, compresslevel=self.gzip_level, mtime=0)
+        return payload
+
+    def decode(self, payload: bytes) -> Any:
+        if payload[:2] == GZIP_MAGIC:
+            payload = gzip.decompress(payload)
+        return self.loads(payload)
+
+    def read_file(self, path: Path) -> Any:
+        with open(path, "rb") as f:
+            return self.decode(f.read())
+
+    def write_file(self, path: Path, obj: Any) -> None:
+        """Atomic write: temp file in the same directory, fsync, os.replace."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = self.encode(obj)
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file 0600; keep the mode the file had (or would get)
+            os.chmod(tmp, _file_mode(path))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+_codec: Optional[JsonCodec] = None
+_row_codec: Optional[JsonCodec] = None
+
+
+def get_codec() -> JsonCodec:
+    """Process-wide codec for metadata snapshots."""
+    global _codec
+    if _codec is None:
+        _codec = JsonCodec(
+            pretty=_env_flag("OPENFILMAI_JSON_PRETTY", False),
+            use_orjson=_env_flag("OPENFILMAI_JSON_ORJSON", True),
+            gzip_level=3 if _env_flag("OPENFILMAI_METADATA_GZIP", False) else None,
+        )
+    return _codec
+
+
+def get_row_codec() -> JsonCodec:
+    """Compact, uncompressed codec for records: SQLite rows, journal lines, the job store."""
+    global _row_codec
+    if _row_codec is None:
+        _row_codec = JsonCodec(pretty=False, use_orjson=get_codec().use_orjson)
+    return _row_codec
@@ -1,29 +1,305 @@
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-import json
-from typing import Any, Dict, List, Optional
+import itertools
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import time
 
+from backend.storage.metadata_index import MetadataIndex
+from backend.storage.metadata_store import MetadataStore, create_metadata_store
+
+
+# Active metadata backend ("json" | "sqlite" | "journal"), resolved lazily from the
+# OPENFILMAI_METADATA_BACKEND env var or the `metadata_backend` setting.
+_metadata_store: Optional[MetadataStore] = None
+
+
+def get_metadata_store() -> MetadataStore:
+    global _metadata_store
+    if _metadata_store is None:
+        name = os.environ.get("OPENFILMAI_METADATA_BACKEND")
+        if not name:
+            from backend.storage.settings import read_settings
+            name = read_settings().get("metadata_backend")
+        _metadata_store = create_metadata_store(name)
+    return _metadata_store
+
+
+def configure_metadata_backend(name: str) -> MetadataStore:
+    """Switch backends, carrying existing projects over to the new one. Raises ValueError for unknown names."""
+    global _metadata_store
+    old = get_metadata_store()
+    new = create_metadata_store(name)
+    if new.name != old.name:
+        root = Path("project_data")
+        projects = sorted(p.name for p in root.iterdir() if p.is_dir() and not p.name.startswith("_")) if root.exists() else []
+        # Writers hold their project's lock, so none can land in the old store between copy and swap
+        with ExitStack() as locks:
+            for project_id in projects:
+                locks.enter_context(project_lock(project_id))
+            old.flush()
+            for project_id in projects:
+                if old.exists(project_id):
+                    new.write(project_id, old.read(project_id))
+            _metadata_store = new
+            invalidate_metadata_cache()
+    return _metadata_store
+
+
+# In-process metadata cache: project_id -> {"data": parsed document, "signature": store signature}.
+# Reads are served from the parsed object while the backing file's mtime/size
+# are unchanged, so external edits are still picked up. Writes go through to
+# the store and replace the cached object. Returned documents are shared, so
+# callers that mutate them must write them back (the existing pattern).
+_metadata_cache: Dict[str, Dict[str, Any]] = {}
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0, "writes": 0}
+
+# Content revisions: every document that enters the cache (a write, or a reload
+# after an external edit) gets the next number. The process token keeps
+# revisions from an earlier run from ever matching.
+_revision_counter = itertools.count(1)
+_process_token = os.urandom(4).hex()
+
+
+def invalidate_metadata_cache(project_id: Optional[str] = None) -> None:
+    with _cache_lock:
+        if project_id is None:
+            _metadata_cache.clear()
+        else:
+            _metadata_cache.pop(project_id, None)
+
+
+def metadata_cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["projects"] = len(_metadata_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
 
 def ensure_project(project_id: str) -> Path:
     base = Path("project_data") / project_id
     (base / "media").mkdir(parents=True, exist_ok=True)
-    meta = base / "metadata.json"
-    if not meta.exists():
-        with open(meta, "w", encoding="utf-8") as f:
-            json.dump({"project_id": project_id, "scenes": [], "shots": [], "characters": [], "media": []}, f, indent=2)
+    get_metadata_store().ensure(project_id)
     return base
 
 
 def read_metadata(project_id: str) -> Dict[str, Any]:
-    base = ensure_project(project_id)
-    with open(base / "metadata.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    # Inside project_transaction, reads see the pending (uncommitted) document
+    pending = _open_transactions().get(project_id)
+    if pending is not None:
+        return pending
+    store = get_metadata_store()
+    with _cache_lock:
+        entry = _metadata_cache.get(project_id)
+    if entry is not None:
+        if store.signature(project_id) == entry["signature"]:
+            with _cache_lock:
+                _cache_stats["hits"] += 1
+            return entry["data"]
+        with _cache_lock:
+            _cache_stats["invalidations"] += 1
+    ensure_project(project_id)
+    # Take the signature before reading so a concurrent external write forces a reload next time
+    signature = store.signature(project_id)
+    data = store.read(project_id)
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+        current = _metadata_cache.get(project_id)
+        if current is not None and current["data"] is data:
+            # The store handed back the cached document under a new signature (a
+            # journal compaction rewrote the files): same content, same revision
+            current["signature"] = signature
+        else:
+            _metadata_cache[project_id] = {"data": data, "signature": signature, "revision": next(_revision_counter)}
+    return data
+
+
+def project_revision(project_id: str) -> str:
+    """
+    Opaque version of the project's current content, e.g. for HTTP ETags.
+    Changes whenever the document does (including external edits to the file).
+    """
+    in_transaction = project_id in _open_transactions()
+    while True:
+        # Revalidates the cache against the store, so external edits bump the revision
+        data = read_metadata(project_id)
+        with _cache_lock:
+            entry = _metadata_cache.get(project_id)
+            if in_transaction:
+                # Report the committed (cached) state, not the pending document
+                return f"{_process_token}-{entry['revision'] if entry else 0}"
+            if entry is not None and entry["data"] is data:
+                return f"{_process_token}-{entry['revision']}"
+        # A concurrent write replaced the entry between the two steps; retry
+
+
+def project_index(project_id: str) -> MetadataIndex:
+    """
+    Lookup indexes for the current document. Built lazily once per published
+    document and dropped with it on the next write. Inside a project_transaction
+    the pending document's index is kept until the next change made through a
+    storage helper (any helper entering or leaving the transaction drops it).
+    """
+    data = read_metadata(project_id)
+    if project_id in _open_transactions():
+        indexes = _open_indexes()
+        index = indexes.get(project_id)
+        if index is None:
+            index = indexes[project_id] = MetadataIndex(data)
+        return index
+    with _cache_lock:
+        entry = _metadata_cache.get(project_id)
+        if entry is not None and entry["data"] is data and entry.get("index") is not None:
+            return entry["index"]
+    index = MetadataIndex(data)
+    with _cache_lock:
+        entry = _metadata_cache.get(project_id)
+        if entry is not None and entry["data"] is data:
+            entry["index"] = index
+    return index
 
 
 def write_metadata(project_id: str, data: Dict[str, Any]) -> None:
-    base = ensure_project(project_id)
-    with open(base / "metadata.json", "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    pending = _open_transactions().get(project_id)
+    if pending is not None:
+        # Deferred to the enclosing project_transaction's commit
+        _open_indexes().pop(project_id, None)
+        if data is not pending:
+            pending.clear()
+            pending.update(data)
+        return
+    ensure_project(project_id)
+    with project_lock(project_id):
+        # Resolved under the lock so a backend switch in progress is waited out
+        store = get_metadata_store()
+        try:
+            store.write(project_id, data)
+        except Exception:
+            invalidate_metadata_cache(project_id)
+            raise
+        with _cache_lock:
+            _cache_stats["writes"] += 1
+            _metadata_cache[project_id] = {"data": data, "signature": store.signature(project_id), "revision": next(_revision_counter)}
+
+
+# Per-project locks serialising read-modify-write cycles across request
+# handlers and background job threads. Re-entrant so helpers can nest.
+_project_locks: Dict[str, threading.RLock] = {}
+_project_locks_guard = threading.Lock()
+
+
+def project_lock(project_id: str) -> threading.RLock:
+    with _project_locks_guard:
+        lock = _project_locks.get(project_id)
+        if lock is None:
+            lock = _project_locks[project_id] = threading.RLock()
+        return lock
+
+
+def read_metadata_for_update(project_id: str) -> Dict[str, Any]:
+    """
+    Private copy of the project document for a read-modify-write cycle.
+    The cached document is shared with concurrent readers, so mutations are
+    made on a copy and published by write_metadata. Call with project_lock held.
+    """
+    # pickle round-trip is ~3x faster than copy.deepcopy for large media lists
+    return pickle.loads(pickle.dumps(read_metadata(project_id), pickle.HIGHEST_PROTOCOL))
+
+
+_transaction_state = threading.local()
+
+
+def _open_transactions() -> Dict[str, Dict[str, Any]]:
+    open_tx = getattr(_transaction_state, "projects", None)
+    if open_tx is None:
+        open_tx = _transaction_state.projects = {}
+    return open_tx
+
+
+def _open_indexes() -> Dict[str, MetadataIndex]:
+    indexes = getattr(_transaction_state, "indexes", None)
+    if indexes is None:
+        indexes = _transaction_state.indexes = {}
+    return indexes
+
+
+def _on_abort(project_id: str, undo: Callable[[], None]) -> None:
+    """Run `undo` if the open project_transaction is discarded (side effects outside the document)."""
+    _transaction_state.undo[project_id].append(undo)
+
+
+@contextmanager
+def project_transaction(project_id: str) -> Iterator[Dict[str, Any]]:
+    """
+    Unit of work over one project's metadata:
+
+        with project_transaction(project_id) as meta:
+            meta["media"].append(item)
+            add_shot(project_id, scene_id, shot)  # joins, no extra write
+
+    Holds project_lock, loads a private copy once and writes it back once on
+    clean exit (skipped if nothing changed). An exception discards every
+    change, and reverts any file changes helpers registered with _on_abort.
+    The storage helpers below run inside an open transaction on the same
+    thread, so any number of them coalesce into a single write.
+
+    project_index() lookups made inside the block share one index of the
+    pending document, rebuilt after the next helper that joins the
+    transaction. Edits made directly to `meta` show up in lookups once such
+    a helper has run (or a nested `with project_transaction(...)` is entered).
+    """
+    open_tx = _open_transactions()
+    indexes = _open_indexes()
+    if project_id in open_tx:
+        # Joining callers may change the document
+        indexes.pop(project_id, None)
+        try:
+            yield open_tx[project_id]
+        finally:
+            indexes.pop(project_id, None)
+        return
+    with project_lock(project_id):
+        snapshot = pickle.dumps(read_metadata(project_id), pickle.HIGHEST_PROTOCOL)
+        meta = pickle.loads(snapshot)
+        if getattr(_transaction_state, "undo", None) is None:
+            _transaction_state.undo = {}
+        undo = _transaction_state.undo[project_id] = []
+        open_tx[project_id] = meta
+        try:
+            try:
+                yield meta
+            finally:
+                del open_tx[project_id]
+                indexes.pop(project_id, None)
+                del _transaction_state.undo[project_id]
+            if pickle.dumps(meta, pickle.HIGHEST_PROTOCOL) != snapshot:
+                write_metadata(project_id, meta)
+        except BaseException:
+            for action in reversed(undo):
+                try:
+                    action()
+                except Exception as e:
+                    print(f"[STORAGE] Warning: Could not undo a change to {project_id}: {e}")
+            raise
+
+
+def import_metadata_json(project_id: str, source: Optional[Path] = None) -> Dict[str, Any]:
+    """Load a metadata.json document into the active backend (one-shot import)."""
+    ensure_project(project_id)
+    with project_lock(project_id):
+        invalidate_metadata_cache(project_id)
+        return get_metadata_store().import_json(project_id, source)
+
+
+def export_metadata_json(project_id: str, dest: Optional[Path] = None) -> Path:
+    """Write the active backend's document out as JSON; returns the file path."""
+    ensure_project(project_id)
+    return get_metadata_store().export_json(project_id, dest)
 
 
 # Scenes helpers (metadata.json structure per blueprint)
@@ -33,44 +309,47 @@ def list_scenes(project_id: str) -> List[Dict[str, Any]]:
 
 
 def get_scene(project_id: str, scene_id: str) -> Optional[Dict[str, Any]]:
-    for scene in list_scenes(project_id):
-        if scene.get("scene_id") == scene_id:
-            return scene
-    return None
+    return project_index(project_id).scene_by_id.get(scene_id)
+
+
+def get_shot(project_id: str, shot_id: str, scene_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    return project_index(project_id).shot(shot_id, scene_id)
+
+
+def get_shot_scene(project_id: str, shot_id: str) -> Optional[Dict[str, Any]]:
+    """Scene containing the given shot."""
+    return project_index(project_id).scene_of_shot(shot_id)
 
 
 def add_scene(project_id: str, scene_id: str, title: str) -> Dict[str, Any]:
-    meta = read_metadata(project_id)
-    scenes = meta.get("scenes", [])
-    if any(s.get("scene_id") == scene_id for s in scenes):
-        raise ValueError("Scene already exists")
-    scene = {"scene_id": scene_id, "title": title, "shots": [], "audio_tracks": {}}
-    scenes.append(scene)
-    meta["scenes"] = scenes
-    write_metadata(project_id, meta)
-    return scene
+    with project_transaction(project_id) as meta:
+        scenes = meta.get("scenes", [])
+        if any(s.get("scene_id") == scene_id for s in scenes):
+            raise ValueError("Scene already exists")
+        scene = {"scene_id": scene_id, "title": title, "shots": [], "audio_tracks": {}}
+        scenes.append(scene)
+        meta["scenes"] = scenes
+        return scene
 
 
 def add_shot(project_id: str, scene_id: str, shot: Dict[str, Any]) -> Dict[str, Any]:
-    meta = read_metadata(project_id)
-    for s in meta.get("scenes", []):
-        if s.get("scene_id") == scene_id:
-            s.setdefault("shots", []).append(shot)
-            write_metadata(project_id, meta)
-            return shot
-    raise ValueError("Scene not found")
+    with project_transaction(project_id) as meta:
+        for s in meta.get("scenes", []):
+            if s.get("scene_id") == scene_id:
+                s.setdefault("shots", []).append(shot)
+                return shot
+        raise ValueError("Scene not found")
 
 
 def clear_scene_shots(project_id: str, scene_id: str) -> int:
     """Clear all shots from a scene. Returns the number of shots removed."""
-    meta = read_metadata(project_id)
-    for s in meta.get("scenes", []):
-        if s.get("scene_id") == scene_id:
-            count = len(s.get("shots", []))
-            s["shots"] = []
-            write_metadata(project_id, meta)
-            return count
-    raise ValueError("Scene not found")
+    with project_transaction(project_id) as meta:
+        for s in meta.get("scenes", []):
+            if s.get("scene_id") == scene_id:
+                count = len(s.get("shots", []))
+                s["shots"] = []
+                return count
+        raise ValueError("Scene not found")
 
 
 def next_shot_id(scene_id: str) -> str:
@@ -90,166 +369,161 @@ def ensure_scene_dirs(project_id: str, scene_id: str) -> Dict[str, Path]:
 
 # Media helpers
 def list_media(project_id: str, include_archived: bool = False) -> List[Dict[str, Any]]:
-    meta = read_metadata(project_id)
-    all_media = meta.get("media", [])
-    if include_archived:
-        return all_media
     # Filter out archived items by default
-    return [m for m in all_media if not m.get("archived", False)]
+    return project_index(project_id).query_media(archived=None if include_archived else False)
+
+
+def query_media(
+    project_id: str,
+    media_type: Optional[str] = None,
+    source: Optional[str] = None,
+    archived: Optional[bool] = False,
+    since: Optional[float] = None,
+    sort: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Filtered / sorted media list served from the project index (see MetadataIndex.query_media)."""
+    return project_index(project_id).query_media(media_type, source, archived, since, sort)
+
+
+def backfill_media_timestamps(project_id: str) -> int:
+    """Give every media item a `timestamp` (from a numeric id prefix, else now). Returns items fixed."""
+    import re
+    if all("timestamp" in item for item in read_metadata(project_id).get("media", [])):
+        return 0
+    fixed = 0
+    with project_transaction(project_id) as meta:
+        for item in meta.get("media", []):
+            if "timestamp" not in item:
+                # Try to extract timestamp from ID, or use current time
+                match = re.match(r'^(\d{10,13})', str(item.get("id", "")))
+                item["timestamp"] = int(match.group(1)) if match else int(time.time())
+                fixed += 1
+    return fixed
+
+
+def get_media(project_id: str, media_id: str, include_archived: bool = False) -> Optional[Dict[str, Any]]:
+    return project_index(project_id).media(media_id, include_archived)
+
+
+def get_media_by_path(project_id: str, path: str) -> Optional[Dict[str, Any]]:
+    """Media item stored at `path` (with or without the project_data/ prefix)."""
+    return project_index(project_id).media_at(path)
+
+
+def resolve_media(project_id: str, media_ids: List[str], include_archived: bool = False) -> List[Dict[str, Any]]:
+    return project_index(project_id).resolve_media(media_ids, include_archived)
 
 
 def add_media(project_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
     import time as time_module
     import os
-    meta = read_metadata(project_id)
-    media = meta.get("media", [])
-
-    # Check for duplicate IDs and use timestamp prefix to ensure uniqueness
-    original_id = item.get("id", "")
-    if original_id:
-        existing_ids = {m.get("id") for m in media}
-        if original_id in existing_ids:
-            # Use timestamp to create unique ID (avoids spaces/parentheses issues)
-            ts = int(time_module.time())
-            base_name, ext = original_id.rsplit(".", 1) if "." in original_id else (original_id, "")
-            new_id = f"{ts}_{base_name}.{ext}" if ext else f"{ts}_{base_name}"
-
-            # Try to rename the actual file on disk if it exists
-            if "path" in item:
-                old_path = Path(item["path"].replace("project_data/", ""))
-                full_old_path = Path("project_data") / old_path
-                if full_old_path.exists():
-                    new_filename = new_id
-                    new_path = full_old_path.parent / new_filename
-                    try:
-                        full_old_path.rename(new_path)
-                        rel_new_path = str(new_path.relative_to(Path("project_data")))
-                        item["path"] = f"project_data/{rel_new_path}"
-                        item["url"] = f"/files/{rel_new_path}"
-                    except Exception as e:
-                        print(f"[STORAGE] Warning: Could not rename file {full_old_path} -> {new_path}: {e}")
-
-            item["id"] = new_id
-            # Update path/url if not already updated by rename
-            if "path" in item and original_id in item["path"]:
-                item["path"] = item["path"].replace(original_id, new_id)
-            if "url" in item and original_id in item["url"]:
-                item["url"] = item["url"].replace(original_id, new_id)
+    with project_transaction(project_id) as meta:
+        media = meta.get("media", [])
+
+        # Check for duplicate IDs and use timestamp prefix to ensure uniqueness
+        original_id = item.get("id", "")
+        if original_id:
+            existing_ids = {m.get("id") for m in media}
+            if original_id in existing_ids:
+                # Use timestamp to create unique ID (avoids spaces/parentheses issues)
+                ts = int(time_module.time())
+                base_name, ext = original_id.rsplit(".", 1) if "." in original_id else (original_id, "")
+                new_id = f"{ts}_{base_name}.{ext}" if ext else f"{ts}_{base_name}"
+
+                # Try to rename the actual file on disk if it exists
+                if "path" in item:
+                    old_path = Path(item["path"].replace("project_data/", ""))
+                    full_old_path = Path("project_data") / old_path
+                    if full_old_path.exists():
+                        new_filename = new_id
+                        new_path = full_old_path.parent / new_filename
+                        try:
+                            full_old_path.rename(new_path)
+                            # The document still names the old path if the transaction is discarded
+                            _on_abort(project_id, lambda: new_path.rename(full_old_path))
+                            rel_new_path = str(new_path.relative_to(Path("project_data")))
+                            item["path"] = f"project_data/{rel_new_path}"
+                            item["url"] = f"/files/{rel_new_path}"
+                        except Exception as e:
+                            print(f"[STORAGE] Warning: Could not rename file {full_old_path} -> {new_path}: {e}")
+
+                item["id"] = new_id
+                # Update path/url if not already updated by rename
+                if "path" in item and original_id in item["path"]:
+                    item["path"] = item["path"].replace(original_id, new_id)
+                if "url" in item and original_id in item["url"]:
+                    item["url"] = item["url"].replace(original_id, new_id)
     
-    # Auto-tag source if not specified
-    if "source" not in item:
-        if "_first.png" in item.get("id", "") or "_last.png" in item.get("id", ""):
-            item["source"] = "extracted"
-        else:
-            item["source"] = "generated"
-    # Add timestamp for reliable sorting
-    if "timestamp" not in item:
-        item["timestamp"] = int(time_module.time())
-    media.append(item)
-    meta["media"] = media
-    write_metadata(project_id, meta)
-    return item
+        # Auto-tag source if not specified
+        if "source" not in item:
+            if "_first.png" in item.get("id", "") or "_last.png" in item.get("id", ""):
+                item["source"] = "extracted"
+            else:
+                item["source"] = "generated"
+        # Add timestamp for reliable sorting
+        if "timestamp" not in item:
+            item["timestamp"] = int(time_module.time())
+        media.append(item)
+        meta["media"] = media
+        return item
+
+
+def media_references(project_id: str, media_id: str) -> List[Dict[str, Any]]:
+    """Characters and scenes that reference a media item (each with a `reason` string)."""
+    return project_index(project_id).references_to(media_id)
 
 
 def archive_media(project_id: str, media_id: str, archived: bool = True) -> Dict[str, Any]:
     """Archive or unarchive a media item by ID. Returns dict with success status and optional error."""
-    meta = read_metadata(project_id)
-
-    # Check if this media is used as a reference image (character or scene-specific)
-    if archived:  # Only check when archiving, not unarchiving
-        # Check global character references
-        characters = meta.get("characters", [])
-        for char in characters:
-            ref_images = char.get("reference_image_ids", [])
-            if media_id in ref_images:
-                return {
-                    "success": False,
-                    "error": f"Cannot archive: this image is used as a reference for character '{char.get('name', 'Unknown')}'. Remove it from the character first."
-                }
-
-        # Check scene-specific references (cast scene_reference_ids and master_image_ids)
-        scenes = meta.get("scenes", [])
-        for scene in scenes:
-            # Check master images
-            master_ids = scene.get("master_image_ids", [])
-            if media_id in master_ids:
-                return {
-                    "success": False,
-                    "error": f"Cannot archive: this image is used as a master reference for scene '{scene.get('title', scene.get('scene_id', 'Unknown'))}'. Remove it from the scene first."
-                }
-
-            # Check scene-specific character refs
-            cast = scene.get("cast", [])
-            for cast_member in cast:
-                scene_refs = cast_member.get("scene_reference_ids", [])
-                if media_id in scene_refs:
-                    char_id = cast_member.get("character_id", "Unknown")
-                    # Try to get character name
-                    char = next((c for c in characters if c.get("character_id") == char_id), None)
-                    char_name = char.get("name", char_id) if char else char_id
-                    return {
-                        "success": False,
-                        "error": f"Cannot archive: this image is used as a scene-specific reference for '{char_name}' in scene '{scene.get('title', scene.get('scene_id', 'Unknown'))}'. Remove it from the scene cast first."
-                    }
-    
-    media = meta.get("media", [])
-    for item in media:
-        if item.get("id") == media_id:
-            item["archived"] = archived
-            write_metadata(project_id, meta)
-            return {"success": True}
-    return {"success": False, "error": "Media item not found"}
+    with project_lock(project_id):
+        # Check if this media is used as a reference image (character or scene-specific)
+        if archived:  # Only check when archiving, not unarchiving
+            refs = media_references(project_id, media_id)
+            if refs:
+                ref = refs[0]
+                if ref["type"] == "character":
+                    error = f"Cannot archive: this image is used as a reference for character '{ref['character_name']}'. Remove it from the character first."
+                elif ref["type"] == "scene_master":
+                    error = f"Cannot archive: this image is used as a master reference for scene '{ref['scene_title']}'. Remove it from the scene first."
+                else:
+                    error = f"Cannot archive: this image is used as a scene-specific reference for '{ref['character_name']}' in scene '{ref['scene_title']}'. Remove it from the scene cast first."
+                return {"success": False, "error": error}
+
+        with project_transaction(project_id) as meta:
+            media = meta.get("media", [])
+            for item in media:
+                if item.get("id") == media_id:
+                    item["archived"] = archived
+                    return {"success": True}
+            return {"success": False, "error": "Media item not found"}
 
 
 def bulk_archive_media(project_id: str, media_ids: List[str], archived: bool = True) -> Dict[str, Any]:
     """Archive or unarchive multiple media items. Returns dict with count and skipped items."""
-    meta = read_metadata(project_id)
-
-    # Build set of media IDs that are protected (character refs + scene refs + master images)
-    protected_ids = {}  # Maps ID to reason string
-    if archived:  # Only check when archiving
-        characters = meta.get("characters", [])
-        scenes = meta.get("scenes", [])
-
-        # Global character references
-        for char in characters:
-            ref_images = char.get("reference_image_ids", [])
-            for ref_id in ref_images:
-                protected_ids[ref_id] = f"character ref: {char.get('name', 'Unknown')}"
-
-        # Scene-specific references
-        for scene in scenes:
-            scene_name = scene.get("title", scene.get("scene_id", "Unknown"))
-
-            # Master images
-            for master_id in scene.get("master_image_ids", []):
-                protected_ids[master_id] = f"scene master: {scene_name}"
-
-            # Cast scene refs
-            for cast_member in scene.get("cast", []):
-                char_id = cast_member.get("character_id", "Unknown")
-                char = next((c for c in characters if c.get("character_id") == char_id), None)
-                char_name = char.get("name", char_id) if char else char_id
-                for ref_id in cast_member.get("scene_reference_ids", []):
-                    protected_ids[ref_id] = f"scene ref: {char_name} in {scene_name}"
-
-    media = meta.get("media", [])
-    count = 0
-    skipped = []
-
-    for item in media:
-        item_id = item.get("id")
-        if item_id in media_ids:
-            if item_id in protected_ids:
-                skipped.append({"id": item_id, "reason": protected_ids[item_id]})
-            else:
-                item["archived"] = archived
-                count += 1
-
-    if count > 0:
-        write_metadata(project_id, meta)
-
-    return {"count": count, "skipped": skipped}
+    with project_lock(project_id):
+        # Protected IDs: character refs + scene refs + master images
+        protected_ids = {}  # Maps ID to reason string
+        if archived:  # Only check when archiving
+            index = project_index(project_id)
+            for media_id in media_ids:
+                refs = index.references_to(media_id)
+                if refs:
+                    protected_ids[media_id] = refs[-1]["reason"]
+
+        wanted = set(media_ids)
+        count = 0
+        skipped = []
+        with project_transaction(project_id) as meta:
+            for item in meta.get("media", []):
+                item_id = item.get("id")
+                if item_id in wanted:
+                    if item_id in protected_ids:
+                        skipped.append({"id": item_id, "reason": protected_ids[item_id]})
+                    else:
+                        item["archived"] = archived
+                        count += 1
+
+        return {"count": count, "skipped": skipped}
 
 
 def media_dirs(project_id: str) -> Dict[str, Path]:
@@ -269,36 +543,36 @@ def list_characters(project_id: str) -> List[Dict[str, Any]]:
 
 
 def upsert_character(project_id: str, character: Dict[str, Any]) -> Dict[str, Any]:
-    meta = read_metadata(project_id)
-    chars = meta.get("characters", [])
-    # replace if exists
-    for idx, c in enumerate(chars):
-        if c.get("character_id") == character.get("character_id"):
-            chars[idx] = character
-            break
-    else:
-        chars.append(character)
-    meta["characters"] = chars
-    write_metadata(project_id, meta)
-    return character
+    with project_transaction(project_id) as meta:
+        chars = meta.get("characters", [])
+        # replace if exists
+        for idx, c in enumerate(chars):
+            if c.get("character_id") == character.get("character_id"):
+                chars[idx] = character
+                break
+        else:
+            chars.append(character)
+        meta["characters"] = chars
+        return character
 
 
 def get_character(project_id: str, character_id: str) -> Optional[Dict[str, Any]]:
-    for c in list_characters(project_id):
-        if c.get("character_id") == character_id:
-            return c
-    return None
+    return project_index(project_id).character_by_id.get(character_id)
+
+
+def get_character_by_name(project_id: str, name: str) -> Optional[Dict[str, Any]]:
+    """Case-insensitive lookup by display name."""
+    return project_index(project_id).character_by_name.get((name or "").lower())
 
 
 def delete_character(project_id: str, character_id: str) -> bool:
-    meta = read_metadata(project_id)
-    chars = meta.get("characters", [])
-    new_chars = [c for c in chars if c.get("character_id") != character_id]
-    if len(new_chars) == len(chars):
-        return False
-    meta["characters"] = new_chars
-    write_metadata(project_id, meta)
-    return True
+    with project_transaction(project_id) as meta:
+        chars = meta.get("characters", [])
+        new_chars = [c for c in chars if c.get("character_id") != character_id]
+        if len(new_chars) == len(chars):
+            return False
+        meta["characters"] = new_chars
+        return True
 
 
 
@@ -0,0 +1,190 @@
+"""
+In-memory lookup indexes over a project metadata document.
+
+Built once per loaded document (see files.project_index) and replaced whenever
+a new document is published by write_metadata, so every lookup below is a dict
+hit instead of a scan over `media`, `scenes[].shots` or `characters`. The
+reverse `references` index answers "what uses this media item" (character
+reference images, scene master images and scene-specific cast references).
+"""
+
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Sort keys accepted by query_media (prefix with "-" for descending)
+MEDIA_SORT_KEYS = ("timestamp", "id", "type", "source")
+
+
+class MetadataIndex:
+    def __init__(self, doc: Dict[str, Any]):
+        self.media_by_id: Dict[str, Dict[str, Any]] = {}
+        self.media_by_path: Dict[str, Dict[str, Any]] = {}
+        self.scene_by_id: Dict[str, Dict[str, Any]] = {}
+        # shot_id -> (scene, shot); shot ids are only guaranteed unique per scene
+        self.shot_by_id: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self.shots_by_scene: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.character_by_id: Dict[str, Dict[str, Any]] = {}
+        self.character_by_name: Dict[str, Dict[str, Any]] = {}
+
+        # Media postings (positions into media_items) for filtered listings
+        self.media_items: List[Dict[str, Any]] = list(doc.get("media") or [])
+        self.media_by_type: Dict[Any, List[int]] = {}
+        self.media_by_source: Dict[Any, List[int]] = {}
+        self.media_archived: List[int] = []
+        self.media_active: List[int] = []
+
+        # setdefault everywhere: the first occurrence wins, matching next(...) scans
+        for pos, item in enumerate(self.media_items):
+            if item.get("id"):
+                self.media_by_id.setdefault(item["id"], item)
+            if item.get("path"):
+                self.media_by_path.setdefault(normalize_media_path(item["path"]), item)
+            self.media_by_type.setdefault(item.get("type"), []).append(pos)
+            self.media_by_source.setdefault(item.get("source"), []).append(pos)
+            (self.media_archived if item.get("archived", False) else self.media_active).append(pos)
+        # Timestamp order is only needed by since/sort queries; built on first use
+        self._time_order: Optional[Tuple[List[int], List[float], List[int]]] = None
+        for scene in doc.get("scenes") or []:
+            if scene.get("scene_id"):
+                self.scene_by_id.setdefault(scene["scene_id"], scene)
+            scene_shots = self.shots_by_scene.setdefault(scene.get("scene_id"), {})
+            for shot in scene.get("shots") or []:
+                if shot.get("shot_id"):
+                    self.shot_by_id.setdefault(shot["shot_id"], (scene, shot))
+                    scene_shots.setdefault(shot["shot_id"], shot)
+        for char in doc.get("characters") or []:
+            if char.get("character_id"):
+                self.character_by_id.setdefault(char["character_id"], char)
+            if char.get("name"):
+                self.character_by_name.setdefault(char["name"].lower(), char)
+
+        # media_id -> referrers, in the order the archive checks have always walked them
+        self.references: Dict[str, List[Dict[str, Any]]] = {}
+        for char in doc.get("characters") or []:
+            name = char.get("name", "Unknown")
+            for ref_id in char.get("reference_image_ids", []):
+                self._add_reference(ref_id, {
+                    "type": "character",
+                    "character_id": char.get("character_id"),
+                    "character_name": name,
+                    "reason": f"character ref: {name}",
+                })
+        for scene in doc.get("scenes") or []:
+            scene_name = scene.get("title", scene.get("scene_id", "Unknown"))
+            for master_id in scene.get("master_image_ids", []):
+                self._add_reference(master_id, {
+                    "type": "scene_master",
+                    "scene_id": scene.get("scene_id"),
+                    "scene_title": scene_name,
+                    "reason": f"scene master: {scene_name}",
+                })
+            for cast_member in scene.get("cast", []):
+                char_id = cast_member.get("character_id", "Unknown")
+                char = self.character_by_id.get(char_id)
+                char_name = char.get("name", char_id) if char else char_id
+                for ref_id in cast_member.get("scene_reference_ids", []):
+                    self._add_reference(ref_id, {
+                        "type": "scene_cast",
+                        "scene_id": scene.get("scene_id"),
+                        "scene_title": scene_name,
+                        "character_id": char_id,
+                        "character_name": char_name,
+                        "reason": f"scene ref: {char_name} in {scene_name}",
+                    })
+
+    def _add_reference(self, media_id: str, referrer: Dict[str, Any]) -> None:
+        self.references.setdefault(media_id, []).append(referrer)
+
+    def references_to(self, media_id: str) -> List[Dict[str, Any]]:
+        return self.references.get(media_id, [])
+
+    def media(self, media_id: str, include_archived: bool = False) -> Optional[Dict[str, Any]]:
+        item = self.media_by_id.get(media_id)
+        if item is None or (item.get("archived", False) and not include_archived):
+            return None
+        return item
+
+    def media_at(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.media_by_path.get(normalize_media_path(path))
+
+    def shot(self, shot_id: str, scene_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if scene_id is not None:
+            return self.shots_by_scene.get(scene_id, {}).get(shot_id)
+        hit = self.shot_by_id.get(shot_id)
+        return hit[1] if hit else None
+
+    def scene_of_shot(self, shot_id: str) -> Optional[Dict[str, Any]]:
+        hit = self.shot_by_id.get(shot_id)
+        return hit[0] if hit else None
+
+    def query_media(
+        self,
+        media_type: Optional[str] = None,
+        source: Optional[str] = None,
+        archived: Optional[bool] = False,
+        since: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Filtered media listing from the postings above. `archived` is False
+        (active only, the list_media default), True (archived only) or None
+        (both); `since` keeps items with a timestamp strictly greater than it.
+        Without `sort` the document order is kept.
+        """
+        postings: List[Iterable[int]] = []
+        if media_type is not None:
+            postings.append(self.media_by_type.get(media_type, []))
+        if source is not None:
+            postings.append(self.media_by_source.get(source, []))
+        if archived is not None:
+            postings.append(self.media_archived if archived else self.media_active)
+        if since is not None:
+            by_time, times, _rank = self.time_order()
+            postings.append(by_time[bisect_right(times, since):])
+
+        if postings:
+            postings.sort(key=len)
+            positions = list(postings[0])
+            for other in postings[1:]:
+                members = set(other)
+                positions = [p for p in positions if p in members]
+                if not positions:
+                    break
+        else:
+            positions = list(range(len(self.media_items)))
+
+        descending = bool(sort) and sort.startswith("-")
+        key = sort.lstrip("-") if sort else None
+        if key == "timestamp":
+            positions.sort(key=self.time_order()[2].__getitem__, reverse=descending)
+        elif key:
+            positions.sort(key=lambda p: (str(self.media_items[p].get(key) or ""), p), reverse=descending)
+        else:
+            positions.sort(reverse=descending)
+        return [self.media_items[p] for p in positions]
+
+    def time_order(self) -> Tuple[List[int], List[float], List[int]]:
+        """(positions by timestamp, their sorted timestamps, rank of each position); ties keep document order."""
+        if self._time_order is None:
+            by_time = sorted(range(len(self.media_items)), key=lambda p: (_timestamp(self.media_items[p]), p))
+            rank = [0] * len(by_time)
+            for r, p in enumerate(by_time):
+                rank[p] = r
+            self._time_order = (by_time, [_timestamp(self.media_items[p]) for p in by_time], rank)
+        return self._time_order
+
+    def resolve_media(self, media_ids: List[str], include_archived: bool = False) -> List[Dict[str, Any]]:
+        """Media items for the given ids, in order, skipping unknown ids."""
+        items = (self.media(mid, include_archived) for mid in media_ids)
+        return [item for item in items if item is not None]
+
+
+def _timestamp(item: Dict[str, Any]) -> float:
+    value = item.get("timestamp")
+    return value if isinstance(value, (int, float)) else 0
+
+
+def normalize_media_path(path: str) -> str:
+    """Media paths are stored as `project_data/<rel>`; accept either form."""
+    path = path.replace("\\", "/")
+    return path[len("project_data/"):] if path.startswith("project_data/") else path
@@ -0,0 +1,722 @@
+"""
+Pluggable project metadata backends.
+
+The document shape is unchanged (see blueprint): a project dict with `scenes`
+(each holding its own `shots`), `characters` and `media` lists. Backends only
+differ in how that document is persisted:
+
+- JsonMetadataStore: the original single metadata.json file.
+- JournaledMetadataStore: metadata.json plus an append-only op journal that is
+  periodically compacted back into metadata.json.
+- SqliteMetadataStore: one row per scene / shot / media item / character with
+  indexes on their ids. Writes diff the new document against the last persisted
+  rows and only touch what changed, so appending one media item no longer
+  rewrites the whole project.
+"""
+
+from pathlib import Path
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.storage.codec import get_codec, get_row_codec
+
+
+PROJECT_ROOT = Path("project_data")
+
+# Top-level document keys that are stored as row tables rather than inline values.
+ROW_COLLECTIONS = ("scenes", "characters", "media")
+# Placeholder kept in the `project` table so key order survives a round trip.
+_TABLE_MARKER = '"$table"'
+
+# table -> {primary key tuple: (id, row json)}
+Rows = Dict[str, Dict[Tuple[int, ...], Tuple[Optional[str], str]]]
+
+
+def empty_document(project_id: str) -> Dict[str, Any]:
+    return {"project_id": project_id, "scenes": [], "shots": [], "characters": [], "media": []}
+
+
+def _dumps_row(value: Any) -> str:
+    return get_row_codec().dumps(value)
+
+
+def _loads_row(data: str) -> Any:
+    return get_row_codec().loads(data)
+
+
+def document_rows(doc: Dict[str, Any]) -> Rows:
+    """Flatten a metadata document into positional rows per table."""
+    rows: Rows = {"project": {}, "scenes": {}, "shots": {}, "media": {}, "characters": {}}
+    for pos, (key, value) in enumerate(doc.items()):
+        if key in ROW_COLLECTIONS and isinstance(value, list):
+            rows["project"][(pos,)] = (key, _TABLE_MARKER)
+        else:
+            rows["project"][(pos,)] = (key, _dumps_row(value))
+    for pos, scene in enumerate(doc.get("scenes") or []):
+        shots = scene.get("shots") if isinstance(scene, dict) else None
+        if isinstance(shots, list):
+            # Keep the key in place (value replaced by the shots table) to preserve order
+            scene = dict(scene, shots=None)
+            for shot_pos, shot in enumerate(shots):
+                rows["shots"][(pos, shot_pos)] = (_row_id(shot, "shot_id"), _dumps_row(shot))
+        rows["scenes"][(pos,)] = (_row_id(scene, "scene_id"), _dumps_row(scene))
+    for pos, item in enumerate(doc.get("media") or []):
+        rows["media"][(pos,)] = (_row_id(item, "id"), _dumps_row(item))
+    for pos, char in enumerate(doc.get("characters") or []):
+        rows["characters"][(pos,)] = (_row_id(char, "character_id"), _dumps_row(char))
+    return rows
+
+
+def document_from_rows(rows: Rows) -> Dict[str, Any]:
+    """Inverse of document_rows."""
+    doc: Dict[str, Any] = {}
+    for pk in sorted(rows.get("project", {})):
+        key, data = rows["project"][pk]
+        doc[key] = [] if data == _TABLE_MARKER else _loads_row(data)
+    scenes = []
+    for pk in sorted(rows.get("scenes", {})):
+        scene = _loads_row(rows["scenes"][pk][1])
+        if isinstance(scene, dict) and "shots" in scene and scene["shots"] is None:
+            scene["shots"] = []
+        scenes.append(scene)
+    for (scene_pos, _shot_pos) in sorted(rows.get("shots", {})):
+        if scene_pos < len(scenes) and isinstance(scenes[scene_pos], dict):
+            scenes[scene_pos].setdefault("shots", []).append(_loads_row(rows["shots"][(scene_pos, _shot_pos)][1]))
+    for key, table in (("media", "media"), ("characters", "characters")):
+        if key in doc:
+            doc[key] = [_loads_row(rows[table][pk][1]) for pk in sorted(rows.get(table, {}))]
+    if "scenes" in doc:
+        doc["scenes"] = scenes
+    return doc
+
+
+def diff_rows(old: Rows, new: Rows) -> Tuple[Dict[str, Dict[Tuple[int, ...], Tuple[Optional[str], str]]], Dict[str, List[Tuple[int, ...]]]]:
+    """Return (upserts, deletes) per table needed to turn `old` into `new`."""
+    upserts: Dict[str, Dict[Tuple[int, ...], Tuple[Optional[str], str]]] = {}
+    deletes: Dict[str, List[Tuple[int, ...]]] = {}
+    for table, new_rows in new.items():
+        old_rows = old.get(table, {})
+        changed = {pk: row for pk, row in new_rows.items() if old_rows.get(pk) != row}
+        removed = [pk for pk in old_rows if pk not in new_rows]
+        if changed:
+            upserts[table] = changed
+        if removed:
+            deletes[table] = removed
+    return upserts, deletes
+
+
+def _row_id(item: Any, key: str) -> Optional[str]:
+    if isinstance(item, dict):
+        value = item.get(key)
+        return str(value) if value is not None else None
+    return None
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """Write plain (uncompressed) JSON via a temp file + os.replace."""
+    get_codec().without_gzip().write_file(path, data)
+
+
+def _file_signature(*paths: Path) -> Tuple[int, ...]:
+    sig: List[int] = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            sig.extend((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.extend((0, -1))
+    return tuple(sig)
+
+
+class MetadataStore:
+    """Base interface for project metadata persistence."""
+
+    name = "base"
+
+    def __init__(self, root: Path = PROJECT_ROOT):
+        self.root = Path(root)
+
+    def project_dir(self, project_id: str) -> Path:
+        return self.root / project_id
+
+    def json_path(self, project_id: str) -> Path:
+        return self.project_dir(project_id) / "metadata.json"
+
+    def gzip_path(self, project_id: str) -> Path:
+        return self.project_dir(project_id) / "metadata.json.gz"
+
+    def snapshot_source(self, project_id: str) -> Optional[Path]:
+        """The newest of metadata.json / metadata.json.gz, or None if neither exists."""
+        best, best_mtime = None, -1
+        for path in (self.json_path(project_id), self.gzip_path(project_id)):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if mtime > best_mtime:
+                best, best_mtime = path, mtime
+        return best
+
+    def exists(self, project_id: str) -> bool:
+        raise NotImplementedError
+
+    def ensure(self, project_id: str) -> None:
+        """Create an empty document for the project if none exists."""
+        if not self.exists(project_id):
+            self.write(project_id, empty_document(project_id))
+
+    def read(self, project_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def write(self, project_id: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def signature(self, project_id: str) -> Tuple[int, ...]:
+        """Cheap fingerprint of the backing files, used to detect external edits."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persist anything buffered in memory (no-op for write-through backends)."""
+
+    def import_json(self, project_id: str, source: Optional[Path] = None) -> Dict[str, Any]:
+        """Replace the stored document with the contents of a metadata.json file."""
+        src = Path(source) if source else (self.snapshot_source(project_id) or self.json_path(project_id))
+        data = get_codec().read_file(src)
+        self.write(project_id, data)
+        return data
+
+    def export_json(self, project_id: str, dest: Optional[Path] = None) -> Path:
+        """Write the current document out as a standalone metadata.json file."""
+        out = Path(dest) if dest else self.json_path(project_id)
+        atomic_write_json(out, self.read(project_id))
+        return out
+
+
+class JsonMetadataStore(MetadataStore):
+    """The original whole-document metadata.json backend."""
+
+    name = "json"
+
+    def exists(self, project_id: str) -> bool:
+        return self.snapshot_source(project_id) is not None
+
+    def read(self, project_id: str) -> Dict[str, Any]:
+        src = self.snapshot_source(project_id)
+        if src is None:
+            raise FileNotFoundError(self.json_path(project_id))
+        return get_codec().read_file(src)
+
+    def write(self, project_id: str, data: Dict[str, Any]) -> None:
+        codec = get_codec()
+        target, other = self.json_path(project_id), self.gzip_path(project_id)
+        if codec.gzip_level is not None:
+            target, other = other, target
+        codec.write_file(target, data)
+        # Drop the other variant so a stale copy can never shadow this one
+        try:
+            os.unlink(other)
+        except FileNotFoundError:
+            pass
+
+    def signature(self, project_id: str) -> Tuple[int, ...]:
+        return self._snapshot_signature(project_id)
+
+    def _snapshot_signature(self, project_id: str) -> Tuple[int, ...]:
+        return _file_signature(self.json_path(project_id), self.gzip_path(project_id))
+
+    def export_json(self, project_id: str, dest: Optional[Path] = None) -> Path:
+        if dest is None and self.snapshot_source(project_id) == self.json_path(project_id):
+            return self.json_path(project_id)
+        return super().export_json(project_id, dest)
+
+
+# --- Journaled JSON backend ---------------------------------------------------
+#
+# Each write appends one JSON line of small op records describing what changed
+# (add_media, update_shot, reorder_shots, ...) instead of rewriting
+# metadata.json. A background compactor folds the journal into metadata.json
+# after `max_ops` records or `max_age` seconds; a journal left behind by a
+# crash is replayed (and folded) the first time the project is opened.
+
+# collection key -> (entity name used in op names, id field)
+_OP_COLLECTIONS = {
+    "media": ("media", "id"),
+    "characters": ("character", "character_id"),
+    "scenes": ("scene", "scene_id"),
+    "shots": ("shot", "shot_id"),
+}
+
+
+def _scene_without_shots(scene: Any) -> Any:
+    # Keep the key in place so key order survives a replay (same trick as document_rows)
+    if isinstance(scene, dict) and isinstance(scene.get("shots"), list):
+        return dict(scene, shots=None)
+    return scene
+
+
+def _ids_of(items: Any, key: str) -> Optional[List[str]]:
+    """Ids of a list of dicts, or None if any is missing or duplicated."""
+    if not isinstance(items, list):
+        return None
+    ids = [item.get(key) if isinstance(item, dict) else None for item in items]
+    if None in ids or len(set(ids)) != len(ids):
+        return None
+    return ids
+
+
+def _collection_ops(coll: str, old: Any, new: Any, **scope: Any) -> List[Dict[str, Any]]:
+    entity, key = _OP_COLLECTIONS[coll]
+    strip = _scene_without_shots if coll == "scenes" else (lambda item: item)
+    if coll != "scenes" and isinstance(old, list) and isinstance(new, list):
+        fast = _append_or_update_ops(entity, key, old, new, scope)
+        if fast is not None:
+            return fast
+    old_ids, new_ids = _ids_of(old, key), _ids_of(new, key)
+    if old_ids is None or new_ids is None:
+        # Ids we can't address individually: fall back to replacing the whole list
+        if old == new:
+            return []
+        return [{"op": f"replace_{coll}", **scope, "items": new}]
+
+    ops: List[Dict[str, Any]] = []
+    old_by_id = dict(zip(old_ids, old))
+    new_set = set(new_ids)
+    for item_id in old_ids:
+        if item_id not in new_set:
+            ops.append({"op": f"remove_{entity}", **scope, "id": item_id})
+    for item_id, item in zip(new_ids, new):
+        prev = old_by_id.get(item_id)
+        if prev is None:
+            ops.append({"op": f"add_{entity}", **scope, "item": strip(item)})
+        elif strip(prev) != strip(item):
+            ops.append({"op": f"update_{entity}", **scope, "id": item_id, "item": strip(item)})
+    # Removes keep relative order and adds append, so only a genuine reorder needs recording
+    expected = [i for i in old_ids if i in new_set] + [i for i in new_ids if i not in old_by_id]
+    if expected != new_ids:
+        ops.append({"op": f"reorder_{coll}", **scope, "ids": new_ids})
+    return ops
+
+
+def _append_or_update_ops(entity: str, key: str, old: List[Any], new: List[Any], scope: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Single positional pass for the common edits (items appended, items changed
+    in place); None when the general id-based diff is needed.
+    """
+    n = len(old)
+    if len(new) < n:
+        return None
+    changed = [i for i, (a, b) in enumerate(zip(old, new)) if a is not b and a != b]
+    if not changed and len(new) == n:
+        return []
+    old_ids = {item.get(key) if isinstance(item, dict) else None for item in old}
+    if None in old_ids or len(old_ids) != n:
+        return None
+    ops: List[Dict[str, Any]] = []
+    for i in changed:
+        item_id = new[i].get(key) if isinstance(new[i], dict) else None
+        if item_id is None or item_id != old[i].get(key):
+            return None
+        ops.append({"op": f"update_{entity}", **scope, "id": item_id, "item": new[i]})
+    seen = set(old_ids)
+    for item in new[n:]:
+        item_id = item.get(key) if isinstance(item, dict) else None
+        if item_id is None or item_id in seen:
+            return None
+        seen.add(item_id)
+        ops.append({"op": f"add_{entity}", **scope, "item": item})
+    return ops
+
+
+def document_ops(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Op records that turn document `old` into `new` (see apply_ops)."""
+    ops: List[Dict[str, Any]] = []
+    for key in old:
+        if key not in new:
+            ops.append({"op": "unset", "key": key})
+    for key, value in new.items():
+        if key in ("media", "characters", "scenes") and isinstance(value, list) and isinstance(old.get(key), list):
+            ops.extend(_collection_ops(key, old[key], value))
+        elif key not in old or old[key] != value:
+            ops.append({"op": "set", "key": key, "value": value})
+
+    # Shots are diffed per scene, unless the scene list was replaced wholesale (shots included)
+    old_scenes, new_scenes = old.get("scenes"), new.get("scenes")
+    if isinstance(old_scenes, list) and isinstance(new_scenes, list) and not any(op["op"] == "replace_scenes" for op in ops):
+        old_shots = {s.get("scene_id"): s.get("shots") for s in old_scenes if isinstance(s, dict)}
+        for scene in new_scenes:
+            shots = scene.get("shots")
+            if not isinstance(shots, list):
+                continue
+            before = old_shots.get(scene["scene_id"])
+            ops.extend(_collection_ops("shots", before if isinstance(before, list) else [], shots, scene_id=scene["scene_id"]))
+    return ops
+
+
+def apply_ops(doc: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Replay op records produced by document_ops onto `doc` (mutated in place)."""
+    for op in ops:
+        name = op["op"]
+        if name == "set":
+            doc[op["key"]] = op["value"]
+            continue
+        if name == "unset":
+            doc.pop(op["key"], None)
+            continue
+        verb, _, noun = name.partition("_")
+        coll = next(c for c, (entity, _k) in _OP_COLLECTIONS.items() if noun in (c, entity))
+        _entity, key = _OP_COLLECTIONS[coll]
+        if coll == "shots":
+            scene = next(s for s in doc.get("scenes", []) if s.get("scene_id") == op["scene_id"])
+            items = scene.setdefault("shots", [])
+        else:
+            items = doc.setdefault(coll, [])
+
+        if verb == "replace":
+            items[:] = op["items"]
+        elif verb == "add":
+            items.append(_restore_item(coll, op["item"], None))
+        elif verb == "update":
+            idx = next(i for i, item in enumerate(items) if item.get(key) == op["id"])
+            items[idx] = _restore_item(coll, op["item"], items[idx])
+        elif verb == "remove":
+            items[:] = [item for item in items if item.get(key) != op["id"]]
+        elif verb == "reorder":
+            by_id = {item.get(key): item for item in items}
+            items[:] = [by_id[i] for i in op["ids"]]
+    return doc
+
+
+def _restore_item(coll: str, item: Any, previous: Any) -> Any:
+    # Scenes travel without their shots; re-attach the existing list (shot ops follow)
+    if coll == "scenes" and isinstance(item, dict) and "shots" in item and item["shots"] is None:
+        shots = previous.get("shots") if isinstance(previous, dict) else None
+        return dict(item, shots=shots if isinstance(shots, list) else [])
+    return item
+
+
+class JournaledMetadataStore(JsonMetadataStore):
+    """
+    metadata.json snapshot plus an append-only metadata.journal.jsonl.
+
+    The journal starts with a header naming the snapshot it applies to, so a
+    journal orphaned by switching backends is never replayed onto a newer
+    snapshot.
+    """
+
+    name = "journal"
+
+    def __init__(self, root: Path = PROJECT_ROOT, max_ops: Optional[int] = None, max_age: Optional[float] = None):
+        super().__init__(root)
+        self.max_ops = max_ops or int(os.environ.get("OPENFILMAI_JOURNAL_MAX_OPS", "200"))
+        self.max_age = max_age or float(os.environ.get("OPENFILMAI_JOURNAL_MAX_SECONDS", "30"))
+        # project_id -> {"doc", "signature", "records", "first_at", "lock"}
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        atexit.register(self.flush)
+
+    def journal_path(self, project_id: str) -> Path:
+        return self.project_dir(project_id) / "metadata.journal.jsonl"
+
+    def signature(self, project_id: str) -> Tuple[int, ...]:
+        return self._snapshot_signature(project_id) + _file_signature(self.journal_path(project_id))
+
+    def _state(self, project_id: str) -> Dict[str, Any]:
+        with self._lock:
+            state = self._states.get(project_id)
+            if state is None:
+                state = self._states[project_id] = {"doc": None, "signature": None, "records": 0, "first_at": None, "lock": threading.RLock()}
+            return state
+
+    def ensure(self, project_id: str) -> None:
+        state = self._state(project_id)
+        with state["lock"]:
+            if state["doc"] is not None:
+                return
+            if not self.exists(project_id):
+                super().write(project_id, empty_document(project_id))
+            # Crash recovery: fold whatever the last session left in the journal
+            self._load(project_id, state)
+            if state["records"]:
+                self._compact(project_id, state)
+
+    def _load(self, project_id: str, state: Dict[str, Any]) -> None:
+        signature = self.signature(project_id)
+        doc = super().read(project_id)
+        records = 0
+        journal = self.journal_path(project_id)
+        if journal.exists():
+            base = list(self._snapshot_signature(project_id))
+            with open(journal, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            header = _parse_journal_line(lines[0]) if lines else None
+            if header is None or header.get("base") != base:
+                print(f"[STORAGE] Ignoring stale metadata journal for {project_id}")
+                os.replace(journal, journal.with_name(journal.name + ".stale"))
+                signature = self.signature(project_id)
+            else:
+                for line in lines[1:]:
+                    record = _parse_journal_line(line)
+                    if record is None:
+                        # Torn trailing line from a crash mid-append
+                        break
+                    apply_ops(doc, record["ops"])
+                    records += 1
+        state.update(doc=doc, signature=signature, records=records, first_at=time.time() if records else None)
+
+    def read(self, project_id: str) -> Dict[str, Any]:
+        state = self._state(project_id)
+        with state["lock"]:
+            if state["doc"] is None or state["signature"] != self.signature(project_id):
+                self._load(project_id, state)
+            return state["doc"]
+
+    def write(self, project_id: str, data: Dict[str, Any]) -> None:
+        state = self._state(project_id)
+        with state["lock"]:
+            if state["doc"] is None or state["signature"] != self.signature(project_id):
+                if not self.exists(project_id):
+                    super().write(project_id, data)
+                    state.update(doc=data, signature=self.signature(project_id), records=0, first_at=None)
+                    return
+                self._load(project_id, state)
+            ops = document_ops(state["doc"], data)
+            if ops:
+                journal = self.journal_path(project_id)
+                record = _dumps_row({"ts": time.time(), "ops": ops})
+                with open(journal, "a", encoding="utf-8") as f:
+                    if f.tell() == 0:
+                        f.write(_dumps_row({"base": list(self._snapshot_signature(project_id))}) + "\n")
+                    f.write(record + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                state["records"] += 1
+                state["first_at"] = state["first_at"] or time.time()
+            # The caller hands over a published (read-only) document, so keep it as-is
+            state.update(doc=data, signature=self.signature(project_id))
+            if state["records"] >= self.max_ops:
+                self._wake.set()
+            self._start_compactor()
+
+    def import_json(self, project_id: str, source: Optional[Path] = None) -> Dict[str, Any]:
+        data = super().import_json(project_id, source)
+        self.compact(project_id)
+        return data
+
+    def export_json(self, project_id: str, dest: Optional[Path] = None) -> Path:
+        self.compact(project_id)
+        return super().export_json(project_id, dest)
+
+    def compact(self, project_id: str) -> None:
+        """Fold the journal into metadata.json now."""
+        state = self._state(project_id)
+        with state["lock"]:
+            if state["doc"] is not None and state["records"]:
+                self._compact(project_id, state)
+
+    def _compact(self, project_id: str, state: Dict[str, Any]) -> None:
+        JsonMetadataStore.write(self, project_id, state["doc"])
+        try:
+            os.unlink(self.journal_path(project_id))
+        except FileNotFoundError:
+            pass
+        state.update(signature=self.signature(project_id), records=0, first_at=None)
+
+    def flush(self) -> None:
+        """Compact every project with pending journal records (exit, backend switch)."""
+        with self._lock:
+            project_ids = list(self._states)
+        for project_id in project_ids:
+            try:
+                self.compact(project_id)
+            except Exception as e:
+                print(f"[STORAGE] Journal compaction failed for {project_id}: {e}")
+
+    def _start_compactor(self) -> None:
+        if self._compactor is not None:
+            return
+        with self._lock:
+            if self._compactor is None:
+                self._compactor = threading.Thread(target=self._compactor_loop, name="metadata-journal-compactor", daemon=True)
+                self._compactor.start()
+
+    def _compactor_loop(self) -> None:
+        while True:
+            self._wake.wait(timeout=max(1.0, self.max_age / 4))
+            self._wake.clear()
+            now = time.time()
+            with self._lock:
+                states = list(self._states.items())
+            for project_id, state in states:
+                due = state["records"] >= self.max_ops or (
+                    state["first_at"] is not None and now - state["first_at"] >= self.max_age
+                )
+                if due:
+                    try:
+                        self.compact(project_id)
+                    except Exception as e:
+                        print(f"[STORAGE] Journal compaction failed for {project_id}: {e}")
+
+
+def _parse_journal_line(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        record = _loads_row(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS project (position INTEGER PRIMARY KEY, key TEXT NOT NULL, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS scenes (position INTEGER PRIMARY KEY, scene_id TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_scenes_scene_id ON scenes(scene_id);
+CREATE TABLE IF NOT EXISTS shots (
+    scene_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    shot_id TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (scene_position, position)
+);
+CREATE INDEX IF NOT EXISTS idx_shots_shot_id ON shots(shot_id);
+CREATE TABLE IF NOT EXISTS media (position INTEGER PRIMARY KEY, id TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_media_id ON media(id);
+CREATE TABLE IF NOT EXISTS characters (position INTEGER PRIMARY KEY, character_id TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_characters_character_id ON characters(character_id);
+"""
+
+# table -> (primary key columns, id column)
+_SQLITE_TABLES: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "project": (("position",), "key"),
+    "scenes": (("position",), "scene_id"),
+    "shots": (("scene_position", "position"), "shot_id"),
+    "media": (("position",), "id"),
+    "characters": (("position",), "character_id"),
+}
+
+
+class SqliteMetadataStore(MetadataStore):
+    """Row-per-record SQLite backend (project_data/<id>/metadata.sqlite)."""
+
+    name = "sqlite"
+
+    def __init__(self, root: Path = PROJECT_ROOT):
+        super().__init__(root)
+        # Last persisted rows per project, keyed by the db signature they were read at
+        self._snapshots: Dict[str, Tuple[Tuple[int, ...], Rows]] = {}
+        self._lock = threading.Lock()
+
+    def db_path(self, project_id: str) -> Path:
+        return self.project_dir(project_id) / "metadata.sqlite"
+
+    def _connect(self, project_id: str) -> sqlite3.Connection:
+        self.project_dir(project_id).mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path(project_id)), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SQLITE_SCHEMA)
+        return conn
+
+    def exists(self, project_id: str) -> bool:
+        return self.db_path(project_id).exists()
+
+    def ensure(self, project_id: str) -> None:
+        if self.exists(project_id):
+            return
+        # One-shot import of a legacy metadata.json the first time the project is opened
+        if self.snapshot_source(project_id) is not None:
+            self.import_json(project_id)
+        else:
+            self.write(project_id, empty_document(project_id))
+
+    def signature(self, project_id: str) -> Tuple[int, ...]:
+        db = self.db_path(project_id)
+        return _file_signature(db, db.with_name(db.name + "-wal"))
+
+    def _load_rows(self, project_id: str) -> Rows:
+        sig = self.signature(project_id)
+        with self._lock:
+            snap = self._snapshots.get(project_id)
+        if snap and snap[0] == sig:
+            return snap[1]
+        rows: Rows = {}
+        conn = self._connect(project_id)
+        try:
+            for table, (pk_cols, id_col) in _SQLITE_TABLES.items():
+                cols = ", ".join(pk_cols)
+                cur = conn.execute(f"SELECT {cols}, {id_col}, data FROM {table}")
+                n = len(pk_cols)
+                rows[table] = {tuple(r[:n]): (r[n], r[n + 1]) for r in cur.fetchall()}
+        finally:
+            conn.close()
+        with self._lock:
+            self._snapshots[project_id] = (self.signature(project_id), rows)
+        return rows
+
+    def read(self, project_id: str) -> Dict[str, Any]:
+        return document_from_rows(self._load_rows(project_id))
+
+    def write(self, project_id: str, data: Dict[str, Any]) -> None:
+        old = self._load_rows(project_id) if self.exists(project_id) else {}
+        new = document_rows(data)
+        upserts, deletes = diff_rows(old, new)
+        if upserts or deletes or not old:
+            conn = self._connect(project_id)
+            try:
+                with conn:
+                    self._apply(conn, upserts, deletes)
+            finally:
+                conn.close()
+        with self._lock:
+            self._snapshots[project_id] = (self.signature(project_id), new)
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, upserts, deletes) -> None:
+        for table, pks in deletes.items():
+            pk_cols, _ = _SQLITE_TABLES[table]
+            where = " AND ".join(f"{c} = ?" for c in pk_cols)
+            conn.executemany(f"DELETE FROM {table} WHERE {where}", pks)
+        for table, changed in upserts.items():
+            pk_cols, id_col = _SQLITE_TABLES[table]
+            cols = ", ".join((*pk_cols, id_col, "data"))
+            marks = ", ".join("?" for _ in range(len(pk_cols) + 2))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({cols}) VALUES ({marks})",
+                [(*pk, row_id, data) for pk, (row_id, data) in changed.items()],
+            )
+
+    def import_json(self, project_id: str, source: Optional[Path] = None) -> Dict[str, Any]:
+        """Replace the SQLite contents with an existing metadata.json document."""
+        src = Path(source) if source else (self.snapshot_source(project_id) or self.json_path(project_id))
+        data = get_codec().read_file(src)
+        rows = document_rows(data)
+        conn = self._connect(project_id)
+        try:
+            with conn:
+                for table in _SQLITE_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                self._apply(conn, rows, {})
+        finally:
+            conn.close()
+        with self._lock:
+            self._snapshots[project_id] = (self.signature(project_id), rows)
+        return data
+
+
+METADATA_BACKENDS = {
+    JsonMetadataStore.name: JsonMetadataStore,
+    SqliteMetadataStore.name: SqliteMetadataStore,
+    JournaledMetadataStore.name: JournaledMetadataStore,
+}
+
+
+def create_metadata_store(name: Optional[str] = None, root: Path = PROJECT_ROOT) -> MetadataStore:
+    """Instantiate a backend by name (JSON when None). Raises ValueError for unknown names."""
+    cls = METADATA_BACKENDS.get((name or "json").lower())
+    if cls is None:
+        raise ValueError(f"Unknown metadata backend: {name} (expected one of {', '.join(METADATA_BACKENDS)})")
+    return cls(root)
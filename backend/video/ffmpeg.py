@@ -7,6 +7,37 @@ FFMPEG_TIMEOUT = 60
 FFPROBE_TIMEOUT = 15
 
 
+def _run(cmd, *, timeout=None, check=False, capture_output=False, **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run() that registers the child with the current job's cancel
+    token, so cancelling the job kills ffmpeg instead of waiting for it.
+    """
+    from backend.jobs.cancel import JobCancelled, current_token
+
+    token = current_token()
+    if token is not None:
+        token.raise_if_cancelled()
+    if capture_output:
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs["stderr"] = subprocess.PIPE
+    with subprocess.Popen(cmd, **kwargs) as proc:
+        unregister = token.on_cancel(proc.kill) if token is not None else None
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+    if token is not None and token.is_set():
+        raise JobCancelled(f"Job cancelled while running {cmd[0]}")
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
 def extract_first_last_frames(video_path: str, out_first: str, out_last: str) -> Tuple[str, str]:
     """
     Extract first and last frames from a video file.
@@ -29,7 +60,7 @@ def extract_first_last_frames(video_path: str, out_first: str, out_last: str) ->
 
     # First frame - use simple seeking to start
     try:
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y", "-i", str(video), "-ss", "0", "-vframes", "1", str(first)
         ], capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
         if result.returncode != 0:
@@ -49,7 +80,7 @@ def extract_first_last_frames(video_path: str, out_first: str, out_last: str) ->
         # Seek to 0.1s before end for reliability
         seek_time = max(0, duration - 0.1)
         try:
-            result = subprocess.run([
+            result = _run([
                 "ffmpeg", "-y", "-ss", str(seek_time), "-i", str(video), "-vframes", "1", str(last)
             ], capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
             if result.returncode != 0:
@@ -63,7 +94,7 @@ def extract_first_last_frames(video_path: str, out_first: str, out_last: str) ->
     elif duration > 0:
         # Very short video (< 0.5s): use the only frame we can get
         try:
-            result = subprocess.run([
+            result = _run([
                 "ffmpeg", "-y", "-i", str(video), "-vframes", "1", str(last)
             ], capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
             if result.returncode != 0:
@@ -77,13 +108,13 @@ def extract_first_last_frames(video_path: str, out_first: str, out_last: str) ->
     else:
         # Duration probe failed - use sseof fallback
         try:
-            result = subprocess.run([
+            result = _run([
                 "ffmpeg", "-y", "-sseof", "-0.5", "-i", str(video), "-vframes", "1", str(last)
             ], capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
             if result.returncode != 0:
                 # Final fallback: just grab first frame as last
                 print(f"sseof fallback failed, using first frame as last: {result.stderr}")
-                result = subprocess.run([
+                result = _run([
                     "ffmpeg", "-y", "-i", str(video), "-vframes", "1", str(last)
                 ], capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
         except subprocess.TimeoutExpired:
@@ -127,7 +158,7 @@ def extract_frame_at_timestamp(video_path: str, timestamp_seconds: float, output
         timestamp_seconds = max(0, timestamp_seconds)
 
     try:
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-ss", str(timestamp_seconds),
             "-i", str(video),
@@ -164,7 +195,7 @@ def get_video_duration(video_path: str) -> float:
 
     # Try format duration first
     try:
-        probe = subprocess.run([
+        probe = _run([
             "ffprobe", "-v", "error", "-show_entries", "format=duration",
             "-of", "default=noprint_wrappers=1:nokey=1", str(video)
         ], capture_output=True, text=True, timeout=FFPROBE_TIMEOUT)
@@ -183,7 +214,7 @@ def get_video_duration(video_path: str) -> float:
 
     # Fallback to stream duration if format duration fails
     try:
-        probe_stream = subprocess.run([
+        probe_stream = _run([
             "ffprobe", "-v", "error", "-select_streams", "v:0",
             "-show_entries", "stream=duration",
             "-of", "default=noprint_wrappers=1:nokey=1", str(video)
@@ -228,7 +259,7 @@ def replace_first_frame(video_path: str, replacement_frame: str, output_path: st
         frames_dir.mkdir()
         
         # Get frame rate
-        probe = subprocess.run([
+        probe = _run([
             "ffprobe", "-v", "error", "-select_streams", "v:0",
             "-show_entries", "stream=r_frame_rate",
             "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)
@@ -246,7 +277,7 @@ def replace_first_frame(video_path: str, replacement_frame: str, output_path: st
             fps = float(fps_str)
         
         # Extract frames starting from frame 2 (skip first frame)
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-i", str(video_path),
             "-vf", "select='gte(n\\,1)'",  # Skip first frame (n=0)
@@ -262,7 +293,7 @@ def replace_first_frame(video_path: str, replacement_frame: str, output_path: st
         shutil.copy2(replacement_frame, frames_dir / "frame_0000.png")
         
         # Reassemble video from frames
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-framerate", str(fps),
             "-i", str(frames_dir / "frame_%04d.png"),
@@ -318,7 +349,7 @@ def optical_flow_smooth(input_a: str, input_b: str, output_path: str, transition
         # Use select filter to skip frame 0, keep frames 1+
         # Also trim audio by 1 frame duration (1/24 = ~0.042s) to maintain sync
         trimmed_b = tmp / "trimmed_b.mp4"
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-i", str(input_b),
             "-vf", "select='gte(n\\,1)',setpts=PTS-STARTPTS",
@@ -333,7 +364,7 @@ def optical_flow_smooth(input_a: str, input_b: str, output_path: str, transition
             raise RuntimeError(f"Failed to trim B: {result.stderr}")
         
         # Step 2: Get resolution from A
-        probe = subprocess.run([
+        probe = _run([
             "ffprobe", "-v", "error", "-select_streams", "v:0",
             "-show_entries", "stream=width,height",
             "-of", "csv=p=0", str(input_a)
@@ -349,7 +380,7 @@ def optical_flow_smooth(input_a: str, input_b: str, output_path: str, transition
         normalized_b = tmp / "normalized_b.mp4"
         
         # Normalize A
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y", "-i", str(input_a),
             "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
             "-c:v", "libx264", "-preset", "medium", "-crf", "18",
@@ -362,7 +393,7 @@ def optical_flow_smooth(input_a: str, input_b: str, output_path: str, transition
             raise RuntimeError(f"Failed to normalize video A: {result.stderr}")
         
         # Normalize trimmed B
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y", "-i", str(trimmed_b),
             "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
             "-c:v", "libx264", "-preset", "medium", "-crf", "18",
@@ -376,13 +407,13 @@ def optical_flow_smooth(input_a: str, input_b: str, output_path: str, transition
         
         # Step 4: Concatenate using filter_complex for perfect A/V sync
         # Check if both clips have audio streams
-        probe_a_audio = subprocess.run([
+        probe_a_audio = _run([
             "ffprobe", "-v", "error", "-select_streams", "a:0",
             "-show_entries", "stream=codec_type",
             "-of", "csv=p=0", str(normalized_a)
         ], capture_output=True, text=True)
         
-        probe_b_audio = subprocess.run([
+        probe_b_audio = _run([
             "ffprobe", "-v", "error", "-select_streams", "a:0",
             "-show_entries", "stream=codec_type",
             "-of", "csv=p=0", str(normalized_b)
@@ -411,7 +442,7 @@ def optical_flow_smooth(input_a: str, input_b: str, output_path: str, transition
             map_args = ["-map", "[outv]"]
             audio_codec = []
         
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-i", str(normalized_a),
             "-i", str(normalized_b),
@@ -443,7 +474,7 @@ def concatenate_videos(video_paths: list[str], output_path: str) -> str:
         concat_file = f.name
     
     try:
-        subprocess.run([
+        _run([
             "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_file,
             "-c", "copy", str(output_path)
         ], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -467,7 +498,7 @@ def pad_audio_to_duration(input_audio: str, target_duration: float, output_audio
         Path to the padded audio file
     """
     # Get current audio duration
-    probe = subprocess.run([
+    probe = _run([
         "ffprobe", "-v", "error", "-show_entries", "format=duration",
         "-of", "default=noprint_wrappers=1:nokey=1", str(input_audio)
     ], capture_output=True, text=True)
@@ -484,7 +515,7 @@ def pad_audio_to_duration(input_audio: str, target_duration: float, output_audio
         return output_audio
     
     # Pad with silence to match target duration
-    result = subprocess.run([
+    result = _run([
         "ffmpeg", "-y",
         "-i", str(input_audio),
         "-af", f"apad=whole_dur={target_duration}",
@@ -507,7 +538,7 @@ def ensure_compatible_format(input_video: str, output_video: str) -> str:
     Re-encode video to ensure browser compatibility.
     Uses H.264 codec with yuv420p pixel format for maximum compatibility.
     """
-    result = subprocess.run([
+    result = _run([
         "ffmpeg", "-y",
         "-i", str(input_video),
         "-c:v", "libx264",
@@ -531,7 +562,7 @@ def ensure_compatible_format(input_video: str, output_video: str) -> str:
 
 def strip_audio(input_video: str) -> None:
     tmp = Path(input_video).with_suffix(".noaudio.tmp.mp4")
-    subprocess.run(
+    _run(
         [
             "ffmpeg",
             "-y",
@@ -566,12 +597,12 @@ def extend_lipsync_video(lipsync_video: str, original_video: str, output_path: s
     import tempfile
     
     # Get durations
-    probe_lipsync = subprocess.run([
+    probe_lipsync = _run([
         "ffprobe", "-v", "error", "-show_entries", "format=duration",
         "-of", "default=noprint_wrappers=1:nokey=1", str(lipsync_video)
     ], capture_output=True, text=True)
     
-    probe_original = subprocess.run([
+    probe_original = _run([
         "ffprobe", "-v", "error", "-show_entries", "format=duration",
         "-of", "default=noprint_wrappers=1:nokey=1", str(original_video)
     ], capture_output=True, text=True)
@@ -594,7 +625,7 @@ def extend_lipsync_video(lipsync_video: str, original_video: str, output_path: s
         remaining_part = tmp / "remaining.mp4"
         
         # Cut from lipsync_duration to end of original
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-ss", str(lipsync_duration),
             "-i", str(original_video),
@@ -611,7 +642,7 @@ def extend_lipsync_video(lipsync_video: str, original_video: str, output_path: s
             f.write(f"file '{Path(lipsync_video).absolute()}'\n")
             f.write(f"file '{remaining_part.absolute()}'\n")
         
-        result = subprocess.run([
+        result = _run([
             "ffmpeg", "-y",
             "-f", "concat",
             "-safe", "0",
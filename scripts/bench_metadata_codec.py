@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Read/write latency and file size of project metadata for 1k / 10k / 100k media
+items, per serializer (see backend/storage/codec.py) and per metadata backend.
+
+    python scripts/bench_metadata_codec.py [--sizes 1000,10000,100000] [--repeat 3]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.storage import codec as codec_module  # noqa: E402
+from backend.storage.codec import JsonCodec  # noqa: E402
+from backend.storage.metadata_store import create_metadata_store  # noqa: E402
+
+
+def make_document(n_media: int) -> dict:
+    media = [
+        {
+            "id": f"shot_{i:06d}.mp4",
+            "type": "video" if i % 3 else "image",
+            "path": f"project_data/bench/media/video/shot_{i:06d}.mp4",
+            "url": f"/files/bench/media/video/shot_{i:06d}.mp4",
+            "source": "generated",
+            "timestamp": 1700000000 + i,
+            "description": "Wide establishing shot, golden hour, slow dolly in",
+        }
+        for i in range(n_media)
+    ]
+    scenes = [
+        {
+            "scene_id": f"scene_{s}",
+            "title": f"Scene {s}",
+            "shots": [
+                {"shot_id": f"scene_{s}_shot_{k}", "prompt": "A character walks into frame", "duration": 8,
+                 "file_path": f"project_data/bench/scenes/scene_{s}/shots/{k}.mp4"}
+                for k in range(20)
+            ],
+        }
+        for s in range(10)
+    ]
+    characters = [{"character_id": f"char_{c}", "name": f"Character {c}", "reference_image_ids": []} for c in range(10)]
+    return {"project_id": "bench", "scenes": scenes, "shots": [], "characters": characters, "media": media}
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_codecs(doc: dict, workdir: Path, repeat: int) -> None:
+    codecs = [
+        ("json indent=2 (old)", JsonCodec(pretty=True, use_orjson=False)),
+        ("json compact", JsonCodec(use_orjson=False)),
+        ("json compact + gzip", JsonCodec(use_orjson=False, gzip_level=3)),
+    ]
+    if codec_module.orjson is not None:
+        codecs += [
+            ("orjson compact", JsonCodec()),
+            ("orjson compact + gzip", JsonCodec(gzip_level=3)),
+        ]
+    else:
+        print("  (orjson not installed; pip install orjson to include it)")
+    for label, codec in codecs:
+        path = workdir / "metadata.bench"
+        write_ms = best_of(repeat, lambda: codec.write_file(path, doc))
+        read_ms = best_of(repeat, lambda: codec.read_file(path))
+        size_kb = path.stat().st_size / 1024
+        print(f"  {label:<24} write {write_ms:9.1f} ms   read {read_ms:9.1f} ms   {size_kb:10.0f} KiB")
+
+
+def bench_backends(doc: dict, workdir: Path, repeat: int) -> None:
+    """Cost of persisting a one-item change (the common case) per backend."""
+    for name in ("json", "journal", "sqlite"):
+        root = workdir / name
+        store = create_metadata_store(name, root)
+        store.write("bench", doc)
+        store.read("bench")
+        counter = [0]
+
+        def append_one():
+            counter[0] += 1
+            new_doc = dict(doc, media=doc["media"] + [{"id": f"extra_{counter[0]}.png", "type": "image"}])
+            store.write("bench", new_doc)
+
+        write_ms = best_of(repeat, append_one)
+        store.flush()
+        print(f"  {name:<24} append-one write {write_ms:9.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="openfilmai-bench-"))
+    try:
+        for n in (int(x) for x in args.sizes.split(",")):
+            doc = make_document(n)
+            print(f"\n{n} media items")
+            bench_codecs(doc, workdir, args.repeat)
+            bench_backends(doc, workdir, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("OPENFILMAI_JOURNAL_MAX_OPS", "1000000")
+    main()